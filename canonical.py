@@ -0,0 +1,16 @@
+import pandas as pd
+import re
+
+# Invoice numbers such as 24HC01713-1S (same format ExcelConverter.is_invoice_row extracts)
+INVOICE_KEY_PATTERN = re.compile(r'(\d+HC\d+-\d+[A-Z]*)', re.IGNORECASE)
+
+
+def extract_invoice_key(text) -> str:
+    """Pull the invoice number out of a sheet name or title, or '' if there is none"""
+    match = INVOICE_KEY_PATTERN.search(str(text))
+    return match.group(1).upper() if match else ''
+
+
+def normalize_item_names(names: pd.Series) -> pd.Series:
+    """Canonical item names for tariff lookups (case and spacing insensitive)"""
+    return names.astype(str).str.upper().str.replace(r'\s+', ' ', regex=True).str.strip()
@@ -0,0 +1,185 @@
+import pandas as pd
+import numpy as np
+import codecs
+import csv
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+from pandas.io.parsers import TextParser
+
+# Delimited text exports accepted wherever a workbook is: one sheet per file (a directory of
+# files is a workbook), or one file whose first column names each line's sheet
+CSV_SUFFIXES = {'.csv': ',', '.tsv': '\t'}
+
+# Encodings tried on the start of a file; gb18030 (superset of GBK) decodes nearly any bytes, so it goes last
+ENCODINGS = ('utf-8-sig', 'gb18030')
+SNIFF_BYTES = 1 << 20
+
+# First header cell that marks a leading sheet-name column (compared case-insensitively)
+SHEET_COLUMNS = ('sheet', 'sheet name', '__sheet__', '工作表', '工作表名称')
+
+# Lines turned into a DataFrame at a time while streaming a file
+CHUNK_ROWS = 50_000
+
+# Numeric text becomes a number like a numeric Excel cell; leading zeros (P/Ns) stay text
+INTEGER_PATTERN = r'\s*[+-]?(?:0|[1-9]\d*)\s*'
+LEADING_ZERO_PATTERN = r'\s*[+-]?0\d'
+
+
+def is_csv_source(path: Union[str, Path]) -> bool:
+    """Check if a path is a delimited text file, or a directory of them, rather than a workbook"""
+    path = Path(path)
+    return path.suffix.lower() in CSV_SUFFIXES or path.is_dir()
+
+
+def sheet_files(path: Union[str, Path]) -> List[Path]:
+    """The text files making up a source: the file itself, or a directory's files in name order"""
+    path = Path(path)
+    if not path.is_dir():
+        return [path]
+    return sorted(f for f in path.iterdir() if f.suffix.lower() in CSV_SUFFIXES)
+
+
+def detect_encoding(path: Union[str, Path]) -> str:
+    """Text encoding of a file: UTF-16 by its BOM, else the first of ENCODINGS its start decodes with"""
+    with open(path, 'rb') as f:
+        sample = f.read(SNIFF_BYTES)
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    for encoding in ENCODINGS:
+        try:
+            # A multi-byte character may be cut at the end of the sample
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=len(sample) < SNIFF_BYTES)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Could not decode {path} as any of {ENCODINGS}")
+
+
+def iter_lines(path: Path) -> Iterator[List[str]]:
+    """Fields of each line, decoded with the detected encoding"""
+    with open(path, encoding=detect_encoding(path), newline='') as f:
+        yield from csv.reader(f, delimiter=CSV_SUFFIXES.get(path.suffix.lower(), ','))
+
+
+def has_sheet_column(first_line: List[str]) -> bool:
+    """Whether a file's first line names a leading sheet-name column"""
+    return bool(first_line) and first_line[0].strip().lower() in SHEET_COLUMNS
+
+
+def to_cells(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Text fields to the values a workbook cell holds: empty -> NaN, integers -> int,
+    other numbers -> float, everything else stays text. Vectorized per column.
+    """
+    for col in frame.columns:
+        text = frame[col]
+        if text.isna().all():
+            frame[col] = np.nan
+            continue
+        values = text.where(text.fillna('') != '', np.nan).astype(object)
+        numbers = pd.to_numeric(text.where(~text.str.match(LEADING_ZERO_PATTERN, na=False)), errors='coerce')
+        is_number = numbers.notna().to_numpy()
+        is_int = is_number & text.str.fullmatch(INTEGER_PATTERN, na=False).to_numpy()
+        values[is_number] = numbers[is_number].astype(float)
+        values[is_int] = text[is_int].map(int)
+        frame[col] = values
+    return frame
+
+
+def read_sheet_lines(path: Path, wanted: Optional[set] = None,
+                     max_rows: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Stream a file in CHUNK_ROWS chunks into raw (header not yet applied) sheets.
+    In a file with a sheet-name column, its first line holds the column names shared by all
+    sheets and becomes each sheet's first row. wanted limits the sheets kept, max_rows their rows.
+    """
+    lines = iter_lines(path)
+    first_line = next(lines, None)
+    if first_line is None:
+        return {path.stem: pd.DataFrame()}
+    split = has_sheet_column(first_line)
+    names_line = first_line[1:] if split else None
+    if not split:
+        lines = _prepend(first_line, lines)
+
+    frames: Dict[str, List[pd.DataFrame]] = {}
+    counts: Dict[str, int] = {}
+    while True:
+        chunk = [line for _, line in zip(range(CHUNK_ROWS), lines)]
+        if not chunk:
+            break
+        if split:
+            # Lines without a sheet name (blank lines) belong to no sheet
+            chunk = [line for line in chunk if line and line[0]]
+            sheets = [line[0] for line in chunk]
+            frame = to_cells(pd.DataFrame([line[1:] for line in chunk], dtype=object))
+            groups = frame.groupby(pd.Series(sheets), sort=False)
+        else:
+            frame = to_cells(pd.DataFrame(chunk, dtype=object))
+            groups = [(path.stem, frame)]
+        for sheet, rows in groups:
+            if wanted is not None and sheet not in wanted:
+                continue
+            if sheet not in frames:
+                # The shared column names line starts every sheet
+                frames[sheet] = [pd.DataFrame([names_line], dtype=object)] if split else []
+                counts[sheet] = len(frames[sheet])
+            if max_rows is not None:
+                rows = rows.iloc[:max(max_rows - counts[sheet], 0)]
+            frames[sheet].append(rows)
+            counts[sheet] += len(rows)
+        # Without a sheet column the one sheet is complete once it has max_rows lines
+        if not split and max_rows is not None and counts.get(path.stem, 0) >= max_rows:
+            break
+    lines.close()
+    return {sheet: pd.concat(parts, ignore_index=True) for sheet, parts in frames.items()}
+
+
+def _prepend(first, rest: Iterator) -> Iterator:
+    """Put a line already read back in front of the line iterator"""
+    yield first
+    yield from rest
+
+
+def csv_sheet_names(path: Union[str, Path]) -> List[str]:
+    """Sheet names of a text source: file names in a directory, else the sheet column or the file name"""
+    names = []
+    for file in sheet_files(path):
+        lines = iter_lines(file)
+        first_line = next(lines, None)
+        if first_line is not None and has_sheet_column(first_line):
+            names.extend(dict.fromkeys(line[0] for line in lines if line and line[0]))
+        else:
+            names.append(file.stem)
+        lines.close()
+    return names
+
+
+def read_csv(path: Union[str, Path], sheet_name: Union[str, int, None] = 0,
+             header: Optional[int] = 0, nrows: Optional[int] = None):
+    """
+    read_excel for delimited text: a DataFrame, or a dict of DataFrames when sheet_name is None.
+    Headers and column types come out the way pandas reads the same cells from a workbook.
+    """
+    if isinstance(sheet_name, int):
+        names = csv_sheet_names(path)
+        if sheet_name >= len(names):
+            raise ValueError(f"Worksheet index {sheet_name} is invalid, {len(names)} worksheets found")
+        sheet_name = names[sheet_name]
+    wanted = None if sheet_name is None else {sheet_name}
+    max_rows = None if nrows is None else nrows + (0 if header is None else header + 1)
+
+    sheets = {}
+    for file in sheet_files(path):
+        for name, frame in read_sheet_lines(file, wanted, max_rows).items():
+            if frame.empty:
+                sheets[name] = pd.DataFrame()
+                continue
+            rows = frame.astype(object).where(frame.notna(), np.nan).values.tolist()
+            sheets[name] = TextParser(rows, header=header, skip_blank_lines=False).read()
+
+    if sheet_name is None:
+        return sheets
+    if sheet_name not in sheets:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return sheets[sheet_name]
@@ -0,0 +1,50 @@
+import pandas as pd
+import os
+import pickle
+import tempfile
+from typing import List
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes (0 where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class ErrorSpool:
+    """
+    Append-only on-disk store for validation errors.
+    Batches are pickled one after another into a temporary file, so the error
+    list never has to sit in memory while validation is still running.
+    """
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def write(self, errors: List[dict]):
+        """Append a batch of error records"""
+        if errors:
+            pickle.dump(pd.DataFrame(errors), self.file, protocol=pickle.HIGHEST_PROTOCOL)
+            self.count += len(errors)
+
+    def read(self) -> pd.DataFrame:
+        """All spooled errors in the order they were written"""
+        self.file.seek(0)
+        batches = []
+        while True:
+            try:
+                batches.append(pickle.load(self.file))
+            except EOFError:
+                break
+        self.file.seek(0, os.SEEK_END)
+        return pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+
+    def close(self):
+        self.file.close()
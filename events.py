@@ -0,0 +1,57 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable
+
+# Events published by ExcelConverter and ExcelValidator, with their keyword payloads:
+#   sheet_started   sheet, index, total, rows
+#   sheet_finished  sheet, index, total, seconds, plus invoices (converter) or errors (validator)
+#   rows_processed  sheet, rows, total
+#   error           sheet, row, pn, type, message (validator only)
+#   stage           name, seconds, plus stage details
+EVENTS = ('sheet_started', 'sheet_finished', 'rows_processed', 'error', 'stage')
+
+# Rows between rows_processed events inside a sheet
+PROGRESS_INTERVAL = 500
+
+
+class EventEmitter:
+    """
+    Minimal publish/subscribe hook for progress and instrumentation.
+    Listeners are plain callables taking keyword arguments. With no listener
+    attached, emit() is a single dict lookup and stage() does no timing.
+    """
+
+    def __init__(self):
+        self.listeners = defaultdict(list)
+
+    def on(self, event: str, callback: Callable) -> Callable:
+        """Subscribe a callback to an event; returns it so it can be used as a decorator"""
+        if event not in EVENTS:
+            raise ValueError(f"Unknown event '{event}', expected one of {EVENTS}")
+        self.listeners[event].append(callback)
+        return callback
+
+    def off(self, event: str, callback: Callable):
+        """Unsubscribe a callback"""
+        if callback in self.listeners.get(event, ()):
+            self.listeners[event].remove(callback)
+
+    def has_listeners(self, event: str) -> bool:
+        return bool(self.listeners.get(event))
+
+    def emit(self, event: str, **payload):
+        for callback in self.listeners.get(event, ()):
+            callback(**payload)
+
+    @contextmanager
+    def stage(self, name: str, **details):
+        """Time a block and publish it as a stage event (untimed when nobody listens)"""
+        if not self.has_listeners('stage'):
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit('stage', name=name, seconds=time.perf_counter() - start, **details)
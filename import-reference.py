@@ -0,0 +1,60 @@
+import pandas as pd
+import argparse
+from xlsx_reader import READERS
+from canonical import normalize_item_names
+from reference_store import DEFAULT_PATH, ReferenceStore, tariff_date_from_name
+from validator import ExcelValidator
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Import shipping lists and tariff versions into the local reference store',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    python import-reference.py shipping 24HC01713 shipping_list_normalized.xlsx
+    python import-reference.py tariff 税率汇总-20230822.xlsx
+    python import-reference.py tariff duty_rates.xlsx --effective-from 2024-04-01
+    python import-reference.py list
+        """
+    )
+    parser.add_argument('--db', default=str(DEFAULT_PATH), help='Reference database path')
+    parser.add_argument('--reader', choices=READERS, default='openpyxl',
+                        help='Excel reader engine (fast = streaming zip/XML reader)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    shipping = commands.add_parser('shipping', help='Import a normalized shipping list as a shipment')
+    shipping.add_argument('shipment_id', help='Shipment id used with validator.py --shipment')
+    shipping.add_argument('shipping_list', help='Normalized shipping list (xlsx or table file)')
+    tariff = commands.add_parser('tariff', help='Import a dated duty rates file as a tariff version')
+    tariff.add_argument('duty_file', help='Duty rates Excel file')
+    tariff.add_argument('--effective-from', default=None,
+                        help='First day the rates apply (YYYY-MM-DD; default: date in the file name)')
+    commands.add_parser('list', help='Show stored shipments and tariff versions')
+    args = parser.parse_args()
+
+    store = ReferenceStore(args.db)
+    # Load exactly what a validation run would load from the same files
+    loader = ExcelValidator(None, None, None, reader=args.reader, layout_cache=None)
+    if args.command == 'shipping':
+        sheets = loader.load_shipping_data(args.shipping_list)
+        store.import_shipping(args.shipment_id, sheets, loader.clean_pn_value,
+                              titles=loader.shipping_titles, source=args.shipping_list,
+                              declared_totals=loader.declared_totals)
+    elif args.command == 'tariff':
+        effective_from = args.effective_from or tariff_date_from_name(args.duty_file)
+        if not effective_from:
+            parser.error('No date in the file name, pass --effective-from YYYY-MM-DD')
+        duty_df = loader.load_duty_rates(args.duty_file)
+        if duty_df.empty:
+            parser.error(f'No duty rate table found in {args.duty_file}')
+        name_keys = (normalize_item_names(duty_df['Item name'])
+                     if 'Item name' in duty_df.columns else pd.Series([None] * len(duty_df)))
+        store.import_tariff(duty_df, effective_from, name_keys, source=args.duty_file)
+    else:
+        print(store.shipments().to_string(index=False))
+        print(store.tariff_versions().to_string(index=False))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
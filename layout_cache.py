@@ -0,0 +1,108 @@
+import pandas as pd
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Optional, Union
+
+# Learned layouts live outside the repo so every run on this machine reuses them
+DEFAULT_PATH = Path.home() / '.custom_list' / 'layouts.json'
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_cell(value, keep_digits: bool = True) -> str:
+    """Cell text as it takes part in a fingerprint ('' for empty cells)"""
+    if pd.isna(value):
+        return ''
+    text = re.sub(r'\s+', ' ', str(value)).strip()
+    # Title rows carry invoice numbers and dates that change every shipment
+    return text if keep_digits else re.sub(r'\d', '', text).lower()
+
+
+class LayoutRegistry:
+    """
+    Known sheet layouts keyed by a fingerprint of the rows above and including the header.
+    A known layout resolves its header row and column mapping with one hash lookup;
+    unknown layouts are detected as before and learned, then saved to a small JSON file.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = DEFAULT_PATH):
+        self.path = Path(path) if path else None
+        self.layouts = {}
+        # Header row positions seen per kind of sheet: the only depths worth fingerprinting
+        self.depths = defaultdict(set)
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.layouts)
+
+    def load(self):
+        """Read learned layouts; a missing or unreadable file just starts empty"""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            self.layouts = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable layout cache {self.path}: {e}")
+            self.layouts = {}
+        for layout in self.layouts.values():
+            self.depths[layout['kind']].add(layout['header_row'])
+
+    def save(self):
+        """Write the registry back if anything new was learned"""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # A unique temp file per writer, so concurrent runs never write into the same file
+            with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix=f'{self.path.name}.',
+                                             suffix='.tmp', delete=False, encoding='utf-8') as tmp:
+                json.dump(self.layouts, tmp, ensure_ascii=False, indent=1)
+            try:
+                os.replace(tmp.name, self.path)
+            except OSError:
+                os.unlink(tmp.name)
+                raise
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"Could not save layout cache {self.path}: {e}")
+
+    def fingerprint(self, kind: str, df: pd.DataFrame, header_row: int) -> Optional[str]:
+        """Hash of the title rows (digits dropped) and the exact header cells, with positions"""
+        if header_row >= len(df):
+            return None
+        # The column count is part of the layout so a stored column mapping always fits
+        cells = [kind, str(header_row), str(df.shape[1])]
+        for row_idx, row in enumerate(df.iloc[:header_row + 1].itertuples(index=False)):
+            keep_digits = row_idx == header_row
+            cells.extend(f'{row_idx}:{col_idx}={text}' for col_idx, text in
+                         enumerate(normalize_cell(value, keep_digits) for value in row) if text)
+        return hashlib.sha1('\x1f'.join(cells).encode('utf-8')).hexdigest()
+
+    def lookup(self, kind: str, df: pd.DataFrame) -> Optional[dict]:
+        """Stored layout ({'header_row', 'columns'}) for a sheet, or None for an unknown layout"""
+        for header_row in sorted(self.depths.get(kind, ())):
+            layout = self.layouts.get(self.fingerprint(kind, df, header_row))
+            if layout:
+                self.hits += 1
+                return layout
+        self.misses += 1
+        return None
+
+    def learn(self, kind: str, df: pd.DataFrame, header_row: int, columns: Optional[List[str]] = None):
+        """Remember a detected header row and its column -> canonical name mapping"""
+        key = self.fingerprint(kind, df, header_row)
+        if key is None or key in self.layouts:
+            return
+        self.layouts[key] = {'kind': kind, 'header_row': int(header_row),
+                             'columns': list(columns) if columns is not None else None}
+        self.depths[kind].add(int(header_row))
+        self.dirty = True
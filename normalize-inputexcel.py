@@ -2,21 +2,32 @@ import pandas as pd
 import re
 from pathlib import Path
 import logging
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Tuple
 import argparse
+import time
+from events import PROGRESS_INTERVAL, EventEmitter
+from xlsx_reader import READERS, read_excel, sheet_names as read_sheet_names
+from csv_reader import is_csv_source
+from table_store import FORMATS, resolve_format, write_tables
 
 class ExcelConverter:
-    def __init__(self):
+    def __init__(self, reader: str = 'openpyxl'):
+        self.reader = reader
         # Set up logging
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
+        # Progress/instrumentation hooks (see events.EVENTS)
+        self.events = EventEmitter()
         
         # Simplified pattern to match any row containing "Invoice:"
         self.invoice_pattern = re.compile(r'Invoice:', re.IGNORECASE)
         
+        # Any of these in a row marks the column header row
+        self.header_columns = ['P/N', 'Desc', 'HSN']
+        
         # Headers to skip (yellow frame content)
         self.skip_patterns = [
             'Job No SI/M',
@@ -33,13 +44,12 @@ class ExcelConverter:
         
     def is_header_row(self, row: pd.Series) -> bool:
         """Check if row contains main column headers"""
-        # Updated to match your exact column headers
-        required_columns = ['P/N', 'Desc', 'HSN']  # Changed 'DESC' to 'Desc'
         row_str = ' '.join(str(val) for val in row.values)
-        self.logger.debug(f"Checking header row: {row_str}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Checking header row: {row_str}")
         
         # More lenient header check
-        matches = [col for col in required_columns if col.upper() in row_str.upper()]
+        matches = [col for col in self.header_columns if col.upper() in row_str.upper()]
         if matches:
             self.logger.info(f"Found header row with columns: {matches}")
             return True
@@ -51,7 +61,8 @@ class ExcelConverter:
         Returns: (is_invoice, invoice_number)
         """
         row_str = ' '.join(str(val) for val in row.values)
-        self.logger.debug(f"Checking invoice row: {row_str}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Checking invoice row: {row_str}")
         if self.invoice_pattern.search(row_str):
             # Extract just the invoice number (e.g., "24HC01713-1S")
             match = re.search(r'(\d+HC\d+-\d+[A-Z]*)', row_str)
@@ -67,7 +78,7 @@ class ExcelConverter:
         row_str = ' '.join(str(val) for val in row.values)
         should_skip = any(pattern in row_str for pattern in self.skip_patterns)
         if should_skip:
-            self.logger.debug(f"Skipping row: {row_str}")
+            self.logger.debug("--Skipping row: %s", row_str)
         return should_skip
     
     def clean_description(self, desc: str) -> str:
@@ -171,29 +182,61 @@ class ExcelConverter:
         ordered_columns = first_columns + other_columns
         
         # Debug print to check available columns
-        self.logger.debug(f"Available columns: {new_df.columns.tolist()}")
-        self.logger.debug(f"Attempting to reorder columns: {ordered_columns}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Available columns: {new_df.columns.tolist()}")
+            self.logger.debug(f"Attempting to reorder columns: {ordered_columns}")
         
         # Reorder the DataFrame columns
         new_df = new_df[ordered_columns]
         
         return new_df
     
-    def process_sheet(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
-        """Process a single sheet and return processed invoice data"""
+    def sample_rows(self, rows: Iterable[tuple], max_lines: int) -> List[tuple]:
+        """
+        From a streamed sheet, keep only the rows process_sheet(max_lines=...) can use: everything up
+        to the header row, invoice rows, and the first max_lines lines after each invoice row.
+        Same text tests as is_header_row/is_invoice_row/should_skip_row, without a Series per row.
+        """
+        kept = []
+        header_found = False
+        remaining = 0
+        for row in rows:
+            row_str = ' '.join(str(val) for val in row)
+            skip = any(pattern in row_str for pattern in self.skip_patterns)
+            if not header_found:
+                kept.append(row)
+                header_found = not skip and any(col.upper() in row_str.upper() for col in self.header_columns)
+            elif self.invoice_pattern.search(row_str):
+                kept.append(row)
+                remaining = max_lines
+            elif remaining > 0:
+                kept.append(row)
+                # Skipped (yellow frame) rows do not take up an invoice line
+                if not skip:
+                    remaining -= 1
+        return kept
+    
+    def process_sheet(self, df: pd.DataFrame, sheet_name: str = None,
+                      max_lines: int = None) -> Dict[str, pd.DataFrame]:
+        """Process a single sheet and return processed invoice data (at most max_lines rows per invoice)"""
         # Initialize variables
         header_row = None
         current_invoice = None
         current_data = []
         sheet_data = {}  # Dictionary to store data for each invoice
+        # Decide once per sheet, not per row, whether anyone wants row-level output
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        report_progress = self.events.has_listeners('rows_processed')
         
         # Process each row
-        for idx, row in df.iterrows():
-            self.logger.debug(f"Processing row {idx}")
+        for pos, (idx, row) in enumerate(df.iterrows(), 1):
+            if debug:
+                self.logger.debug(f"Processing row {idx}")
+            if report_progress and pos % PROGRESS_INTERVAL == 0:
+                self.events.emit('rows_processed', sheet=sheet_name, rows=pos, total=len(df))
             
             # Skip yellow frame content
             if self.should_skip_row(row):
-                self.logger.info(f"--Skipping row: {' '.join(str(val) for val in row.values)}")
                 continue
             
             # Check if this is the header row
@@ -217,37 +260,58 @@ class ExcelConverter:
                 self.logger.info(f"Starting new invoice: {current_invoice}")
                 
             elif current_invoice and header_row is not None:
+                if max_lines is not None and len(current_data) >= max_lines:
+                    continue
                 # Add row to current batch
                 current_data.append(row)
-                self.logger.debug(f"Added row to invoice {current_invoice}")
+                if debug:
+                    self.logger.debug(f"Added row to invoice {current_invoice}")
         
         # Save last batch
         if current_invoice and current_data:
             self.logger.info(f"Saving final {len(current_data)} rows for invoice {current_invoice}")
             sheet_data[current_invoice] = self.process_dataframe(pd.DataFrame(current_data), header_row)
         
+        if report_progress:
+            self.events.emit('rows_processed', sheet=sheet_name, rows=len(df), total=len(df))
         return sheet_data
 
-    def process_excel(self, input_path: Path, output_path: Path):
+    def output_sheet_name(self, invoice_num: str) -> str:
+        """Turn an invoice number into a valid Excel sheet name"""
+        sheet_name = re.sub(r'[\\/*\[\]:?]', '', invoice_num)
+        if len(sheet_name) > 31:
+            sheet_name = sheet_name[:31]
+        return sheet_name
+
+    def process_excel(self, input_path: Path, output_path: Path, fmt: str = 'xlsx'):
         """Main function to process the Excel file"""
         try:
             # Read all sheets from the Excel file
             self.logger.info(f"Reading input file: {input_path}")
-            excel_file = pd.ExcelFile(input_path)
-            sheet_names = excel_file.sheet_names
+            sheet_names = read_sheet_names(input_path, reader=self.reader)
             self.logger.info(f"Found {len(sheet_names)} sheets: {sheet_names}")
+            # A CSV/TSV export holds all its sheets in one stream, so it is split in a single pass
+            text_sheets = read_excel(input_path, sheet_name=None, header=None) if is_csv_source(input_path) else None
             
             # Process each sheet
             all_processed_data = {}
             
-            for sheet_name in sheet_names:
+            for index, sheet_name in enumerate(sheet_names):
                 self.logger.info(f"Processing sheet: {sheet_name}")
+                started = time.perf_counter()
                 # Read the current sheet
-                df = pd.read_excel(input_path, sheet_name=sheet_name, header=None)
+                with self.events.stage('read', sheet=sheet_name):
+                    df = (text_sheets[sheet_name] if text_sheets is not None else
+                          read_excel(input_path, sheet_name=sheet_name, header=None, reader=self.reader))
                 self.logger.info(f"Total rows in sheet: {len(df)}")
+                self.events.emit('sheet_started', sheet=sheet_name, index=index,
+                                 total=len(sheet_names), rows=len(df))
                 
                 # Process the sheet
-                sheet_data = self.process_sheet(df)
+                with self.events.stage('process', sheet=sheet_name):
+                    sheet_data = self.process_sheet(df, sheet_name)
+                self.events.emit('sheet_finished', sheet=sheet_name, index=index, total=len(sheet_names),
+                                 seconds=time.perf_counter() - started, invoices=len(sheet_data))
                 
                 # Add processed data to overall results
                 if sheet_data:
@@ -263,14 +327,23 @@ class ExcelConverter:
             
             self.logger.info(f"Found total {len(all_processed_data)} invoices across all sheets")
             
+            # Binary formats keep one table per invoice with its dtypes, no formatting
+            if fmt != 'xlsx':
+                self.logger.info(f"Writing {fmt} output file: {output_path}")
+                with self.events.stage('write', format=fmt):
+                    write_tables({self.output_sheet_name(invoice_num): data
+                                  for invoice_num, data in all_processed_data.items()},
+                                 output_path, fmt)
+                self.logger.info("Processing completed successfully")
+                return
+            
             # Write to output file
             self.logger.info(f"Writing output file: {output_path}")
-            with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
+            with self.events.stage('write', format=fmt), \
+                    pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
                 # Write each invoice to its own sheet
                 for invoice_num, data in all_processed_data.items():
-                    sheet_name = re.sub(r'[\\/*\[\]:?]', '', invoice_num)
-                    if len(sheet_name) > 31:
-                        sheet_name = sheet_name[:31]
+                    sheet_name = self.output_sheet_name(invoice_num)
                     self.logger.info(f"Writing sheet {sheet_name} with {len(data)} rows")
                     
                     # Write to sheet
@@ -317,6 +390,10 @@ def main():
     parser.add_argument('input_file', type=str, help='Path to the input Excel file')
     parser.add_argument('output_file', type=str, help='Path to save the processed Excel file')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--reader', choices=READERS, default='openpyxl',
+                        help='Excel reader engine (fast = streaming zip/XML reader)')
+    parser.add_argument('--format', choices=FORMATS, default='xlsx',
+                        help='Output format (feather/parquet/pickle skip Excel serialization)')
     
     args = parser.parse_args()
     
@@ -325,8 +402,9 @@ def main():
         logging.getLogger().setLevel(logging.DEBUG)
     
     # Create and run converter
-    converter = ExcelConverter()
-    converter.process_excel(Path(args.input_file), Path(args.output_file))
+    converter = ExcelConverter(reader=args.reader)
+    converter.process_excel(Path(args.input_file), Path(args.output_file),
+                            fmt=resolve_format(args.format))
 
 if __name__ == "__main__":
     main()
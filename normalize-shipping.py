@@ -2,6 +2,11 @@ import pandas as pd
 import re
 from pathlib import Path
 import warnings
+from xlsx_reader import READERS, read_excel
+from table_store import FORMATS, SUFFIXES, resolve_format, write_tables
+from layout_cache import DEFAULT_PATH as DEFAULT_LAYOUT_CACHE, LayoutRegistry
+from rules import RuleSet
+from pn_index import ALTERNATES_COLUMN, canonical_alternates
 
 # Add this to ignore pandas warnings too
 pd.options.mode.chained_assignment = None
@@ -9,7 +14,8 @@ pd.options.mode.chained_assignment = None
 # Add this at the top to suppress openpyxl warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
-def normalize_shipping_file(input_file: str, output_file: str):
+def normalize_shipping_file(input_file: str, output_file: str, reader: str = 'openpyxl',
+                            fmt: str = 'xlsx', layout_cache=DEFAULT_LAYOUT_CACHE, rules: str = None):
     """
     Process shipping list file to:
     1. Remove PL tab
@@ -17,48 +23,77 @@ def normalize_shipping_file(input_file: str, output_file: str):
     3. Maintain required columns
     """
     # Load all sheets except PL tab
-    all_sheets = pd.read_excel(input_file, sheet_name=None)
+    all_sheets = read_excel(input_file, sheet_name=None, reader=reader)
+    layouts = LayoutRegistry(layout_cache) if layout_cache else None
+    processed_sheets = normalize_shipping_sheets(all_sheets, layouts, RuleSet.load(rules))
+    
+    if layouts is not None:
+        layouts.save()
+    
+    # Save to new Excel file, or one table per sheet for binary formats
+    if fmt != 'xlsx':
+        write_tables(processed_sheets, output_file, fmt)
+    else:
+        with pd.ExcelWriter(output_file) as writer:
+            for sheet_name, df in processed_sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+    
+    print(f"Processed file saved to: {output_file}")
+
+def normalize_shipping_sheets(all_sheets: dict, layouts: LayoutRegistry = None,
+                              rule_set: RuleSet = None) -> dict:
+    """Shipping content of every invoice tab (PL tab dropped), ready to write or validate"""
     sheets_to_process = {name: df for name, df in all_sheets.items() 
                         if not re.search(r'\bPL\b', name, flags=re.IGNORECASE)}
     
     processed_sheets = {}
-    
     for sheet_name, df in sheets_to_process.items():
         # Step 1: Find the shipping content table
-        shipping_df = extract_shipping_table(df)
+        shipping_df = extract_shipping_table(df, layouts, rule_set)
         
         # Step 2: Keep only required columns
         filtered_df = filter_columns(shipping_df)
         
+        # Step 3: Approved substitutes as canonical P/Ns, ';'-separated per line
+        if ALTERNATES_COLUMN in filtered_df.columns:
+            filtered_df[ALTERNATES_COLUMN] = canonical_alternates(filtered_df[ALTERNATES_COLUMN])
+        
         if not filtered_df.empty:
             processed_sheets[sheet_name] = filtered_df
-    
-    # Save to new Excel file
-    with pd.ExcelWriter(output_file) as writer:
-        for sheet_name, df in processed_sheets.items():
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    print(f"Processed file saved to: {output_file}")
+    return processed_sheets
 
-def extract_shipping_table(df: pd.DataFrame) -> pd.DataFrame:
+def extract_shipping_table(df: pd.DataFrame, layouts: LayoutRegistry = None,
+                           rule_set: RuleSet = None) -> pd.DataFrame:
     """Find and extract the shipping content table from a sheet"""
-    # Find the first row that looks like a table header
-    header_row = find_header_row(df)
-    if header_row is None:
-        return pd.DataFrame()
+    rule_set = rule_set or RuleSet()
+    kind = rule_set.layout_kind('shipping_list', 'shipping_aliases')
+    # Known layouts give the header row and cleaned headers with one lookup
+    layout = layouts.lookup(kind, df) if layouts is not None else None
+    if layout:
+        header_row = layout['header_row']
+        headers = layout['columns']
+    else:
+        # Find the first row that looks like a table header
+        header_row = find_header_row(df)
+        if header_row is None:
+            return pd.DataFrame()
+        headers = clean_headers(df.iloc[header_row], rule_set.shipping_aliases)
+        if layouts is not None:
+            layouts.learn(kind, df, header_row, headers)
     
     # Extract table data
     shipping_df = df.iloc[header_row:].copy()
-    shipping_df.columns = clean_headers(shipping_df.iloc[0])
+    shipping_df.columns = headers
     
     # Remove empty rows and reset index
     cleaned_df = shipping_df.iloc[1:].dropna(how='all').reset_index(drop=True)
     
     # Add validation for Item No. column (using the standardized name)
     if 'Item No.' in cleaned_df.columns:
-        # Keep only rows where Item No. looks valid (number or specific pattern)
+        # Keep only rows where Item No. looks valid (number or specific pattern),
+        # plus the invoice's TOTAL line, which the validator reconciles the lines against
         cleaned_df = cleaned_df[
-            cleaned_df['Item No.'].astype(str).str.match(r'^\s*\d+|Item\s+No', na=False)
+            cleaned_df['Item No.'].astype(str).str.match(r'^\s*\d+|Item\s+No|^\s*(?i:TOTAL)\b', na=False)
         ]
     
     return cleaned_df
@@ -98,17 +133,10 @@ def clean_column_name(name: str) -> str:
     """Clean column name by removing newlines and extra spaces"""
     return str(name).replace('\n', '').replace('\r', '').strip()
 
-def clean_headers(headers) -> list:
-    """Normalize column headers"""
-    column_map = {
-        'Item No.': ['Item Nos.', 'Item Nos', 'Item Number', 'Item', 'Item#', 'Item Code'],
-        'Model No.': ['Model No.', 'Model Number', 'Model Nos'],
-        'P/N': ['P/N', 'Part Number', 'Part No'],
-        'Description': ['Description', 'Desc'],
-        'Quantity PCS': ['Quantity PCS', 'QTY', 'Quantity'],
-        'Unit Price USD': ['Unit Price USD', 'Unit Price', 'Price'],
-        'Amount USD': ['Amount USD', 'Amount', 'Total']
-    }
+def clean_headers(headers, column_map: dict = None) -> list:
+    """Normalize column headers (column_map: standard name -> variants, from the rule set)"""
+    if column_map is None:
+        column_map = RuleSet().shipping_aliases
     
     cleaned = []
     for header in headers:
@@ -128,7 +156,7 @@ def clean_headers(headers) -> list:
 def filter_columns(df: pd.DataFrame) -> pd.DataFrame:
     """Keep only required columns"""
     required = ['Item No.', 'Model No.', 'P/N', 'Description', 
-               'Quantity PCS', 'Unit Price USD', 'Amount USD']
+               'Quantity PCS', 'Unit Price USD', 'Amount USD', ALTERNATES_COLUMN]
     
     # Clean column names in DataFrame
     df.columns = [clean_column_name(col) for col in df.columns]
@@ -156,12 +184,25 @@ if __name__ == "__main__":
     parser.add_argument('input_file', help='Path to input shipping list Excel file')
     parser.add_argument('output_file', nargs='?', default=None,
                       help='Path for normalized output file (default: input path with _normalized suffix)')
+    parser.add_argument('--reader', choices=READERS, default='openpyxl',
+                      help='Excel reader engine (fast = streaming zip/XML reader)')
+    parser.add_argument('--format', choices=FORMATS, default='xlsx',
+                      help='Output format (feather/parquet/pickle skip Excel serialization)')
+    parser.add_argument('--layout-cache', default=str(DEFAULT_LAYOUT_CACHE),
+                      help='File of learned sheet layouts used to skip header detection')
+    parser.add_argument('--no-layout-cache', action='store_true',
+                      help='Always detect headers and do not learn layouts')
+    parser.add_argument('--rules', default=None,
+                      help='JSON rule file adding shipping header aliases to the defaults')
     
     args = parser.parse_args()
+    fmt = resolve_format(args.format)
     
     # Set default output path if not provided
     if not args.output_file:
         input_path = Path(args.input_file)
-        args.output_file = input_path.parent / f"{input_path.stem}_normalized.xlsx"
+        args.output_file = input_path.parent / f"{input_path.stem}_normalized{SUFFIXES[fmt]}"
     
-    normalize_shipping_file(args.input_file, args.output_file)
+    normalize_shipping_file(args.input_file, args.output_file, reader=args.reader, fmt=fmt,
+                            layout_cache=None if args.no_layout_cache else args.layout_cache,
+                            rules=args.rules)
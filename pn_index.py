@@ -0,0 +1,132 @@
+import pandas as pd
+import numpy as np
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+from parts_master import canonical_pns
+
+# Shipping list column naming approved substitute parts for a line's P/N
+ALTERNATES_COLUMN = 'Alternative materials'
+# Separators between the part numbers of one Alternative materials cell ('/' can be part of a P/N)
+ALTERNATE_SEPARATORS = r'[,;|\n\r，；、]+'
+
+
+def canonical_alternates(values) -> pd.Series:
+    """Canonical alternate P/Ns of each cell as ';'-separated text ('' when none), same index"""
+    values = pd.Series(values, dtype=object)
+    parts = values.reset_index(drop=True).fillna('').astype(str).str.split(ALTERNATE_SEPARATORS, regex=True)
+    pns = canonical_pns(parts.explode())
+    pns = pns[pns != 'N/A']
+    joined = pns.groupby(level=0).agg(lambda group: ';'.join(dict.fromkeys(group)))
+    return pd.Series(joined.reindex(parts.index, fill_value='').to_numpy(), index=values.index, dtype=object)
+
+
+class PNSuggestionIndex:
+    """
+    Character n-gram inverted index over cleaned P/Ns.
+    Suggests the closest shipping P/Ns for a P/N that has no exact match,
+    without comparing it against every part in the shipping list.
+    Grams shared by more than max_share of the P/Ns (a common prefix such as '^12') say
+    nothing about closeness and are not indexed, so a lookup never walks most of the list.
+    """
+
+    # Lists this small keep every gram: their postings are short anyway
+    MIN_POSTINGS = 100
+
+    def __init__(self, part_numbers: Iterable[str], n: int = 3, candidates: int = 10,
+                 max_share: float = 0.05):
+        self.n = n
+        self.candidates = candidates
+        self.part_numbers = sorted({pn for pn in part_numbers if pn and pn != 'N/A'})
+
+        postings = defaultdict(list)
+        gram_counts = np.zeros(len(self.part_numbers), dtype=np.int32)
+        for pn_id, pn in enumerate(self.part_numbers):
+            grams = self.ngrams(pn)
+            gram_counts[pn_id] = len(grams)
+            for gram in grams:
+                postings[gram].append(pn_id)
+
+        self.gram_counts = gram_counts
+        max_postings = max(self.MIN_POSTINGS, int(max_share * len(self.part_numbers)))
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+                         if len(ids) <= max_postings}
+
+    def __len__(self) -> int:
+        return len(self.part_numbers)
+
+    def ngrams(self, pn: str) -> set:
+        """Distinct n-grams of a P/N, padded so short P/Ns and prefixes/suffixes count"""
+        padded = f'^{pn}$'
+        if len(padded) <= self.n:
+            return {padded}
+        return {padded[i:i + self.n] for i in range(len(padded) - self.n + 1)}
+
+    def suggest(self, pn: str, k: int = 3, min_score: float = 0.5) -> List[Tuple[str, float]]:
+        """Return up to k (P/N, score) pairs, best first; score is the edit similarity (0-1)"""
+        if not self.part_numbers or not pn or pn == 'N/A':
+            return []
+
+        grams = self.ngrams(pn)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return []
+
+        # Dice coefficient on shared (indexed) n-grams picks a short list of candidates
+        ids, shared = np.unique(np.concatenate(hits), return_counts=True)
+        dice = 2.0 * shared / (len(grams) + self.gram_counts[ids])
+        if len(ids) > self.candidates:
+            top = np.argpartition(-dice, self.candidates)[:self.candidates]
+            ids = ids[top]
+
+        # Re-rank the short list by edit similarity
+        scored = []
+        for pn_id in ids:
+            candidate = self.part_numbers[pn_id]
+            score = SequenceMatcher(None, pn, candidate).ratio()
+            if score >= min_score:
+                scored.append((candidate, round(score, 3)))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:k]
+
+
+class GlobalPNIndex:
+    """
+    Canonical P/N -> [(shipping sheet, row position), ...] across the whole shipping list.
+    Built once per run so a line booked under the wrong invoice is found in O(1).
+    """
+
+    def __init__(self, sheet_pns: Dict[str, Iterable[str]]):
+        self.locations = defaultdict(list)
+        for sheet_name, pns in sheet_pns.items():
+            for pos, pn in enumerate(pns):
+                if pn and pn != 'N/A':
+                    self.locations[pn].append((sheet_name, pos))
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def lookup(self, pn: str, exclude_sheet: Optional[str] = None) -> List[Tuple[str, int]]:
+        """All (sheet, row position) locations of a P/N, optionally skipping one sheet"""
+        return [loc for loc in self.locations.get(pn, ()) if loc[0] != exclude_sheet]
+
+
+class AlternateIndex:
+    """
+    Alternate P/N -> row positions of the shipping lines listing it as an approved substitute.
+    Built once per shipping sheet from the Alternative materials column, so a checklist line
+    declared under a substitute resolves with one lookup instead of scanning alternates text.
+    """
+
+    def __init__(self, alternates: Iterable[str]):
+        self.rows = defaultdict(list)
+        for pos, cell in enumerate(canonical_alternates(list(alternates))):
+            for pn in cell.split(';') if cell else ():
+                self.rows[pn].append(pos)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def lookup(self, pn: str) -> List[int]:
+        """Row positions of the shipping lines a P/N substitutes for"""
+        return self.rows.get(pn, [])
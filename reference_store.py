@@ -0,0 +1,245 @@
+import pandas as pd
+import numpy as np
+import json
+import logging
+import re
+import sqlite3
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from canonical import extract_invoice_key
+
+# One database per machine, next to the layout cache and result cache
+DEFAULT_PATH = Path.home() / '.custom_list' / 'reference.db'
+
+# Dated tariff workbooks such as 税率汇总-20230822.xlsx
+TARIFF_DATE_PATTERN = re.compile(r'(20\d{2})-?(\d{2})-?(\d{2})')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    shipment_id TEXT PRIMARY KEY,
+    source TEXT,
+    imported_at TEXT
+);
+CREATE TABLE IF NOT EXISTS shipping_sheets (
+    shipment_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    sheet_order INTEGER NOT NULL,
+    title_key TEXT,
+    columns TEXT NOT NULL,
+    declared_totals TEXT,
+    PRIMARY KEY (shipment_id, sheet_name)
+);
+CREATE TABLE IF NOT EXISTS shipping_lines (
+    shipment_id TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    clean_pn TEXT NOT NULL,
+    invoice TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_shipping_lines_sheet ON shipping_lines (shipment_id, sheet_name, position);
+CREATE INDEX IF NOT EXISTS idx_shipping_lines_shipment_pn ON shipping_lines (shipment_id, clean_pn);
+CREATE TABLE IF NOT EXISTS tariff_versions (
+    version_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    effective_from TEXT NOT NULL UNIQUE,
+    columns TEXT NOT NULL,
+    imported_at TEXT
+);
+CREATE TABLE IF NOT EXISTS tariff_lines (
+    version_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    name_key TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tariff_lines_version ON tariff_lines (version_id, position);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def tariff_date_from_name(path: Union[str, Path]) -> Optional[str]:
+    """Effective date (YYYY-MM-DD) encoded in a tariff file name, if any"""
+    match = TARIFF_DATE_PATTERN.search(Path(path).stem)
+    return '-'.join(match.groups()) if match else None
+
+
+def _encode_rows(df: pd.DataFrame) -> List[str]:
+    """Rows as JSON arrays; NaN and timestamps survive the round trip through pandas"""
+    return [json.dumps(row, ensure_ascii=False, default=str)
+            for row in df.astype(object).where(df.notna(), None).values.tolist()]
+
+
+def _decode_rows(rows, columns: list) -> pd.DataFrame:
+    df = pd.DataFrame([json.loads(data) for (data,) in rows], columns=columns)
+    # JSON null comes back as None; keep pandas' NaN like the Excel path does
+    return df.where(df.notna(), np.nan)
+
+
+class ReferenceStore:
+    """
+    SQLite store of imported shipping lists and dated tariff versions.
+    Shipping lines are indexed by shipment and sheet, and by canonical P/N within a
+    shipment (the cross-invoice lookup); tariff lines by version, as a version is always
+    loaded whole. Each tariff version is effective from its date until the next version's date.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def import_shipping(self, shipment_id: str, sheets: Dict[str, pd.DataFrame],
+                        clean_pn, titles: Dict[str, str] = None, source: str = '',
+                        declared_totals: Dict[str, dict] = None):
+        """
+        Replace a shipment's sheets; clean_pn maps a raw P/N to its canonical form.
+        declared_totals holds each invoice's TOTAL line figures (integer units), which the
+        sheets no longer contain.
+        """
+        titles = titles or {}
+        declared_totals = declared_totals or {}
+        with self.conn:
+            self.conn.execute("DELETE FROM shipping_lines WHERE shipment_id = ?", (shipment_id,))
+            self.conn.execute("DELETE FROM shipping_sheets WHERE shipment_id = ?", (shipment_id,))
+            self.conn.execute("INSERT OR REPLACE INTO shipments VALUES (?, ?, ?)",
+                              (shipment_id, str(source), time.strftime('%Y-%m-%d %H:%M:%S')))
+            for order, (sheet_name, df) in enumerate(sheets.items()):
+                df = df.reset_index(drop=True)
+                invoice = extract_invoice_key(sheet_name) or titles.get(sheet_name, '')
+                declared = declared_totals.get(sheet_name)
+                self.conn.execute(
+                    "INSERT INTO shipping_sheets VALUES (?, ?, ?, ?, ?, ?)",
+                    (shipment_id, sheet_name, order, titles.get(sheet_name),
+                     json.dumps([str(col) for col in df.columns], ensure_ascii=False),
+                     None if declared is None else json.dumps(
+                         {col: None if pd.isna(value) else int(value) for col, value in declared.items()})))
+                pns = df['P/N'].map(clean_pn) if 'P/N' in df.columns else ['N/A'] * len(df)
+                self.conn.executemany(
+                    "INSERT INTO shipping_lines VALUES (?, ?, ?, ?, ?, ?)",
+                    ((shipment_id, sheet_name, pos, pn, invoice, data)
+                     for pos, (pn, data) in enumerate(zip(pns, _encode_rows(df)))))
+        logger.info(f"Imported shipment {shipment_id}: {len(sheets)} sheets")
+
+    def import_tariff(self, df: pd.DataFrame, effective_from: str, name_keys: pd.Series,
+                      source: str = '') -> int:
+        """Add (or replace) the tariff version effective from a date; returns its version id"""
+        effective_from = date.fromisoformat(effective_from).isoformat()
+        df = df.reset_index(drop=True)
+        columns = [None if pd.isna(col) else str(col) for col in df.columns]
+        with self.conn:
+            old = self.conn.execute("SELECT version_id FROM tariff_versions WHERE effective_from = ?",
+                                    (effective_from,)).fetchone()
+            if old:
+                self.conn.execute("DELETE FROM tariff_lines WHERE version_id = ?", old)
+                self.conn.execute("DELETE FROM tariff_versions WHERE version_id = ?", old)
+            cursor = self.conn.execute(
+                "INSERT INTO tariff_versions (source, effective_from, columns, imported_at) VALUES (?, ?, ?, ?)",
+                (str(source), effective_from, json.dumps(columns, ensure_ascii=False),
+                 time.strftime('%Y-%m-%d %H:%M:%S')))
+            version_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO tariff_lines VALUES (?, ?, ?, ?)",
+                ((version_id, pos, key, data)
+                 for pos, (key, data) in enumerate(zip(name_keys.tolist(), _encode_rows(df)))))
+        logger.info(f"Imported tariff version {version_id} effective from {effective_from}")
+        return version_id
+
+    def shipments(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            "SELECT s.shipment_id, s.source, s.imported_at, COUNT(l.position) AS lines "
+            "FROM shipments s LEFT JOIN shipping_lines l USING (shipment_id) "
+            "GROUP BY s.shipment_id ORDER BY s.imported_at", self.conn)
+
+    def tariff_versions(self) -> pd.DataFrame:
+        """Tariff versions with their effective-date ranges (effective_to is exclusive)"""
+        return pd.read_sql_query(
+            "SELECT version_id, source, effective_from, "
+            "LEAD(effective_from) OVER (ORDER BY effective_from) AS effective_to, imported_at "
+            "FROM tariff_versions ORDER BY effective_from", self.conn)
+
+    def load_shipping(self, shipment_id: str) -> Dict[str, pd.DataFrame]:
+        """A shipment's sheets in their original order"""
+        sheets = {}
+        for sheet_name, columns in self.conn.execute(
+                "SELECT sheet_name, columns FROM shipping_sheets WHERE shipment_id = ? ORDER BY sheet_order",
+                (shipment_id,)).fetchall():
+            rows = self.conn.execute(
+                "SELECT data FROM shipping_lines WHERE shipment_id = ? AND sheet_name = ? ORDER BY position",
+                (shipment_id, sheet_name))
+            sheets[sheet_name] = _decode_rows(rows, json.loads(columns))
+        if not sheets:
+            raise KeyError(f"Shipment '{shipment_id}' is not in {self.path}")
+        return sheets
+
+    def has_shipment(self, shipment_id: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM shipments WHERE shipment_id = ?",
+                                 (shipment_id,)).fetchone() is not None
+
+    def shipping_titles(self, shipment_id: str) -> Dict[str, str]:
+        """Invoice numbers found in the sheets' title blocks at import time"""
+        return dict(self.conn.execute(
+            "SELECT sheet_name, title_key FROM shipping_sheets WHERE shipment_id = ? AND title_key IS NOT NULL",
+            (shipment_id,)).fetchall())
+
+    def declared_totals(self, shipment_id: str) -> Dict[str, dict]:
+        """Each invoice's declared TOTAL line figures (integer units, pd.NA when blank)"""
+        return {sheet_name: {col: pd.NA if value is None else value for col, value in json.loads(totals).items()}
+                for sheet_name, totals in self.conn.execute(
+                    "SELECT sheet_name, declared_totals FROM shipping_sheets "
+                    "WHERE shipment_id = ? AND declared_totals IS NOT NULL", (shipment_id,)).fetchall()}
+
+    def tariff_version_as_of(self, as_of: str) -> Optional[int]:
+        """Version in effect on a date: the latest one effective on or before it"""
+        row = self.conn.execute(
+            "SELECT version_id FROM tariff_versions WHERE effective_from <= ? "
+            "ORDER BY effective_from DESC LIMIT 1", (date.fromisoformat(as_of).isoformat(),)).fetchone()
+        return row[0] if row else None
+
+    def load_tariff(self, as_of: str) -> pd.DataFrame:
+        """Tariff table in effect on a date, with the duty file's columns"""
+        version_id = self.tariff_version_as_of(as_of)
+        if version_id is None:
+            raise KeyError(f"No tariff version effective on {as_of} in {self.path}")
+        (columns,) = self.conn.execute("SELECT columns FROM tariff_versions WHERE version_id = ?",
+                                       (version_id,)).fetchone()
+        rows = self.conn.execute("SELECT data FROM tariff_lines WHERE version_id = ? ORDER BY position",
+                                 (version_id,))
+        return _decode_rows(rows, json.loads(columns))
+
+    def find_pn(self, clean_pn: str, shipment_id: str, exclude_sheet: str = None) -> List[Tuple[str, int]]:
+        """(sheet, row position) of every line of a canonical P/N in a shipment, through the P/N index"""
+        return self.conn.execute(
+            "SELECT l.sheet_name, l.position FROM shipping_lines l JOIN shipping_sheets s "
+            "ON s.shipment_id = l.shipment_id AND s.sheet_name = l.sheet_name "
+            "WHERE l.shipment_id = ? AND l.clean_pn = ? AND l.sheet_name IS NOT ? "
+            "ORDER BY s.sheet_order, l.position", (shipment_id, clean_pn, exclude_sheet)).fetchall()
+
+
+class StoredPNIndex:
+    """
+    GlobalPNIndex over a stored shipment: each lookup is one query on the store's
+    P/N index instead of an in-memory index built from every line of the shipment.
+    """
+
+    def __init__(self, store: ReferenceStore, shipment_id: str):
+        self.store = store
+        self.shipment_id = shipment_id
+
+    def __len__(self) -> int:
+        (count,) = self.store.conn.execute(
+            "SELECT COUNT(DISTINCT clean_pn) FROM shipping_lines WHERE shipment_id = ? AND clean_pn != 'N/A'",
+            (self.shipment_id,)).fetchone()
+        return count
+
+    def lookup(self, pn: str, exclude_sheet: Optional[str] = None) -> List[Tuple[str, int]]:
+        """All (sheet, row position) locations of a P/N, optionally skipping one sheet"""
+        if not pn or pn == 'N/A':
+            return []
+        return self.store.find_pn(pn, self.shipment_id, exclude_sheet)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+# Finished reports are kept outside the repo so reruns from any directory reuse them
+DEFAULT_DIR = Path.home() / '.custom_list' / 'results'
+DEFAULT_MAX_MB = 500
+REPORT_NAME = 'validation_report.xlsx'
+STATS_NAME = 'stats.json'
+
+# Sources whose behaviour shapes the report: any edit to them invalidates cached results
+# Validation settings that shape the report, with the values a run gets when it leaves them out
+RUN_SETTINGS = {
+    'tariff_check': False, 'suggestions': 3, 'shipment': None, 'as_of': None,
+    'annotate': False, 'max_errors': None,
+}
+# Files a run reads, in key order
+RUN_FILES = ('input_file', 'shipping_list', 'duty_file', 'parts_master', 'rules', 'reference_db')
+
+PIPELINE_MODULES = (
+    'validator.py', 'normalize-inputexcel.py', 'normalize-shipping.py', 'xlsx_reader.py',
+    'table_store.py', 'pn_index.py', 'layout_cache.py', 'error_spool.py', 'reference_store.py',
+    'parts_master.py', 'rules.py', 'csv_reader.py', 'canonical.py',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: Union[str, Path]) -> str:
+    """SHA-256 of a file's content, read in 1 MB blocks (a directory of CSV sheets: names and contents)"""
+    digest = hashlib.sha256()
+    path = Path(path)
+    for file in (sorted(f for f in path.iterdir() if f.is_file()) if path.is_dir() else [path]):
+        if path.is_dir():
+            digest.update(file.name.encode('utf-8'))
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Digest of the pipeline sources, standing in for a release number"""
+    digest = hashlib.sha256()
+    base = Path(__file__).parent
+    for name in PIPELINE_MODULES:
+        path = base / name
+        if path.exists():
+            digest.update(name.encode('utf-8'))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished validation reports.
+    Entries are keyed by the SHA-256 of the input, shipping and duty files plus the
+    validation settings and code version, and evicted least recently used first
+    once the cache directory grows past its size limit.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None, max_mb: int = DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_DIR
+        self.max_bytes = max_mb * 1024 ** 2
+
+    def key(self, files: Iterable[Union[str, Path]], **config) -> str:
+        """Cache key for a validation of these files with these settings"""
+        payload = {
+            'files': [file_digest(path) for path in files],
+            'config': config,
+            'code': code_version(),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def run_key(self, input_file, shipping_list=None, duty_file=None, parts_master=None, rules=None,
+                reference_db=None, **settings) -> str:
+        """
+        Cache key for a validation run, shared by the command line and the Streamlit app:
+        settings left out take their RUN_SETTINGS value, so the same run gets the same key
+        """
+        unknown = set(settings) - set(RUN_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown run settings {sorted(unknown)}, expected {sorted(RUN_SETTINGS)}")
+        paths = dict(zip(RUN_FILES, (input_file, shipping_list, duty_file, parts_master, rules, reference_db)))
+        present = [name for name, path in paths.items() if path]
+        return self.key([paths[name] for name in present], sources=present, **{**RUN_SETTINGS, **settings})
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached {'report': path, 'attachments': [paths], 'stats': dict} for a key, or None on a miss"""
+        entry = self.cache_dir / key
+        report_path = entry / REPORT_NAME
+        stats_path = entry / STATS_NAME
+        if not (report_path.exists() and stats_path.exists()):
+            return None
+        try:
+            stats = json.loads(stats_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        # The stats file's mtime records the last use for LRU eviction
+        os.utime(stats_path)
+        attachments = [entry / name for name in stats.get('attachments', [])]
+        if not all(path.exists() for path in attachments):
+            return None
+        return {'report': report_path, 'attachments': attachments, 'stats': stats}
+
+    def put(self, key: str, report_path: Union[str, Path], stats: dict,
+            attachments: Iterable[Union[str, Path]] = ()):
+        """Store a finished report, any extra output files and the stats, then trim the cache"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            staging = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-'))
+            shutil.copyfile(report_path, staging / REPORT_NAME)
+            names = []
+            for path in map(Path, attachments):
+                shutil.copyfile(path, staging / path.name)
+                names.append(path.name)
+            (staging / STATS_NAME).write_text(
+                json.dumps({**stats, 'attachments': names, 'cached_at': time.strftime('%Y-%m-%d %H:%M:%S')},
+                           ensure_ascii=False, default=str),
+                encoding='utf-8')
+            entry = self.cache_dir / key
+            if entry.exists():
+                shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except OSError as e:
+            logger.warning(f"Could not cache validation result: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            stats_path = entry / STATS_NAME
+            if entry.name.startswith('.') or not stats_path.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((stats_path.stat().st_mtime, size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.debug(f"Evicted cached result {entry.name}")
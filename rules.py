@@ -0,0 +1,219 @@
+import pandas as pd
+import numpy as np
+import copy
+import hashlib
+import json
+import logging
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Optional, Union
+
+# Rule types: how the checklist value of a column is checked against the shipping list
+#   text     similarity of the lower-cased text >= threshold
+#   numeric  |a - b| <= max(rel_tol * max(|a|, |b|), abs_tol)
+#   exact    equal; numbers are compared after rounding to 1/scale (scale 100 = whole cents)
+#   lookup   the checklist value is one of 'values' (case-insensitive), no shipping value needed
+# 'input' and 'shipping' name the column on each side when it differs from 'column' and its aliases.
+# Cells where both sides are numbers use the numeric test of text/numeric rules, other
+# cells fall back to text similarity, like the per-row comparison always did.
+RULE_TYPES = ('text', 'numeric', 'exact', 'lookup')
+RULE_DEFAULTS = {'threshold': 0.85, 'rel_tol': 0.01, 'abs_tol': 0.0, 'scale': None, 'values': ()}
+
+DEFAULT_RULES = {
+    # Checklist column variants accepted for each standard name in the compare rules
+    'aliases': {
+        'P/N': ['P/N', 'Part Number', 'Part No', 'PartNo', '料号'],
+        'Item Nos': ['Item Nos.', 'Item Number', '项目编号', 'Item No'],
+        'Model Nos': ['Model Nos.', 'Model Number', '型号', 'Model'],
+        'Description': ['Description', '产品描述', 'Desc'],
+        'Quantity PCS': ['Quantity PCS', 'QTY', '数量', 'Quantity'],
+        'Unit Price USD': ['Unit Price USD', 'Price', '单价', 'Unit Price'],
+        'Amount USD': ['Amount USD', 'Total Amount', '总金额', 'Amount'],
+        'India HS code': ['India HS code', 'HS Code', 'HSN Code'],
+        'Duty': ['Duty', 'Duty Rate', '税率'],
+        'Welfare': ['Welfare', 'Welfare Tax', '福利税'],
+        'IGST': ['IGST', 'GST', '综合税'],
+    },
+    # Shipping list header variants -> standard name (normalize-shipping.clean_headers)
+    'shipping_aliases': {
+        'Item No.': ['Item Nos.', 'Item Nos', 'Item Number', 'Item', 'Item#', 'Item Code'],
+        'Model No.': ['Model No.', 'Model Number', 'Model Nos'],
+        'P/N': ['P/N', 'Part Number', 'Part No'],
+        'Description': ['Description', 'Desc'],
+        'Quantity PCS': ['Quantity PCS', 'QTY', 'Quantity'],
+        'Unit Price USD': ['Unit Price USD', 'Unit Price', 'Price'],
+        'Amount USD': ['Amount USD', 'Amount', 'Total'],
+        'Alternative materials': ['Alternative materials', 'Alternate materials', 'Alternative P/N',
+                                  'Alternate P/N', '替代料', '替代料号'],
+    },
+    # Line comparisons between a checklist line and its shipping line, in report order.
+    # Item and model numbers are not compared by default (checklist model numbers are cut
+    # short); a rule file can add e.g. {"column": "Model Nos", "shipping": "Model No."}.
+    'compare': [
+        {'column': 'Description', 'type': 'text', 'threshold': 0.85},
+        {'column': 'Quantity PCS', 'type': 'numeric', 'rel_tol': 0.01},
+        {'column': 'Unit Price USD', 'type': 'numeric', 'rel_tol': 0.01},
+        {'column': 'Amount USD', 'type': 'exact', 'scale': 100},
+    ],
+}
+
+logger = logging.getLogger(__name__)
+
+
+def number_mask(values: pd.Series) -> np.ndarray:
+    """Which cells hold a number (int/float, NaN included) rather than text"""
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return np.ones(len(values), dtype=bool)
+    return values.map(lambda value: isinstance(value, (int, float, np.number))).to_numpy(dtype=bool)
+
+
+def display_values(values: pd.Series) -> list:
+    """Cells as plain Python values, the way they read in messages"""
+    return values.astype(object).tolist()
+
+
+class RuleSet:
+    """
+    Column aliases and line comparison rules, from DEFAULT_RULES overlaid with a JSON rule file.
+    compare() runs the compiled plan a whole column at a time over all matched lines; only
+    text pairs that differ go through SequenceMatcher, once per distinct pair.
+    """
+
+    def __init__(self, rules: dict = None):
+        self.rules = rules or copy.deepcopy(DEFAULT_RULES)
+        self.aliases = self.rules['aliases']
+        self.shipping_aliases = self.rules['shipping_aliases']
+        self.plan = [self.compile_rule(rule) for rule in self.rules['compare'] if rule.get('enabled', True)]
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]] = None) -> 'RuleSet':
+        """Defaults, overlaid by a rule file: aliases merge per standard name, compare rules per column"""
+        rules = copy.deepcopy(DEFAULT_RULES)
+        if not path:
+            return cls(rules)
+        overlay = json.loads(Path(path).read_text(encoding='utf-8'))
+        unknown = set(overlay) - set(rules)
+        if unknown:
+            raise ValueError(f"Unknown sections {sorted(unknown)} in rule file {path}, "
+                             f"expected {sorted(rules)}")
+        for section in ('aliases', 'shipping_aliases'):
+            rules[section].update(overlay.get(section, {}))
+        by_column = {rule['column']: pos for pos, rule in enumerate(rules['compare'])}
+        for rule in overlay.get('compare', []):
+            if rule['column'] in by_column:
+                rules['compare'][by_column[rule['column']]] = rule
+            else:
+                rules['compare'].append(rule)
+        logger.info(f"Loaded validation rules from {path}")
+        return cls(rules)
+
+    def compile_rule(self, rule: dict) -> dict:
+        """Validate a rule and fill in its defaults"""
+        if 'column' not in rule:
+            raise ValueError(f"Rule {rule} has no 'column'")
+        if rule.get('type', 'text') not in RULE_TYPES:
+            raise ValueError(f"Unknown rule type '{rule.get('type')}' for column {rule['column']}, "
+                             f"expected one of {RULE_TYPES}")
+        compiled = {**RULE_DEFAULTS, 'type': 'text', **rule}
+        column = rule['column']
+        compiled['input_names'] = self.names(rule.get('input')) or [column, *self.aliases.get(column, ())]
+        compiled['shipping_names'] = (self.names(rule.get('shipping'))
+                                      or [column, *self.shipping_aliases.get(column, ())])
+        compiled['lookup'] = {str(value).strip().upper() for value in compiled['values']}
+        return compiled
+
+    def names(self, value) -> List[str]:
+        """A rule's column name(s) as a list"""
+        if value is None:
+            return []
+        return [value] if isinstance(value, str) else list(value)
+
+    def digest(self, section: str) -> str:
+        """Short hash of one section, '' while it still equals the default"""
+        if self.rules[section] == DEFAULT_RULES[section]:
+            return ''
+        return hashlib.sha1(json.dumps(self.rules[section], sort_keys=True, ensure_ascii=False)
+                            .encode('utf-8')).hexdigest()[:8]
+
+    def layout_kind(self, kind: str, section: str = 'aliases') -> str:
+        """Layout cache kind: learned column mappings are only reused under the same aliases"""
+        digest = self.digest(section)
+        return f'{kind}:{digest}' if digest else kind
+
+    def resolve(self, df: pd.DataFrame, names: List[str]) -> Optional[str]:
+        """First of a rule's column names present in df"""
+        return next((name for name in names if name in df.columns), None)
+
+    def compare(self, input_df: pd.DataFrame, shipping_df: pd.DataFrame) -> List[tuple]:
+        """
+        Run every rule over aligned checklist and shipping lines (same index).
+        Returns (column, checklist column, error_type, mask, messages) per failed check, where
+        mask flags the failing lines and messages holds one message per failing line.
+        """
+        results = []
+        for rule in self.plan:
+            input_col = self.resolve(input_df, rule['input_names'])
+            shipping_col = self.resolve(shipping_df, rule['shipping_names'])
+            # A column missing on one side reads as 'N/A', as row.get(col, 'N/A') did
+            input_values = input_df[input_col] if input_col else pd.Series('N/A', index=input_df.index, dtype=object)
+            if rule['type'] == 'lookup':
+                checks = [self.run_lookup(rule, input_values)]
+            else:
+                shipping_values = (shipping_df[shipping_col] if shipping_col
+                                   else pd.Series('N/A', index=shipping_df.index, dtype=object))
+                checks = self.run_rule(rule, input_values, shipping_values)
+            results.extend((rule['column'], input_col or rule['column'], *check)
+                           for check in checks if check[1].any())
+        return results
+
+    def run_rule(self, rule: dict, input_values: pd.Series, shipping_values: pd.Series) -> List[tuple]:
+        """Numeric test on number pairs, text test on the rest, each vectorized over its lines"""
+        numbers = number_mask(input_values) & number_mask(shipping_values)
+        results = []
+
+        if numbers.any():
+            a = pd.to_numeric(input_values[numbers], errors='coerce').to_numpy(dtype=float)
+            b = pd.to_numeric(shipping_values[numbers], errors='coerce').to_numpy(dtype=float)
+            with np.errstate(invalid='ignore'):
+                if rule['type'] == 'exact':
+                    same = np.round(a * rule['scale']) == np.round(b * rule['scale']) if rule['scale'] else a == b
+                else:
+                    same = (a == b) | (np.abs(a - b) <= np.maximum(
+                        rule['rel_tol'] * np.maximum(np.abs(a), np.abs(b)), rule['abs_tol']))
+            mask = np.zeros(len(numbers), dtype=bool)
+            mask[np.flatnonzero(numbers)[~same]] = True
+            if mask.any():
+                messages = [f"Value mismatch in column {rule['column']}: {x} vs {y}" for x, y in
+                            zip(display_values(input_values[mask]), display_values(shipping_values[mask]))]
+                results.append(('value_mismatch', mask, messages))
+
+        if not numbers.all():
+            texts = ~numbers
+            a = input_values[texts].astype(str).str.lower().to_numpy(dtype=object)
+            b = shipping_values[texts].astype(str).str.lower().to_numpy(dtype=object)
+            if rule['type'] == 'exact':
+                low = np.array([x.strip() != y.strip() for x, y in zip(a, b)], dtype=bool)
+            else:
+                # Identical text needs no similarity score; each distinct pair is scored once
+                low = np.zeros(len(a), dtype=bool)
+                scores = {}
+                for pos in np.flatnonzero(a != b):
+                    pair = (a[pos], b[pos])
+                    if pair not in scores:
+                        scores[pair] = SequenceMatcher(None, *pair).ratio()
+                    low[pos] = scores[pair] < rule['threshold']
+            mask = np.zeros(len(numbers), dtype=bool)
+            mask[np.flatnonzero(texts)[low]] = True
+            if mask.any():
+                messages = [f"Text similarity low in column {rule['column']}: {x} vs {y}"
+                            for x, y in zip(a[low], b[low])]
+                results.append(('text_mismatch', mask, messages))
+        return results
+
+    def run_lookup(self, rule: dict, input_values: pd.Series) -> tuple:
+        """Checklist values outside the rule's list of allowed values"""
+        text = input_values.astype(str).str.strip().str.upper().str.replace(r'\.0+$', '', regex=True)
+        mask = (~text.isin(rule['lookup'])).to_numpy(dtype=bool)
+        messages = [f"Value {value} in column {rule['column']} is not one of the allowed values"
+                    for value in display_values(input_values[mask])]
+        return 'lookup_mismatch', mask, messages
@@ -1,9 +1,14 @@
 import streamlit as st
-from validator import ExcelValidator
+from validator import ExcelValidator, run_processes
 from pathlib import Path
 import tempfile
 import os
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from table_store import output_path, resolve_format
+from result_cache import ResultCache
+
+# Workbooks, or CSV/TSV exports with a 'Sheet' column for multi-sheet files
+UPLOAD_TYPES = ['xlsx', 'csv', 'tsv']
 
 # Define translations
 TRANSLATIONS = {
@@ -11,14 +16,19 @@ TRANSLATIONS = {
         'title': "Excel Data Validator",
         'description': "Upload your Excel files to validate the data",
         'language_selector': "Language",
-        'input_file_label': "Upload Input Excel file (to be validated)",
+        'input_file_label': "Upload Input Excel or CSV file (to be validated)",
         'shipping_file_label': "Upload Shipping List file",
         'duty_file_label': "Upload Duty Rates file",
         'validate_button': "Validate Files",
+        'quick_check_button': "Quick check",
+        'quick_check_running': "Checking a sample of each invoice...",
+        'quick_check_summary': "Sampled {} lines: {:.0%} of P/Ns and {:.0%} of item names matched",
+        'quick_check_ok': "Sample looks good, run the full validation when ready",
         'processing': "Processing files...",
         'normalizing_input': "Normalizing input file...",
         'normalizing_shipping': "Normalizing shipping file...",
         'download_report': "Download Validation Report",
+        'cached_result': "Same files as an earlier validation, showing the saved report",
         'error_saving': "Error saving uploaded files",
         'error_normalization': "File normalization failed",
         'error_no_report': "Validation report was not generated",
@@ -28,14 +38,19 @@ TRANSLATIONS = {
         'title': "Excel数据验证器",
         'description': "上传Excel文件以验证数据",
         'language_selector': "语言",
-        'input_file_label': "上传输入Excel文件（待验证）",
+        'input_file_label': "上传输入Excel或CSV文件（待验证）",
         'shipping_file_label': "上传装运清单文件",
         'duty_file_label': "上传税率文件",
         'validate_button': "验证文件",
+        'quick_check_button': "快速检查",
+        'quick_check_running': "正在检查每张发票的样本...",
+        'quick_check_summary': "抽样 {} 行: {:.0%} 的料号和 {:.0%} 的品名已匹配",
+        'quick_check_ok': "样本正常，可以开始完整验证",
         'processing': "正在处理文件...",
         'normalizing_input': "正在标准化输入文件...",
         'normalizing_shipping': "正在标准化装运文件...",
         'download_report': "下载验证报告",
+        'cached_result': "文件与之前的验证相同，显示已保存的报告",
         'error_saving': "保存上传文件时出错",
         'error_normalization': "文件标准化失败",
         'error_no_report': "未生成验证报告",
@@ -48,40 +63,54 @@ def get_text(key):
     lang = st.session_state.get('language', 'English')
     return TRANSLATIONS[lang][key]
 
-def save_uploaded_file(uploaded_file):
-    """Save uploaded file to temporary directory and return path"""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            return tmp_file.name
-    except Exception as e:
-        st.error(f"{get_text('error_saving')}: {str(e)}")
-        return None
+def write_upload(uploaded_file):
+    """Write one upload to a temporary file and return its path"""
+    # Keep the extension: CSV/TSV uploads are read as text, not as workbooks
+    suffix = Path(uploaded_file.name).suffix.lower() or '.xlsx'
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        tmp_file.write(uploaded_file.getvalue())
+        return tmp_file.name
+
+def save_uploaded_files(uploaded_files):
+    """Save the uploads to a temporary directory side by side; returns their paths (None where saving failed)"""
+    with ThreadPoolExecutor(max_workers=len(uploaded_files)) as pool:
+        futures = [pool.submit(write_upload, uploaded) for uploaded in uploaded_files]
+    paths = []
+    for future in futures:
+        try:
+            paths.append(future.result())
+        except Exception as e:
+            st.error(f"{get_text('error_saving')}: {str(e)}")
+            paths.append(None)
+    return paths
 
 def normalize_files(input_path, shipping_path):
     """Normalize input and shipping files before validation"""
     try:
-        # Create normalized file paths
-        normalized_input = str(Path(input_path).parent / f"{Path(input_path).stem}_normalized.xlsx")
-        normalized_shipping = str(Path(shipping_path).parent / f"{Path(shipping_path).stem}_normalized.xlsx")
+        # Create normalized file paths; the validator is the only consumer, so skip xlsx
+        fmt = resolve_format('feather')
+        normalized_input = str(output_path(Path(input_path).parent / f"{Path(input_path).stem}_normalized", fmt))
+        normalized_shipping = str(output_path(Path(shipping_path).parent / f"{Path(shipping_path).stem}_normalized", fmt))
         
-        # Step 0: Normalize input Excel file
+        # Step 0/1: Normalize the input file and shipping list side by side
         st.write(get_text('normalizing_input'))
-        subprocess.check_call([
-            "python", 
-            "normalize-inputexcel.py",
-            input_path,
-            normalized_input
-        ])
-        
-        # Step 1: Normalize shipping list
         st.write(get_text('normalizing_shipping'))
-        subprocess.check_call([
-            "python",
-            "normalize-shipping.py", 
-            shipping_path,
-            normalized_shipping
-        ])
+        run_processes({
+            'input file normalization': [
+                "python", 
+                "normalize-inputexcel.py",
+                input_path,
+                normalized_input,
+                "--format", fmt
+            ],
+            'shipping list normalization': [
+                "python",
+                "normalize-shipping.py", 
+                shipping_path,
+                normalized_shipping,
+                "--format", fmt
+            ],
+        })
         
         return normalized_input, normalized_shipping
         
@@ -89,6 +118,30 @@ def normalize_files(input_path, shipping_path):
         st.error(f"{get_text('error_normalization')}: {str(e)}")
         return None, None
 
+def quick_check(input_file, shipping_file, duty_file):
+    """Pair sheets and show P/N and duty match rates on a sample, without normalizing the files"""
+    paths = save_uploaded_files([input_file, shipping_file, duty_file])
+    try:
+        if not all(paths):
+            st.error(get_text('error_saving'))
+            return
+        with st.spinner(get_text('quick_check_running')):
+            validator = ExcelValidator(input_file=paths[0], shipping_list=paths[1], duty_file=paths[2])
+            summary = validator.preview()
+        st.write(get_text('quick_check_summary').format(
+            summary['lines'], summary['pn_match_rate'], summary['duty_match_rate']))
+        st.dataframe(summary['sheets'], hide_index=True)
+        for warning in summary['warnings']:
+            st.warning(warning)
+        if not summary['warnings']:
+            st.success(get_text('quick_check_ok'))
+    except Exception as e:
+        st.error(get_text('error_validation').format(str(e)))
+    finally:
+        for path in paths:
+            if path and Path(path).exists():
+                os.unlink(path)
+
 def main():
     # Language selector in sidebar
     if 'language' not in st.session_state:
@@ -108,23 +161,48 @@ def main():
     st.write(get_text('description'))
     
     # File uploaders
-    input_file = st.file_uploader(get_text('input_file_label'), type=['xlsx'])
-    shipping_file = st.file_uploader(get_text('shipping_file_label'), type=['xlsx'])
-    duty_file = st.file_uploader(get_text('duty_file_label'), type=['xlsx'])
+    input_file = st.file_uploader(get_text('input_file_label'), type=UPLOAD_TYPES)
+    shipping_file = st.file_uploader(get_text('shipping_file_label'), type=UPLOAD_TYPES)
+    duty_file = st.file_uploader(get_text('duty_file_label'), type=UPLOAD_TYPES)
     
     if input_file and shipping_file and duty_file:
-        if st.button(get_text('validate_button')):
+        check_col, validate_col = st.columns(2)
+        with check_col:
+            check_clicked = st.button(get_text('quick_check_button'))
+        with validate_col:
+            validate_clicked = st.button(get_text('validate_button'))
+        
+        if check_clicked:
+            quick_check(input_file, shipping_file, duty_file)
+        
+        if validate_clicked:
             try:
                 with st.spinner(get_text('processing')):
                     # Save uploaded files
-                    input_path = save_uploaded_file(input_file)
-                    shipping_path = save_uploaded_file(shipping_file)
-                    duty_path = save_uploaded_file(duty_file)
+                    input_path, shipping_path, duty_path = save_uploaded_files(
+                        [input_file, shipping_file, duty_file])
                     
                     if not all([input_path, shipping_path, duty_path]):
                         st.error(get_text('error_saving'))
                         return
                     
+                    # Re-validating identical uploads returns the saved report
+                    cache = ResultCache()
+                    cache_key = cache.run_key(input_path, shipping_path, duty_path)
+                    cached = cache.get(cache_key)
+                    if cached:
+                        st.info(get_text('cached_result'))
+                        with open(cached['report'], "rb") as file:
+                            st.download_button(
+                                label=get_text('download_report'),
+                                data=file.read(),
+                                file_name="validation_report.xlsx",
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                            )
+                        for path in [input_path, shipping_path, duty_path]:
+                            os.unlink(path)
+                        return
+                    
                     # Normalize files first
                     normalized_input, normalized_shipping = normalize_files(input_path, shipping_path)
                     
@@ -139,14 +217,15 @@ def main():
                         duty_file=duty_path
                     )
                     
-                    # Run validation
+                    # Run validation, advancing a progress bar as each sheet finishes
+                    progress = st.progress(0.0)
+                    validator.events.on('sheet_finished',
+                                        lambda index, total, **_: progress.progress((index + 1) / total))
                     validator.validate_all()
                     
                     # Generate report
-                    validator.generate_report()
-                    
-                    # Get report path
-                    report_path = Path(normalized_input).parent / 'validation_report.xlsx'
+                    report_path = validator.generate_report()
+                    cache.put(cache_key, report_path, validator.stats)
                     
                     # Offer download if report exists
                     if report_path.exists():
@@ -0,0 +1,125 @@
+import pandas as pd
+import numpy as np
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Union
+
+# Output formats for normalized files (xlsx keeps the human-readable workbook)
+FORMATS = ('xlsx', 'feather', 'parquet', 'pickle')
+SUFFIXES = {
+    'xlsx': '.xlsx',
+    'feather': '.feather',
+    'parquet': '.parquet',
+    'pickle': '.pkl',
+}
+EXTENSIONS = {'.feather': 'feather', '.parquet': 'parquet', '.pkl': 'pickle', '.pickle': 'pickle'}
+
+# Column holding the sheet name when several tables share one Arrow file
+SHEET_COLUMN = '__sheet__'
+METADATA_KEY = b'custom_list.sheets'
+
+logger = logging.getLogger(__name__)
+
+
+def has_pyarrow() -> bool:
+    """Check if pyarrow is installed (needed for feather/parquet)"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_format(fmt: str) -> str:
+    """Fall back to pickle when an Arrow format is requested without pyarrow"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    if fmt in ('feather', 'parquet') and not has_pyarrow():
+        logger.warning(f"pyarrow is not installed, writing pickle instead of {fmt}")
+        return 'pickle'
+    return fmt
+
+
+def output_path(path: Union[str, Path], fmt: str) -> Path:
+    """Swap the file extension to match the output format"""
+    return Path(path).with_suffix(SUFFIXES[fmt])
+
+
+def is_table_file(path: Union[str, Path]) -> bool:
+    """Check if a path is a binary table file rather than a workbook"""
+    return Path(path).suffix.lower() in EXTENSIONS
+
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn mixed-type object columns (e.g. numbers and text) into text so Arrow can store them"""
+    df = df.infer_objects()
+    for col in df.columns:
+        if df[col].dtype == object:
+            types = {type(v) for v in df[col].dropna()}
+            if len(types) > 1:
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+
+def write_tables(tables: Dict[str, pd.DataFrame], path: Union[str, Path], fmt: str):
+    """Write one table per sheet, keeping column order and dtypes"""
+    if fmt == 'pickle':
+        pd.to_pickle({name: df.infer_objects() for name, df in tables.items()}, path)
+        return
+
+    import pyarrow as pa
+
+    # Arrow files hold a single table: stack the sheets and record each sheet's layout
+    layouts = {}
+    frames = []
+    for name, df in tables.items():
+        df = _arrow_safe(df.reset_index(drop=True))
+        df.columns = [str(col) for col in df.columns]
+        layouts[name] = {'columns': list(df.columns),
+                         'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()}}
+        frames.append(df.assign(**{SHEET_COLUMN: name}))
+
+    # A column can be numeric in one sheet and text in another: stacked, it is mixed again
+    combined = _arrow_safe(pd.concat(frames, ignore_index=True)) if frames else pd.DataFrame({SHEET_COLUMN: []})
+    table = pa.Table.from_pandas(combined, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(layouts, ensure_ascii=False).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    if fmt == 'feather':
+        import pyarrow.feather as feather
+        feather.write_feather(table, str(path))
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(table, str(path))
+
+
+def read_tables(path: Union[str, Path]) -> Dict[str, pd.DataFrame]:
+    """Read a table file back into {sheet name: DataFrame} in the original sheet order"""
+    fmt = EXTENSIONS[Path(path).suffix.lower()]
+    if fmt == 'pickle':
+        return pd.read_pickle(path)
+
+    if fmt == 'feather':
+        import pyarrow.feather as feather
+        table = feather.read_table(str(path))
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(str(path))
+
+    layouts = json.loads(table.schema.metadata[METADATA_KEY].decode('utf-8'))
+    combined = table.to_pandas()
+    # Arrow gives None for missing text; keep pandas' NaN like the Excel path does
+    for col in combined.columns[combined.dtypes == object]:
+        combined[col] = combined[col].where(combined[col].notna(), np.nan)
+    groups = dict(iter(combined.groupby(SHEET_COLUMN, sort=False)))
+
+    tables = {}
+    for name, layout in layouts.items():
+        df = groups.get(name, combined.iloc[0:0])[layout['columns']].reset_index(drop=True)
+        # Stacking sheets can widen dtypes (e.g. int -> float); restore each sheet's own
+        widened = {col: dtype for col, dtype in layout['dtypes'].items()
+                   if str(df[col].dtype) != dtype}
+        tables[name] = df.astype(widened) if widened else df
+    return tables
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# The modules live flat in the repo root
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from validator import ExcelValidator  # noqa: E402
+
+
+@pytest.fixture
+def validator():
+    """A validator with nothing loaded: no files, layout cache or suggestions, no duty rates"""
+    checker = ExcelValidator(None, None, None, layout_cache=None, suggestions=0)
+    checker.duty_rates = pd.DataFrame()
+    return checker
+
+
+@pytest.fixture
+def run_sheet(validator):
+    """Validate one checklist sheet against one shipping sheet, returning the errors logged"""
+    def run(sheet_df, shipping_df, sheet_name='Invoice 1', shipping_name='Invoice 1'):
+        return [error for batch in validator.validate_sheet(sheet_df, sheet_name, shipping_df, validator.duty_rates,
+                                                            shipping_name=shipping_name)
+                for error in batch]
+    return run
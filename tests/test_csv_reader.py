@@ -0,0 +1,51 @@
+import codecs
+
+import pandas as pd
+import pytest
+
+import csv_reader
+from csv_reader import csv_sheet_names, detect_encoding, read_csv
+
+TEXT = 'P/N,品名,Quantity PCS,Amount USD\n0012345,电缆,2,2.5\nA-77,插头,3,\n'
+
+
+@pytest.mark.parametrize('data, detected', [
+    (TEXT.encode('utf-8'), 'utf-8-sig'),
+    (TEXT.encode('utf-8-sig'), 'utf-8-sig'),
+    (TEXT.encode('gb18030'), 'gb18030'),
+    (TEXT.encode('utf-16'), 'utf-16'),
+    (codecs.BOM_UTF16_BE + TEXT.encode('utf-16-be'), 'utf-16'),
+], ids=['utf-8', 'utf-8 BOM', 'gb18030', 'utf-16', 'utf-16 BE'])
+def test_detect_encoding(tmp_path, data, detected):
+    path = tmp_path / 'lines.csv'
+    path.write_bytes(data)
+    assert detect_encoding(path) == detected
+    assert read_csv(path).columns[1] == '品名'
+
+
+def test_multibyte_character_cut_at_sample_end(tmp_path, monkeypatch):
+    # The sample ends inside the three UTF-8 bytes of 品
+    monkeypatch.setattr(csv_reader, 'SNIFF_BYTES', len('P/N,'.encode('utf-8')) + 1)
+    path = tmp_path / 'lines.csv'
+    path.write_bytes(TEXT.encode('utf-8'))
+    assert detect_encoding(path) == 'utf-8-sig'
+
+
+def test_cells_read_like_workbook_cells(tmp_path):
+    path = tmp_path / 'lines.csv'
+    path.write_text(TEXT, encoding='utf-8')
+    df = read_csv(path)
+    # Leading zeros keep a P/N as text; whole numbers become ints, blanks NaN
+    assert df['P/N'].tolist() == ['0012345', 'A-77']
+    assert df['Quantity PCS'].tolist() == [2, 3]
+    assert df['Amount USD'].iloc[0] == 2.5 and pd.isna(df['Amount USD'].iloc[1])
+
+
+def test_tsv_with_sheet_column(tmp_path):
+    path = tmp_path / 'shipping.tsv'
+    path.write_text('Sheet\tP/N\tQuantity PCS\nInvoice 1\tPN-1\t5\nInvoice 2\tPN-2\t7\nInvoice 1\tPN-3\t1\n',
+                    encoding='utf-8')
+    assert csv_sheet_names(path) == ['Invoice 1', 'Invoice 2']
+    sheets = read_csv(path, sheet_name=None)
+    assert sheets['Invoice 1']['P/N'].tolist() == ['PN-1', 'PN-3']
+    assert sheets['Invoice 2']['Quantity PCS'].tolist() == [7]
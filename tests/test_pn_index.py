@@ -0,0 +1,23 @@
+from pn_index import PNSuggestionIndex
+
+
+def test_suggests_closest_part_number():
+    index = PNSuggestionIndex(['AB-1001', 'AB-1002', 'XY-9000', 'N/A', ''])
+    assert len(index) == 3
+    assert index.suggest('AB-1001X', k=2)[0][0] == 'AB-1001'
+    assert index.suggest('N/A') == []
+
+
+def test_common_grams_not_indexed():
+    part_numbers = [f'12{n:06d}' for n in range(0, 4000, 3)]
+    index = PNSuggestionIndex(part_numbers)
+    # '^12' starts every P/N, so it cannot tell candidates apart
+    assert '^12' not in index.postings
+    assert max(len(ids) for ids in index.postings.values()) <= max(index.MIN_POSTINGS, 0.05 * len(index))
+    assert index.suggest('12000300X')[0][0] == '12000300'
+
+
+def test_small_lists_keep_every_gram():
+    index = PNSuggestionIndex(['1200', '1201', '1202'])
+    assert '^12' in index.postings
+    assert index.suggest('1203')[0][0] in {'1200', '1201', '1202'}
@@ -0,0 +1,70 @@
+import importlib
+import shutil
+from pathlib import Path
+
+import pytest
+
+from validator import ExcelValidator
+from xlsx_reader import iter_sheet_rows, read_excel, rows_to_frame
+
+ROOT = Path(__file__).resolve().parent.parent
+SHIPPING_LIST = next((ROOT / 'docs').glob('24HC01713*.xlsx'))
+DUTY_FILE = next((ROOT / 'docs').glob('*-20230822.xlsx'))
+
+
+@pytest.fixture
+def converter():
+    # The normalizer script has a dash in its name, so it is imported by string
+    return importlib.import_module('normalize-inputexcel').ExcelConverter()
+
+
+@pytest.fixture
+def samples(tmp_path):
+    """The raw sample checklist, shipping list and duty file copied to a scratch directory"""
+    for path in (ROOT / 'input.xlsx', SHIPPING_LIST, DUTY_FILE):
+        shutil.copyfile(path, tmp_path / path.name)
+    return tmp_path / 'input.xlsx', tmp_path / SHIPPING_LIST.name, tmp_path / DUTY_FILE.name
+
+
+# Sampling the raw checklist
+
+def test_sample_rows_keeps_first_lines_of_each_invoice(converter):
+    rows = [('Import CheckList',), ('Job No SI/M 1058324',), ('Sr', 'P/N', 'Desc'),
+            ('Invoice: 24HC01713-1S',), ('1', 'A', 'x'), ('2', 'B', 'x'), ('3', 'C', 'x'),
+            ('Invoice: 24HC01713-2S',), ('Port Of Loading',), ('1', 'D', 'x'), ('2', 'E', 'x'), ('3', 'F', 'x')]
+    # Skipped (yellow frame) rows are kept but do not use up an invoice's lines
+    assert converter.sample_rows(iter(rows), 2) == rows[:6] + rows[7:11]
+
+
+def test_sampled_sheets_normalize_like_whole_sheets(converter):
+    whole = read_excel(ROOT / 'input.xlsx', sheet_name=None, header=None)
+    for sheet_name, rows in iter_sheet_rows(ROOT / 'input.xlsx'):
+        sampled = converter.process_sheet(rows_to_frame(converter.sample_rows(rows, 5)), sheet_name, max_lines=5)
+        expected = converter.process_sheet(whole[sheet_name], sheet_name, max_lines=5)
+        assert list(sampled) == list(expected)
+        for invoice, df in expected.items():
+            assert sampled[invoice].equals(df)
+
+
+# Quick check of the raw files
+
+def test_preview_of_sample_files(samples):
+    input_file, shipping_list, duty_file = samples
+    summary = ExcelValidator(input_file, shipping_list, duty_file, layout_cache=None).preview(5)
+    sheets = summary['sheets']
+    assert len(sheets) == 31
+    assert (sheets['Lines'] <= 5).all() and summary['lines'] == sheets['Lines'].sum()
+    assert (sheets['Shipping Sheet'] != '').all()
+    assert summary['pn_match_rate'] > 0.9
+    assert not any('shipping' in warning for warning in summary['warnings'])
+    # Nothing is written next to the inputs
+    assert sorted(path.name for path in input_file.parent.iterdir()) == sorted(path.name for path in samples)
+
+
+def test_preview_warns_about_wrong_shipping_list(samples):
+    input_file, _, duty_file = samples
+    summary = ExcelValidator(input_file, duty_file, duty_file, layout_cache=None).preview(5)
+    assert summary['pn_match_rate'] == 0
+    assert summary['warnings'][0] == "No shipping invoice tables found in the shipping list"
+    assert summary['warnings'][1].startswith('31 checklist sheets have no shipping sheet')
+    assert any(warning.startswith('Only 0% of sampled P/Ns') for warning in summary['warnings'])
@@ -0,0 +1,101 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pn_index import GlobalPNIndex
+from reference_store import ReferenceStore, StoredPNIndex, tariff_date_from_name
+import validator as validator_module
+from validator import ExcelValidator
+
+
+def shipping_sheet(*rows):
+    return pd.DataFrame(list(rows), columns=['Item No.', 'P/N', 'Description', 'Quantity PCS',
+                                             'Unit Price USD', 'Amount USD'])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReferenceStore(tmp_path / 'reference.db')
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def shipment(store, validator):
+    """Two invoices imported the way import-reference.py does: TOTAL lines split off first"""
+    sheets = {
+        'CI-24HC01713-1S': shipping_sheet([1, 'PN-1', 'Cable', 2, 1.5, 3.0], [2, 'PN-2', np.nan, 1, 1.0, 1.0],
+                                          ['TOTAL', np.nan, np.nan, 3, np.nan, 5.0]),
+        'CI-24HC01713-2S': shipping_sheet([1, 'PN-2', 'Plug', 4, 0.25, 1.0]),
+    }
+    sheets = {name: validator.split_declared_total(name, df) for name, df in sheets.items()}
+    store.import_shipping('24HC01713', sheets, validator.clean_pn_value, titles={'CI-24HC01713-2S': '24HC01713-2S'},
+                          source='shipping.xlsx', declared_totals=validator.declared_totals)
+    return sheets
+
+
+def test_shipping_round_trip(store, shipment):
+    loaded = store.load_shipping('24HC01713')
+    assert list(loaded) == list(shipment)
+    for name, df in shipment.items():
+        pd.testing.assert_frame_equal(loaded[name], df, check_dtype=False)
+    assert store.shipping_titles('24HC01713') == {'CI-24HC01713-2S': '24HC01713-2S'}
+    assert store.has_shipment('24HC01713') and not store.has_shipment('24HC09999')
+    with pytest.raises(KeyError):
+        store.load_shipping('24HC09999')
+
+
+def test_declared_totals_round_trip(store, shipment):
+    assert store.declared_totals('24HC01713') == {'CI-24HC01713-1S': {'Quantity PCS': 3000, 'Amount USD': 500}}
+
+
+def test_stored_shipment_reconciles_declared_totals(store, shipment, tmp_path, monkeypatch):
+    store.close()
+    validator = ExcelValidator('input.xlsx', None, 'duty.xlsx', layout_cache=None, suggestions=0,
+                               reference_db=tmp_path / 'reference.db', shipment='24HC01713')
+    monkeypatch.setattr(validator, 'read_workbooks', lambda files: {
+        'duty file': {'Duty': pd.DataFrame([['Item name', 'India HS code']])}, 'input file': {}})
+    errors = list(validator.validate_iter())
+    # The lines of invoice 1S sum to 4.00 against a declared 5.00
+    assert [(error['Sheet'], error['Type'], error['Error']) for error in errors] == [
+        ('CI-24HC01713-1S', 'invoice_total_mismatch',
+         'Invoice Amount USD lines sum to 4.00, declared total is 5.00')]
+
+
+def test_stored_pn_index_matches_global_index(store, shipment, validator):
+    stored = StoredPNIndex(store, '24HC01713')
+    memory = GlobalPNIndex({name: df['P/N'].map(validator.clean_pn_value) for name, df in shipment.items()})
+    assert len(stored) == len(memory) == 2
+    for pn in ('PN2', 'PN1', 'PN9', 'N/A'):
+        assert stored.lookup(pn) == memory.lookup(pn)
+        assert stored.lookup(pn, exclude_sheet='CI-24HC01713-1S') == memory.lookup(pn, exclude_sheet='CI-24HC01713-1S')
+
+
+def test_tariff_version_in_effect(store):
+    names = pd.Series(['CABLE', 'PLUG'])
+    old = pd.DataFrame({'Item name': ['Cable', 'Plug'], 'India HS code': [85444290, 85366990]})
+    new = old.assign(**{'India HS code': [85444299, 85366990]})
+    store.import_tariff(old, tariff_date_from_name('税率汇总-20230822.xlsx'), names, source='old.xlsx')
+    store.import_tariff(new, '2024-04-01', names, source='new.xlsx')
+    assert store.tariff_version_as_of('2023-08-21') is None
+    pd.testing.assert_frame_equal(store.load_tariff('2024-03-31'), old)
+    pd.testing.assert_frame_equal(store.load_tariff('2024-04-01'), new)
+    # Re-importing a date replaces that version
+    store.import_tariff(new, '2023-08-22', names)
+    pd.testing.assert_frame_equal(store.load_tariff('2023-09-01'), new)
+    assert len(store.tariff_versions()) == 2
+
+
+def test_cli_creates_no_store_unless_asked(tmp_path, monkeypatch, capsys):
+    db = tmp_path / 'reference.db'
+    for name in ('input.xlsx', 'shipping.xlsx'):
+        (tmp_path / name).write_bytes(b'')
+    # No duty file means the tariff in effect today, which needs an imported store
+    monkeypatch.setattr(sys, 'argv', ['validator.py', str(tmp_path / 'input.xlsx'), str(tmp_path / 'shipping.xlsx'),
+                                      '--reference-db', str(db)])
+    with pytest.raises(SystemExit):
+        validator_module.main()
+    assert 'no duty file given and no reference store' in capsys.readouterr().err
+    assert not db.exists()
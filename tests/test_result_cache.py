@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+import validator as validator_module
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    files = {}
+    for name in ('input.xlsx', 'shipping.xlsx', 'duty.xlsx'):
+        files[name] = tmp_path / name
+        files[name].write_bytes(name.encode('utf-8'))
+    return files['input.xlsx'], files['shipping.xlsx'], files['duty.xlsx']
+
+
+def test_callers_key_the_same_run_alike(tmp_path, inputs):
+    cache = ResultCache(tmp_path / 'cache')
+    # The command line spells out every setting, the Streamlit app takes the defaults
+    cli_key = cache.run_key(*inputs, parts_master=None, rules=None, reference_db=None, tariff_check=False,
+                            suggestions=3, shipment=None, as_of=None, annotate=False, max_errors=None)
+    assert cli_key == cache.run_key(*inputs)
+
+
+def test_key_changes_with_inputs_and_settings(tmp_path, inputs):
+    cache = ResultCache(tmp_path / 'cache')
+    key = cache.run_key(*inputs)
+    assert cache.run_key(*inputs, max_errors=1) != key
+    assert cache.run_key(*inputs, rules=inputs[2]) != cache.run_key(*inputs, parts_master=inputs[2])
+    inputs[0].write_bytes(b'edited')
+    assert cache.run_key(*inputs) != key
+    with pytest.raises(ValueError):
+        cache.run_key(*inputs, layout_cache='layouts.json')
+
+
+def test_put_then_get(tmp_path, inputs):
+    cache = ResultCache(tmp_path / 'cache')
+    key = cache.run_key(*inputs)
+    assert cache.get(key) is None
+    report = tmp_path / 'validation_report.xlsx'
+    report.write_bytes(b'report')
+    cache.put(key, report, {'errors': 2})
+    cached = cache.get(key)
+    assert cached['report'].read_bytes() == b'report'
+    assert cached['stats']['errors'] == 2
+
+
+def test_repeated_cli_run_hits_after_layouts_are_learned(tmp_path, inputs, monkeypatch, capsys):
+    layout_cache = tmp_path / 'layouts.json'
+    runs = []
+
+    def normalize(commands):
+        for command in commands.values():
+            Path(command[3]).write_bytes(b'normalized')
+
+    def validate_all(self, max_errors=None):
+        # A first run learns layouts and rewrites the layout cache
+        runs.append(self.input_file)
+        layout_cache.write_text('{}', encoding='utf-8')
+
+    def generate_report(self):
+        report = Path(self.input_file).parent / 'validation_report.xlsx'
+        report.write_bytes(b'report')
+        self.stats = {'errors': 0}
+        return report
+
+    monkeypatch.setattr(validator_module, 'run_processes', normalize)
+    monkeypatch.setattr(validator_module.ExcelValidator, 'validate_all', validate_all)
+    monkeypatch.setattr(validator_module.ExcelValidator, 'generate_report', generate_report)
+    argv = ['validator.py', *map(str, inputs), '--cache-dir', str(tmp_path / 'cache'),
+            '--layout-cache', str(layout_cache), '--reference-db', str(tmp_path / 'reference.db')]
+    monkeypatch.setattr(sys, 'argv', argv)
+
+    validator_module.main()
+    validator_module.main()
+    assert len(runs) == 1
+    assert 'validation_report.xlsx generated (cached)' in capsys.readouterr().out
+    assert len(list((tmp_path / 'cache').iterdir())) == 1
+    # A file-to-file run never touches the reference store
+    assert not (tmp_path / 'reference.db').exists()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import table_store
+from table_store import FORMATS, is_table_file, output_path, read_tables, resolve_format, write_tables
+from validator import normalize_item_numbers
+
+SHIPPING_COLUMNS = ['Item No.', 'Model No.', 'P/N', 'Description', 'Quantity PCS', 'Unit Price USD', 'Amount USD']
+
+
+@pytest.fixture
+def tables():
+    return {
+        'CI-24HC01713-1S': pd.DataFrame(
+            [[1, 'M-1', '0012345', 'Cable', 2, 1.5, 3.0],
+             [2, 'M-2', 12345, np.nan, 1, 1.0, 1.0],
+             ['TOTAL', np.nan, np.nan, np.nan, 3, np.nan, 4.0]], columns=SHIPPING_COLUMNS),
+        'CI-24HC01713-2S': pd.DataFrame([[1, 'M-3', 'PN-3', 'Plug', 4, 0.25, 1.0]], columns=SHIPPING_COLUMNS),
+        'Notes': pd.DataFrame({'Remark': ['packed in 3 cartons']}),
+    }
+
+
+@pytest.mark.parametrize('fmt', [fmt for fmt in FORMATS if fmt != 'xlsx'])
+def test_tables_round_trip(tmp_path, tables, fmt):
+    if fmt in ('feather', 'parquet'):
+        pytest.importorskip('pyarrow')
+    path = output_path(tmp_path / 'shipping_normalized.xlsx', fmt)
+    assert is_table_file(path)
+    write_tables(tables, path, fmt)
+    loaded = read_tables(path)
+    assert list(loaded) == list(tables)
+    for name, df in tables.items():
+        expected = df.infer_objects()
+        if fmt != 'pickle':
+            # Arrow stores a column mixing numbers and text as text
+            expected = table_store._arrow_safe(expected)
+        pd.testing.assert_frame_equal(loaded[name], expected)
+
+
+def test_arrow_formats_fall_back_to_pickle(monkeypatch):
+    monkeypatch.setattr(table_store, 'has_pyarrow', lambda: False)
+    assert resolve_format('feather') == 'pickle'
+    assert resolve_format('xlsx') == 'xlsx'
+    with pytest.raises(ValueError):
+        resolve_format('csv')
+
+
+@pytest.mark.parametrize('fmt', ['pickle', 'feather'])
+def test_shipping_list_loads_alike_from_workbook_and_table_file(tmp_path, tables, validator, fmt):
+    if fmt == 'feather':
+        pytest.importorskip('pyarrow')
+    workbook = tmp_path / 'shipping_normalized.xlsx'
+    with pd.ExcelWriter(workbook) as writer:
+        for name, df in tables.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    table_file = output_path(workbook, fmt)
+    write_tables(tables, table_file, fmt)
+
+    from_workbook = validator.load_shipping_data(str(workbook))
+    declared = dict(validator.declared_totals)
+    validator.declared_totals.clear()
+    from_table = validator.load_shipping_data(str(table_file))
+    assert list(from_table) == list(from_workbook) == ['CI-24HC01713-1S', 'CI-24HC01713-2S']
+    for name in from_table:
+        # Columns mixing numbers and text are stored as text; validation compares them canonically
+        table_df, workbook_df = (df.assign(**{'P/N': df['P/N'].map(validator.clean_pn_value),
+                                              'Item No.': normalize_item_numbers(df['Item No.'])})
+                                 for df in (from_table[name], from_workbook[name]))
+        pd.testing.assert_frame_equal(table_df, workbook_df, check_dtype=False, check_names=False,
+                                      check_index_type=False, check_column_type=False)
+    assert validator.declared_totals == declared == {'CI-24HC01713-1S': {'Quantity PCS': 3000, 'Amount USD': 400}}
@@ -0,0 +1,285 @@
+import pandas as pd
+import pytest
+
+from validator import normalize_item_numbers
+
+
+def lines(*rows, columns=('P/N', 'Item Nos.', 'Description', 'Quantity PCS', 'Unit Price USD', 'Amount USD')):
+    return pd.DataFrame(list(rows), columns=list(columns))
+
+
+# P/N groups spanning several lines
+
+def test_item_numbers_keep_letters():
+    items = pd.Series(['A1', 1, 1.0, ' a 1 ', None], dtype=object)
+    assert normalize_item_numbers(items).tolist() == ['A1', '1', '1', 'A1', '']
+
+
+def test_group_lines_pair_by_item_number(validator):
+    checklist = lines(['PN-1', 2, 'Cable', 1, 1.0, 1.0], ['PN-1', 1, 'Cable', 5, 1.0, 5.0])
+    shipping = lines(['PN-1', 1, 'Cable', 5, 1.0, 5.0], ['PN-1', 2, 'Cable', 1, 1.0, 1.0])
+    pairing = validator.pair_shipping_lines(validator.line_keys(checklist), validator.line_keys(shipping))
+    assert pairing.tolist() == [1, 0]
+
+
+def test_group_lines_pair_by_order_without_item_numbers(validator):
+    checklist = lines(['PN-1', 'A1', 'Cable', 1, 1.0, 1.0], ['PN-1', 'A2', 'Cable', 5, 1.0, 5.0])
+    shipping = lines(['PN-1', 1, 'Cable', 1, 1.0, 1.0], ['PN-1', 2, 'Cable', 5, 1.0, 5.0])
+    # "A1" is not item 1, so the lines pair in order of appearance
+    pairing = validator.pair_shipping_lines(validator.line_keys(checklist), validator.line_keys(shipping))
+    assert pairing.tolist() == [0, 1]
+
+
+def test_split_group_reconciles_on_totals(run_sheet):
+    checklist = lines(['PN-1', 1, 'Cable', 100, 0.5, 50.0])
+    shipping = lines(['PN-1', 1, 'Cable', 50, 0.5, 25.0], ['PN-1', 2, 'Cable', 50, 0.5, 25.0])
+    assert run_sheet(checklist, shipping) == []
+
+
+def test_split_group_reports_total_mismatch(run_sheet):
+    checklist = lines(['PN-1', 1, 'Cable', 100, 0.5, 50.0])
+    shipping = lines(['PN-1', 1, 'Cable', 40, 0.5, 20.0], ['PN-1', 2, 'Cable', 50, 0.5, 25.0])
+    errors = [error for error in run_sheet(checklist, shipping) if error['Type'] == 'group_total_mismatch']
+    assert [error['Error'].split(':')[0] for error in errors] == [
+        'Total Quantity PCS mismatch across 1 input and 2 shipping lines',
+        'Total Amount USD mismatch across 1 input and 2 shipping lines',
+    ]
+    assert 'vs 45.00' in errors[1]['Error']
+
+
+# Line arithmetic and invoice totals in integer cents
+
+def amounts(*rows):
+    return lines(*rows, columns=('P/N', 'Quantity PCS', 'Unit Price USD', 'Amount USD'))
+
+
+def test_line_arithmetic_in_cents(validator):
+    # 3 x 0.1 is 0.30000000000000004 in floats; in cents it is exactly 30
+    validator.reconcile_amounts(amounts(['PN-1', 3, 0.1, 0.3], ['PN-2', 3, 0.1, 0.31]), 'Invoice 1')
+    assert [(error['Row'], error['Type']) for error in validator.validation_errors] == [
+        (2, 'line_amount_mismatch')]
+
+
+def test_unit_price_rounding_is_not_an_error(validator):
+    # 7 x 0.142857 = 0.999999, declared as 1.00
+    validator.reconcile_amounts(amounts(['PN-1', 7, 0.142857, 1.0]), 'Invoice 1')
+    assert validator.validation_errors == []
+
+
+def test_fractional_quantities(validator):
+    validator.reconcile_amounts(amounts(['PN-1', 2.5, 4.0, 10.0], ['PN-2', 0.4, 10.0, 4.0],
+                                        ['PN-3', 1.25, 0.333333, 0.42], ['PN-4', 2.5, 4.0, 10.5]), 'Invoice 1')
+    assert [error['Row'] for error in validator.validation_errors] == [4]
+
+
+def test_fractional_group_totals(run_sheet):
+    checklist = lines(['PN-1', 1, 'Cable', 0.3, 1.0, 0.3])
+    shipping = lines(['PN-1', 1, 'Cable', 0.1, 1.0, 0.1], ['PN-1', 2, 'Cable', 0.2, 1.0, 0.2])
+    assert run_sheet(checklist, shipping) == []
+    shipping.loc[1, ['Quantity PCS', 'Amount USD']] = 0.25
+    errors = [error['Error'] for error in run_sheet(checklist, shipping) if error['Type'] == 'group_total_mismatch']
+    assert errors[0].endswith('0.3 vs 0.35')
+
+
+def test_total_line_checked_against_lines(validator):
+    validator.reconcile_amounts(amounts(['PN-1', 1, 0.1, 0.1], ['PN-2', 1, 0.2, 0.2], [None, None, None, 0.3]),
+                                'Invoice 1')
+    validator.reconcile_amounts(amounts(['PN-3', 1, 0.1, 0.1], [None, None, None, 0.11]), 'Invoice 2')
+    assert [(error['Sheet'], error['Row'], error['Type']) for error in validator.validation_errors] == [
+        ('Invoice 2', 2, 'invoice_total_mismatch')]
+
+
+def test_total_line_of_invoice_without_amounts(validator):
+    validator.reconcile_amounts(amounts(['PN-1', 1, 1.0, None], [None, None, None, 5.0]), 'Invoice 1')
+    assert len(validator.validation_errors) == 1
+    assert "this invoice's lines (N/A)" in validator.validation_errors[0]['Error']
+
+
+def test_shipping_errors_ordered_by_sheet(validator):
+    bad_lines = amounts(['PN-1', 2, 1.0, 3.0], ['PN-2', 1, 1.0, 1.0], ['PN-3', 2, 1.0, 3.0])
+    validator.sheet_order = {'Invoice 1': 0}
+    validator.log_error('Invoice 1', 5, 'PN-9', 'checklist error')
+    validator.reconcile_shipping_amounts({'Shipping B': bad_lines, 'Shipping A': bad_lines.iloc[1:].reset_index(drop=True)})
+    errors = validator.collect_errors()
+    assert list(zip(errors['Sheet'], errors['Row'])) == [
+        ('Invoice 1', 6), ('Shipping B', 1), ('Shipping B', 3), ('Shipping A', 2)]
+
+
+# Tariff verification against the duty file
+
+def tariff(*rows):
+    # The rate headers repeat for each duty scheme; the first group is Normal duty
+    return pd.DataFrame(list(rows), columns=['Item name', 'India HS code', 'BCD', 'SWS', 'IGST', 'BCD', 'SWS', 'IGST'])
+
+
+def tariff_lines(*rows):
+    return pd.DataFrame(list(rows), columns=['P/N', 'Item name', 'India HS code', 'Duty', 'Welfare', 'IGST'])
+
+
+def test_tariff_table_keeps_normal_duty(validator):
+    validator.duty_rates = tariff(['Power  cable', '8544.42.00', '10%', 0.1, 18, 0, 0, 0], [None, None, 0, 0, 0, 0, 0, 0])
+    table = validator.build_tariff_table()
+    assert table.to_dict('records') == [{'name_key': 'POWER CABLE', 'tariff_hs': '85444200',
+                                         'tariff_BCD': 10.0, 'tariff_SWS': 10.0, 'tariff_IGST': 18.0}]
+
+
+def test_tariff_rates_match_in_any_notation(validator):
+    validator.duty_rates = tariff(['Power cable', 85444200, 10, 10, 18, 0, 0, 0])
+    validator.verify_tariff(tariff_lines(['PN-1', 'power cable', '8544 42 00', '10%', 0.1, 18.0]), 'Invoice 1')
+    assert validator.validation_errors == []
+
+
+def test_tariff_mismatches_reported_per_column(validator):
+    validator.duty_rates = tariff(['Power cable', 85444200, 10, 10, 18, 0, 0, 0], ['Fuse', 85361000, 7.5, 10, 18, 0, 0, 0])
+    validator.verify_tariff(tariff_lines(['PN-1', 'Power cable', 85444900, 10, 10, 28],
+                                         ['PN-2', 'Relay', 85364900, 10, 10, 18]), 'Invoice 1')
+    assert [(error['Row'], error['Type']) for error in validator.validation_errors] == [
+        (2, 'tariff_not_found'), (1, 'hs_code_mismatch'), (1, 'igst_rate_mismatch')]
+    assert validator.validation_errors[2]['Error'] == 'IGST rate mismatch for Power cable: 28.0 vs tariff 18.0 (IGST)'
+
+
+def test_tariff_prefers_row_with_matching_hs_code(validator):
+    # "Cable" is contained in both tariff names; the one with the same HS code wins
+    validator.duty_rates = tariff(['Power cable', 85444200, 10, 10, 18, 0, 0, 0],
+                                  ['Data cable', 85444900, 7.5, 10, 18, 0, 0, 0])
+    validator.verify_tariff(tariff_lines(['PN-1', 'Cable', 85444900, 7.5, 10, 18]), 'Invoice 1')
+    assert validator.validation_errors == []
+
+
+# Sheet pairing by invoice number
+
+def sheet_names(*names):
+    return {name.strip().lower(): name for name in names}
+
+
+def test_sheets_pair_by_invoice_number(validator):
+    pairing = validator.pair_sheets(sheet_names('CI 24HC01713-2S', 'CI 24HC01713-1S'),
+                                    ['24hc01713-1s packing', '24hc01713-2s packing'])
+    assert pairing == {'ci 24hc01713-2s': '24hc01713-2s packing', 'ci 24hc01713-1s': '24hc01713-1s packing'}
+    assert {row['Method'] for row in validator.pairing_report} == {'invoice number'}
+
+
+def test_sheets_pair_by_shipping_title(validator):
+    # The shipping sheet name has no invoice number; its title block does
+    validator.shipping_titles = {'Sheet2': '24HC01713-1S'}
+    pairing = validator.pair_sheets(sheet_names('24HC01713-1S'), ['Sheet1', 'Sheet2'])
+    assert pairing == {'24hc01713-1s': 'Sheet2'}
+
+
+def test_leftover_sheets_pair_by_name(validator):
+    pairing = validator.pair_sheets(sheet_names('24HC01713-1S', 'Spare parts', 'Misc'),
+                                    ['Packing 24HC01713-1S', 'Spare_Parts', 'Tools'])
+    assert pairing == {'24hc01713-1s': 'Packing 24HC01713-1S', 'spare parts': 'Spare_Parts'}
+    assert [(row['Input Sheet'], row['Shipping Sheet'], row['Method']) for row in validator.pairing_report] == [
+        ('24HC01713-1S', 'Packing 24HC01713-1S', 'invoice number'), ('Spare parts', 'Spare_Parts', 'fuzzy name'),
+        ('Misc', '', 'unpaired'), ('', 'Tools', 'unpaired')]
+
+
+# Alternate materials and other invoices
+
+def shipping_with_alternates(*rows):
+    return lines(*rows, columns=('P/N', 'Description', 'Quantity PCS', 'Unit Price USD', 'Amount USD',
+                                 'Alternative materials'))
+
+
+def test_alternate_matches_primary_line(validator, run_sheet):
+    shipping = shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 2.0, 'PN-1B; pn 1c'],
+                                        ['PN-2', 'Plug', 1, 1.0, 1.0, None])
+    checklist = lines(['PN-1C', 1, 'Cable', 3, 1.0, 3.0], ['PN-2', 2, 'Plug', 1, 1.0, 1.0])
+    errors = run_sheet(checklist, shipping)
+    # An approved substitute is a note, not an error
+    assert [(note['Row'], note['Type'], note['Primary P/N']) for note in validator.notes] == [
+        (1, 'alternate_match', 'PN-1')]
+    # The substitute line is compared against its primary line
+    assert [(error['Row'], error['Error']) for error in errors] == [
+        (1, 'Value mismatch in column Quantity PCS: 3 vs 2'), (1, 'Value mismatch in column Amount USD: 3.0 vs 2.0')]
+
+
+def test_own_line_wins_over_alternate(run_sheet):
+    shipping = shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 2.0, 'PN-2'],
+                                        ['PN-2', 'Plug', 1, 1.0, 1.0, None])
+    checklist = lines(['PN-2', 1, 'Plug', 1, 1.0, 1.0])
+    assert run_sheet(checklist, shipping) == []
+
+
+def test_unmatched_line_found_in_other_invoice(validator, run_sheet):
+    shipping = {'Invoice 1': shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 2.0, 'PN-1B']),
+                'Invoice 2': shipping_with_alternates(['PN-7', 'Fuse', 4, 0.5, 2.0, None])}
+    validator.build_global_index(shipping)
+    checklist = lines(['PN-7', 1, 'Fuse', 4, 0.5, 2.0], ['PN-8', 2, 'Fuse', 1, 0.5, 0.5])
+    errors = run_sheet(checklist, shipping['Invoice 1'])
+    assert [(error['Row'], error['Type']) for error in errors] == [
+        (1, 'cross_invoice_match'), (2, 'pn_not_found')]
+    assert errors[0]['Found In'] == 'Invoice 2 (row 1)'
+
+
+# Streaming errors with a limit
+
+@pytest.fixture
+def loaded(validator, monkeypatch):
+    """Feed validate_iter in-memory sheets instead of files"""
+    def load(input_sheets, shipping):
+        monkeypatch.setattr(validator, 'load_excel_files', lambda: {
+            'shipping': shipping, 'input_data': dict(input_sheets), 'input_sheets': input_sheets,
+            'duty_rates': validator.duty_rates})
+        return validator
+    return load
+
+
+def unknown_lines(count):
+    return lines(*[[f'PN-{n}', n, 'Cable', 1, 1.0, 1.0] for n in range(count)])
+
+
+def test_max_errors_cuts_report_and_annotations(loaded):
+    validator = loaded({'24HC01713-1': unknown_lines(5)},
+                       {'24HC01713-1': shipping_with_alternates(['PN-X', 'Cable', 1, 1.0, 1.0, None])})
+    validator.annotate = True
+    events = []
+    validator.events.on('error', lambda **error: events.append(error['row']))
+    errors = list(validator.validate_iter(max_errors=3))
+    assert [error['Row'] for error in errors] == [1, 2, 3]
+    assert events == [1, 2, 3]
+    assert validator.stopped_early
+    assert validator.collect_errors()['Row'].tolist() == [1, 2, 3]
+    notes = validator.annotations['24HC01713-1']
+    assert sum(len(row_notes) for row_notes in notes.values()) == 3
+
+
+def test_errors_under_the_limit_all_handed_out(loaded):
+    validator = loaded({'24HC01713-1': unknown_lines(2)},
+                       {'24HC01713-1': shipping_with_alternates(['PN-X', 'Cable', 2, 1.0, 2.0, None])})
+    assert len(list(validator.validate_iter(max_errors=3))) == 2
+    assert not validator.stopped_early
+
+
+def test_alternate_matches_do_not_count_as_errors(loaded, tmp_path):
+    validator = loaded({'24HC01713-1': lines(['PN-1B', 1, 'Cable', 2, 1.0, 2.0])},
+                       {'24HC01713-1': shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 2.0, 'PN-1B'])})
+    validator.annotate = True
+    assert list(validator.validate_iter(max_errors=1)) == []
+    assert not validator.stopped_early
+    assert [note['Type'] for note in validator.notes] == ['alternate_match']
+    # The note is still highlighted in the annotated checklist
+    assert validator.annotations['24HC01713-1'][0][0][1] == 'alternate_match'
+    validator.input_file = tmp_path / 'checklist_normalized.xlsx'
+    report = pd.read_excel(validator.generate_report(), sheet_name=None)
+    assert report['Errors'].empty and report['Notes']['Type'].tolist() == ['alternate_match']
+    assert (validator.stats['errors'], validator.stats['notes']) == (0, 1)
+
+
+def test_cut_errors_leave_notes_annotated(loaded):
+    validator = loaded({'24HC01713-1': lines(['PN-1B', 1, 'Cable', 3, 1.0, 3.0])},
+                       {'24HC01713-1': shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 2.0, 'PN-1B'])})
+    validator.annotate = True
+    errors = list(validator.validate_iter(max_errors=1))
+    assert [error['Type'] for error in errors] == ['value_mismatch']
+    assert [message for _, _, message in validator.annotations['24HC01713-1'][0]] == [
+        validator.notes[0]['Note'], errors[0]['Error']]
+
+
+def test_shipping_errors_handed_out_without_checklist_sheets(loaded):
+    validator = loaded({}, {'24HC01713-1': shipping_with_alternates(['PN-1', 'Cable', 2, 1.0, 3.0, None])})
+    errors = list(validator.validate_iter(keep=False))
+    assert [(error['Sheet'], error['Type']) for error in errors] == [('24HC01713-1', 'line_amount_mismatch')]
+    # keep=False leaves the errors to the caller
+    assert validator.collect_errors().empty
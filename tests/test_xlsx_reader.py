@@ -0,0 +1,58 @@
+import datetime
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from xlsx_reader import read_excel, sheet_names
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Two sheets mixing text, numbers, dates, blanks and repeated (shared) strings"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Invoice 1'
+    ws.append(['Commercial Invoice 24HC01713-1S'])
+    ws.append([])
+    ws.append(['P/N', 'Description', 'Quantity PCS', 'Unit Price USD', 'Amount USD', 'Date'])
+    ws.append(['0012345', 'Cable', 2, 1.25, 2.5, datetime.datetime(2023, 8, 22)])
+    ws.append(['A-77', 'Cable', 3, 0.1, 0.3, None])
+    ws.append([None, None, None, None, 2.8, None])
+    other = wb.create_sheet('Invoice 2')
+    other.append(['P/N', 'Quantity PCS'])
+    other.append([12345, 1000000])
+    other.append(['X1', -7.5])
+    path = tmp_path / 'sample.xlsx'
+    wb.save(path)
+    return path
+
+
+def test_fast_reader_lists_same_sheets(workbook):
+    assert sheet_names(workbook, reader='fast') == sheet_names(workbook)
+
+
+@pytest.mark.parametrize('header', [None, 0, 2])
+def test_fast_reader_matches_openpyxl(workbook, header):
+    expected = read_excel(workbook, sheet_name=None, header=header)
+    actual = read_excel(workbook, sheet_name=None, header=header, reader='fast')
+    assert list(actual) == list(expected)
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name])
+
+
+def test_fast_reader_honours_nrows(workbook):
+    expected = read_excel(workbook, sheet_name='Invoice 1', header=2, nrows=1)
+    actual = read_excel(workbook, sheet_name='Invoice 1', header=2, nrows=1, reader='fast')
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_fast_reader_matches_openpyxl_on_sample_checklist():
+    path = ROOT / 'input.xlsx'
+    expected = read_excel(path, sheet_name=None, header=None)
+    actual = read_excel(path, sheet_name=None, header=None, reader='fast')
+    for name in expected:
+        pd.testing.assert_frame_equal(actual[name], expected[name])
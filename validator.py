@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Iterator, Tuple
 import argparse
+import sys
 import logging
 from difflib import SequenceMatcher
 import warnings
@@ -11,21 +12,158 @@ import re
 import math
 import subprocess
 import os
-
-def clean_column_name(name: str) -> str:
-    """Handle CR characters and normalize names"""
-    return str(name).replace('\r', '').replace('\n', '').strip()
+import shutil
+import time
+import importlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import xlsxwriter
+from xlsx_reader import READERS, iter_sheet_rows, read_excel, rows_to_frame, sheet_names
+from csv_reader import is_csv_source
+from table_store import FORMATS, is_table_file, output_path, read_tables, resolve_format
+from pn_index import ALTERNATES_COLUMN, AlternateIndex, GlobalPNIndex, PNSuggestionIndex
+from layout_cache import DEFAULT_PATH as DEFAULT_LAYOUT_CACHE, LayoutRegistry
+from error_spool import ErrorSpool, current_rss
+from result_cache import ResultCache
+from events import EventEmitter
+from reference_store import DEFAULT_PATH as DEFAULT_REFERENCE_DB, ReferenceStore, StoredPNIndex
+from canonical import extract_invoice_key, normalize_item_names
+from parts_master import PartsMaster
+from rules import RuleSet
 
 def normalize_sheet_name(name: str) -> str:
     """Clean sheet names for comparison"""
     return name.strip().lower().replace(' ', '').replace('-', '').replace('_', '')
 
+def normalize_hs_codes(codes: pd.Series) -> pd.Series:
+    """HS codes as digit strings: 85331000, 85331000.0, '8533.10.00' and '8533 10 00' all compare equal"""
+    # Only a float's trailing .0 is dropped; the last group of a dotted code is kept
+    text = codes.astype(str).str.strip().str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+    return text.str.replace(r'\D', '', regex=True).where(codes.notna(), '')
+
+def normalize_item_numbers(items: pd.Series) -> pd.Series:
+    """Item numbers as compact upper-case text: 1, 1.0 and ' 1 ' compare equal, 'A1' and '1' do not"""
+    text = items.astype(str).str.strip().str.upper().str.replace(r'\.0+$', '', regex=True)
+    return text.str.replace(r'\s+', '', regex=True).where(items.notna(), '')
+
+def normalize_rates(rates: pd.Series) -> pd.Series:
+    """Tax rates as percentages: '18%', 18 and 0.18 all become 18.0"""
+    values = pd.to_numeric(rates.astype(str).str.replace('%', '', regex=False).str.strip(),
+                           errors='coerce').astype(float)
+    # Fractions (0 < rate < 1) are written as 0.18 for 18%
+    return values.where(~((values > 0) & (values < 1)), values * 100)
+
+# Integer money units: amounts are exact in cents, unit prices are quoted to 6 decimals,
+# quantities (which may be fractional, e.g. metres of cable) to 3 decimals
+CENTS = 100
+PRICE_UNITS = 10 ** 6
+QUANTITY_UNITS = 1000
+
+def to_units(values: pd.Series, scale: int) -> pd.Series:
+    """Numbers as nullable int64 multiples of 1/scale, rounded once (blank or text -> <NA>)"""
+    return np.round(pd.to_numeric(values, errors='coerce') * scale).astype('Int64')
+
+def read_sheet_task(path, sheet_name, header, reader: str):
+    """Process pool task: parse one sheet, or every sheet of a table file or CSV/TSV export"""
+    if is_table_file(path):
+        return read_tables(path)
+    return read_excel(path, sheet_name=sheet_name, header=header, reader=reader)
+
+def run_processes(commands: Dict[str, List[str]]):
+    """Run independent commands side by side, raising with the labels of any that failed"""
+    processes = {label: subprocess.Popen(command) for label, command in commands.items()}
+    failed = [f"{label} (exit code {code})" for label, code in
+              ((label, process.wait()) for label, process in processes.items()) if code != 0]
+    if failed:
+        raise RuntimeError(f"Failed: {', '.join(failed)}")
+
 class ExcelValidator:
-    def __init__(self, input_file: str, shipping_list: str, duty_file: str):
+    # Item number headers used by the normalized input and shipping files
+    ITEM_NO_COLUMNS = ('Item Nos.', 'Item No.', 'Item Nos', 'Item No')
+    # Columns reconciled as per-P/N totals when a part spans several lines
+    TOTAL_COLUMNS = ('Quantity PCS', 'Amount USD')
+    # Checklist rate columns and the tariff (Normal duty) columns they are checked against
+    TARIFF_RATE_COLUMNS = {'Duty': 'BCD', 'Welfare': 'SWS', 'IGST': 'IGST'}
+    # Chunked mode: share of the free memory budget a chunk may use, the working-set
+    # multiple of a line's own size (keys, merges, row Series, error records), and a floor
+    CHUNK_MEMORY_SHARE = 0.5
+    ROW_OVERHEAD = 10
+    MIN_CHUNK_ROWS = 1000
+    # Cell fills in the annotated checklist; other error types (tariff checks) use ANNOTATION_DEFAULT
+    ANNOTATION_COLORS = {
+        'missing_pn': '#FFC7CE', 'pn_not_found': '#FFC7CE', 'unknown_part': '#FFC7CE',
+        'value_mismatch': '#FFEB9C', 'text_mismatch': '#FFEB9C', 'group_total_mismatch': '#FFEB9C',
+        'cross_invoice_match': '#BDD7EE', 'alternate_match': '#BDD7EE',
+    }
+    ANNOTATION_DEFAULT = '#F8CBAD'
+    # Line arithmetic columns and the integer scale each is reconciled in
+    MONEY_UNITS = {'Quantity PCS': QUANTITY_UNITS, 'Unit Price USD': PRICE_UNITS, 'Amount USD': CENTS}
+    # Item No. of the declared total line closing a shipping invoice
+    DECLARED_TOTAL_PATTERN = r'\s*TOTAL\b'
+    # Quick check: lines sampled per checklist invoice, shipping rows read above the first line
+    PREVIEW_LINES = 20
+    PREVIEW_HEADER_ROWS = 30
+    # Sampled match rates below this get a warning in the quick check summary
+    PREVIEW_MIN_MATCH_RATE = 0.8
+
+    def __init__(self, input_file: str, shipping_list: str, duty_file: str,
+                 reader: str = 'openpyxl', tariff_check: bool = False,
+                 suggestions: int = 3, layout_cache=DEFAULT_LAYOUT_CACHE,
+                 max_memory: int = None, reference_db=DEFAULT_REFERENCE_DB,
+                 shipment: str = None, as_of: str = None, parts_master: str = None,
+                 annotate: bool = False, load_workers: int = None, rules: str = None):
         self.input_file = input_file
         self.shipping_list = shipping_list
         self.duty_file = duty_file
+        self.reader = reader
+        self.tariff_check = tariff_check
+        self.tariff_table = None
+        self.suggestions = suggestions
+        self.suggestion_index = None
+        self.global_index = None
+        self.shipping_records = {}
+        self.shipping_titles = {}
+        self.pairing_report = []
+        self.layouts = LayoutRegistry(layout_cache) if layout_cache else None
         self.validation_errors = []
+        # Informational findings (lines matched via an approved substitute): reported on their own
+        # sheet, never counted as errors, towards max_errors or in the exit status
+        self.notes = []
+        # Memory ceiling in MB; when set, sheets are validated in chunks and errors spooled to disk
+        self.max_memory = max_memory
+        self.error_spool = None
+        self.sheet_order = {}
+        # Shipping sheet positions, ordering the shipping-side errors after the checklist sheets
+        self.shipping_order = {}
+        self.stats = {}
+        self.error_count = 0
+        # Streaming: errors logged but not yet handed out by validate_iter, and whether it stopped early
+        self.errors_seen = 0
+        self.errors_yielded = 0
+        self.stopped_early = False
+        # Reference store: a stored shipment replaces shipping_list, an as-of date replaces duty_file
+        self.reference_db = reference_db
+        self.shipment = shipment
+        self.as_of = as_of
+        self.store = None
+        # Memory-mapped catalog of known P/N hashes (parts_master.py compiles it)
+        self.parts_master = PartsMaster(parts_master) if parts_master else None
+        # Annotated checklist: sheet -> row -> [(column, type, message)], filled in by log_error
+        self.annotate = annotate
+        self.annotations = defaultdict(lambda: defaultdict(list))
+        self.input_sheets = {}
+        # Shipping invoice totals in integer units: declared on the TOTAL line, and summed over the lines
+        self.declared_totals = {}
+        self.invoice_totals = pd.DataFrame()
+        # Running checklist amount in cents, for a closing grand total line
+        self.checklist_total = 0
+        # Column aliases and line comparison rules (rules.DEFAULT_RULES overlaid by a rule file)
+        self.rules = RuleSet.load(rules)
+        # Processes parsing the workbooks (None = one per CPU, 1 = parse serially in this process)
+        self.load_workers = load_workers
+        # Progress/instrumentation hooks (see events.EVENTS)
+        self.events = EventEmitter()
         # Set up logging
         logging.basicConfig(
             level=logging.INFO,
@@ -68,146 +206,82 @@ class ExcelValidator:
         """Get and clean P/N from a dataframe row (Series)"""
         return self.clean_pn_value(row['P/N'] if 'P/N' in row else 'N/A')
 
-    def extract_valid_data(self, df: pd.DataFrame, file_type: str) -> pd.DataFrame:
-        """Extract valid data rows from a DataFrame, skipping non-table content"""
-        # Add data snapshot logging
-        self.logger.debug(f"Raw data sample for {file_type}:\n{df.head(3).to_string()}")
-        
-        # Only check first 5 rows for headers
-        for idx, row in df.head(5).iterrows():
-            if self.is_header_row(row):
-                header_row = idx
-                break
-        else:
-            self.logger.error(f"Header not found in {file_type}. First rows:\n{df.head(3).to_string()}")
-            return pd.DataFrame()
-        
-        # Remove all rows before the header
-        data_df = df.iloc[header_row:].copy()
-        
-        # Clean column names (remove whitespace and newlines)
-        data_df.columns = [clean_column_name(str(col)) for col in data_df.columns]
-        
-        # Updated column mappings based on normalization specs
-        column_mappings = {
-            'P/N': ['P/N', 'Part Number', 'Part No', 'PartNo', '料号'],
-            'Item Nos': ['Item Nos.', 'Item Number', '项目编号', 'Item No'],
-            'Model Nos': ['Model Nos.', 'Model Number', '型号', 'Model'],
-            'Description': ['Description', '产品描述', 'Desc'],
-            'Quantity PCS': ['Quantity PCS', 'QTY', '数量', 'Quantity'],
-            'Unit Price USD': ['Unit Price USD', 'Price', '单价', 'Unit Price'],
-            'Amount USD': ['Amount USD', 'Total Amount', '总金额', 'Amount'],
-            'India HS code': ['India HS code', 'HS Code', 'HSN Code'],
-            'Duty': ['Duty', 'Duty Rate', '税率'],
-            'Welfare': ['Welfare', 'Welfare Tax', '福利税'],
-            'IGST': ['IGST', 'GST', '综合税']
-        }
-        
-        # Debug log before standardization
-        self.logger.debug(f"\nColumns before standardization: {data_df.columns.tolist()}")
+    def find_header_row(self, kind: str, df: pd.DataFrame, is_header, max_rows: int = None):
+        """Header row position from the layout registry, falling back to a row scan"""
+        layout = self.layouts.lookup(kind, df) if self.layouts is not None else None
+        if layout:
+            return layout['header_row']
         
-        # Standardize column names
-        for standard_name, possible_names in column_mappings.items():
-            found_col = next((col for col in possible_names if col in data_df.columns), None)
-            if found_col:
-                data_df = data_df.rename(columns={found_col: standard_name})
-        
-        # Debug log after standardization
-        self.logger.debug(f"\nColumns after standardization: {data_df.columns.tolist()}")
-        
-        # Add P/N column validation
-        if 'P/N' not in data_df.columns:
-            self.logger.error(f"Missing P/N column in {file_type}")
-            return pd.DataFrame()
-        
-        # Remove rows where P/N is empty or NaN
-        if 'P/N' in data_df.columns:
-            data_df = data_df[data_df['P/N'].notna()]
-            # Clean P/N values
-            data_df['P/N'] = data_df['P/N'].astype(str).str.strip()
-        
-        # Convert Quantity to numeric, handling any non-numeric values
-        if 'Quantity' in data_df.columns:
-            data_df['Quantity'] = pd.to_numeric(data_df['Quantity'], errors='coerce')
-            data_df = data_df[data_df['Quantity'].notna()]  # Remove rows with invalid quantities
-        
-        # Add P/N cleaning debug
-        if 'P/N' in data_df.columns:
-            data_df['Cleaned_P/N'] = data_df['P/N'].apply(self.clean_pn_value)
-            self.logger.debug(f"Cleaned P/N samples ({file_type}):\n{data_df[['P/N', 'Cleaned_P/N']].head(10)}")
-        
-        # Debug log the final processed DataFrame
-        self.logger.debug(f"\nProcessed DataFrame for {file_type}:\n{data_df.head()}")
-        self.logger.debug(f"Extracted {len(data_df)} valid rows from {file_type}")
-        self.logger.debug(f"Final columns: {data_df.columns.tolist()}")
-        
-        # Remove empty columns (common in files with formatting)
-        data_df = data_df.dropna(axis=1, how='all')
-        
-        if data_df.empty:
-            self.logger.warning(f"No data rows found after processing in {file_type}")
-            return pd.DataFrame()
-        
-        # Additional check for meaningful data
-        if data_df.iloc[:, 0].isna().all():
-            self.logger.warning(f"First column is empty in {file_type}, possible formatting issues")
-            return pd.DataFrame()
-        
-        return data_df
-
-    def process_duty_file(self) -> pd.DataFrame:
-        """Process duty file with special handling"""
-        duty_df = pd.read_excel(self.duty_file, header=None)
-        return self.extract_valid_data(duty_df, "duty file")
+        rows = df if max_rows is None else df.head(max_rows)
+        for idx in range(len(rows)):
+            if is_header(rows.iloc[idx]):
+                if self.layouts is not None:
+                    self.layouts.learn(kind, df, idx)
+                return idx
+        return None
 
-    def process_input_file(self) -> Dict[str, pd.DataFrame]:
-        """Process input file sheets"""
-        input_sheets = {}
-        xl = pd.ExcelFile(self.input_file)
-        for sheet_name in xl.sheet_names:
-            df = pd.read_excel(self.input_file, sheet_name=sheet_name, header=None)
-            processed_df = self.extract_valid_data(df, f"input sheet {sheet_name}")
-            if not processed_df.empty:
-                input_sheets[sheet_name] = processed_df
-        return input_sheets
-
-    def load_shipping_data(self, file_path: str) -> Dict[str, pd.DataFrame]:
-        """Load shipping data with flexible header detection"""
-        all_sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+    def load_shipping_data(self, file_path: str, all_sheets: Dict[str, pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+        """Load shipping data with flexible header detection (all_sheets: already parsed sheets)"""
+        if is_table_file(file_path):
+            return self.load_shipping_tables(file_path, all_sheets)
+        
+        if all_sheets is None:
+            all_sheets = read_excel(file_path, sheet_name=None, header=None, reader=self.reader)
         valid_sheets = {}
         
         for sheet_name, df in all_sheets.items():
-            header_row = None
-            # Check first 5 rows for headers
-            for idx in range(min(5, len(df))):
-                if self.is_header_row(df.iloc[idx]):
-                    header_row = idx
-                    break
+            header_row = self.find_header_row('shipping', df, self.is_header_row, max_rows=5)
             
             if header_row is not None:
                 try:
+                    # Keep the invoice number from the title block above the header for pairing
+                    title_key = next((key for key in map(extract_invoice_key, df.iloc[:header_row].values.ravel())
+                                      if key), '')
+                    if title_key:
+                        self.shipping_titles[sheet_name] = title_key
+                    
                     # Use found header row
                     df.columns = df.iloc[header_row]
                     valid_df = df.iloc[header_row+1:].dropna(how='all')
                     
                     # Validate we found actual data rows
                     if len(valid_df) > 0 and 'Item No.' in valid_df.columns:
-                        valid_sheets[sheet_name] = valid_df.reset_index(drop=True)
+                        valid_sheets[sheet_name] = self.split_declared_total(sheet_name, valid_df)
                 except Exception as e:
                     self.logger.error(f"Error processing {sheet_name}: {str(e)}")
         
         return valid_sheets
 
-    def load_duty_rates(self, file_path: str) -> pd.DataFrame:
-        """Load duty rate file with proper header detection"""
-        df = pd.read_excel(file_path, header=None)
+    def load_shipping_tables(self, file_path: str, tables: Dict[str, pd.DataFrame] = None) -> Dict[str, pd.DataFrame]:
+        """Load normalized shipping tables, which already carry their header"""
+        valid_sheets = {}
+        if tables is None:
+            tables = read_tables(file_path)
+        for sheet_name, df in tables.items():
+            if not self.is_header_row(pd.Series(df.columns)):
+                continue
+            valid_df = df.dropna(how='all')
+            if len(valid_df) > 0 and 'Item No.' in valid_df.columns:
+                valid_sheets[sheet_name] = self.split_declared_total(sheet_name, valid_df)
+        return valid_sheets
+
+    def split_declared_total(self, sheet_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop an invoice's TOTAL line from its shipping sheet, keeping its figures as the declared total"""
+        is_total = df['Item No.'].astype(str).str.match(self.DECLARED_TOTAL_PATTERN, case=False, na=False)
+        if is_total.any():
+            total = df[is_total].iloc[-1]
+            self.declared_totals[sheet_name] = {col: to_units(pd.Series([total[col]]), self.MONEY_UNITS[col])[0]
+                                                for col in self.TOTAL_COLUMNS if col in df.columns}
+        return df[~is_total].reset_index(drop=True)
+
+    def load_duty_rates(self, file_path: str, df: pd.DataFrame = None) -> pd.DataFrame:
+        """Load duty rate file with proper header detection (df: its already parsed first sheet)"""
+        if df is None:
+            df = read_excel(file_path, header=None, reader=self.reader)
         
         # Find header row
-        header_row = None
-        for idx, row in df.iterrows():
-            if 'Item name' in row.values and 'India HS code' in row.values:
-                header_row = idx
-                break
+        header_row = self.find_header_row(
+            'duty', df, lambda row: 'Item name' in row.values and 'India HS code' in row.values)
         
         if header_row is not None:
             df.columns = df.iloc[header_row]
@@ -216,16 +290,97 @@ class ExcelValidator:
             self.logger.error("Could not find header in duty rate file")
             return pd.DataFrame()
 
+    def read_workbooks(self, files: Dict[str, tuple]) -> Dict[str, Dict[str, pd.DataFrame]]:
+        """
+        Parse workbooks concurrently in a process pool, one task per file (per sheet with the fast reader).
+        files maps a label to (path, header, first_sheet_only); returns label -> {sheet: DataFrame}
+        in workbook order. A failure is reported against the file it came from.
+        """
+        # Step 1: One task per file; openpyxl parses the whole workbook whichever sheet is asked for,
+        # while the fast reader opens a single sheet cheaply, so only its workbooks split per sheet
+        tasks = []
+        for label, (path, header, first_sheet_only) in files.items():
+            if is_table_file(path) or is_csv_source(path):
+                sheets = [None]
+            elif self.reader == 'fast':
+                try:
+                    sheets = sheet_names(path, reader=self.reader)
+                except Exception as e:
+                    raise RuntimeError(f"Error loading {label} {path}: {str(e)}") from e
+                sheets = sheets[:1] if first_sheet_only else sheets
+            else:
+                sheets = [0 if first_sheet_only else None]
+            tasks.extend((label, path, sheet, header) for sheet in sheets)
+        
+        # Step 2: Collect results in task order so sheets keep their workbook order
+        frames = {label: {} for label in files}
+        def collect(task, result):
+            label, path, sheet, _ = task
+            try:
+                parsed = result()
+            except Exception as e:
+                raise RuntimeError(f"Error loading {label} {path}: {str(e)}") from e
+            if sheet is None:
+                frames[label].update(parsed)
+            else:
+                frames[label][sheet] = parsed
+        
+        workers = min(self.load_workers or os.cpu_count() or 1, len(tasks))
+        if workers <= 1:
+            for task in tasks:
+                collect(task, lambda: read_sheet_task(*task[1:], self.reader))
+            return frames
+        
+        self.logger.info(f"Parsing {len(files)} files in {len(tasks)} tasks with {workers} processes")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [(task, pool.submit(read_sheet_task, *task[1:], self.reader)) for task in tasks]
+            try:
+                for task, future in futures:
+                    collect(task, future.result)
+            except Exception:
+                for _, future in futures:
+                    future.cancel()
+                raise
+        return frames
+
     def load_excel_files(self) -> dict:
         """Load all Excel files with proper multi-sheet handling"""
         try:
+            store = self.open_store()
+            
+            # Parse the workbooks side by side; stored shipments and tariffs come from the store
+            files = {}
+            if not self.as_of:
+                files['duty file'] = (self.duty_file, None, True)
+            files['input file'] = (self.input_file, 0, False)
+            if not self.shipment:
+                files['shipping list'] = (self.shipping_list, None, False)
+            frames = self.read_workbooks(files)
+            
             # Load duty rates first
-            self.duty_rates = self.load_duty_rates(self.duty_file)
+            if self.as_of:
+                self.duty_rates = store.load_tariff(self.as_of)
+                self.logger.info(f"Using tariff version {store.tariff_version_as_of(self.as_of)} "
+                                 f"in effect on {self.as_of}")
+            else:
+                duty_sheets = list(frames['duty file'].values())
+                self.duty_rates = self.load_duty_rates(self.duty_file, duty_sheets[0] if duty_sheets else None)
             
             # Keep original sheet names
-            input_sheets = pd.read_excel(self.input_file, sheet_name=None)
+            input_sheets = frames['input file']
+            if self.shipment:
+                shipping = store.load_shipping(self.shipment)
+                self.shipping_titles.update(store.shipping_titles(self.shipment))
+                self.declared_totals.update(store.declared_totals(self.shipment))
+            else:
+                shipping = self.load_shipping_data(self.shipping_list, frames['shipping list'])
+            
+            # Keep any layouts learned while loading for the next run
+            if self.layouts is not None:
+                self.logger.info(f"Layout cache: {self.layouts.hits} hits, {self.layouts.misses} misses")
+                self.layouts.save()
             return {
-                'shipping': self.load_shipping_data(self.shipping_list),
+                'shipping': shipping,
                 'input_data': {self.normalize_sheet_name(name): df 
                               for name, df in input_sheets.items()},
                 'input_sheets': input_sheets,
@@ -235,60 +390,471 @@ class ExcelValidator:
             self.logger.error(f"Error loading files: {str(e)}")
             raise
 
-    def validate_sheet(self, sheet_df: pd.DataFrame, sheet_name: str,
-                      shipping_df: pd.DataFrame, duty_df: pd.DataFrame):
-        # Build shipping index using cleaned P/N values
-        shipping_df['clean_pn'] = shipping_df['P/N'].apply(self.clean_pn_value)
-        shipping_index = shipping_df.set_index('clean_pn').to_dict('index')
-        
-        for idx, input_row in sheet_df.iterrows():
-            # Get and clean P/N from input
-            input_pn = self.clean_pn_value(input_row.get('P/N', 'N/A'))
-            
-            if input_pn == 'N/A':
-                self.log_error(sheet_name, idx, input_pn, "Missing P/N in input row")
+    def open_store(self) -> ReferenceStore:
+        """Reference store connection, opened on first use; None when nothing stored is used"""
+        if self.store is None and (self.shipment or self.as_of):
+            self.store = ReferenceStore(self.reference_db)
+        return self.store
+
+    def close_store(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def find_column(self, df: pd.DataFrame, candidates: tuple) -> str:
+        """Return the first of the candidate column names present in df, or None"""
+        return next((col for col in candidates if col in df.columns), None)
+
+    def line_keys(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Canonical P/N, Item No. and occurrence number within the P/N group for each line"""
+        pn_col = self.find_column(df, ('P/N',))
+        item_col = self.find_column(df, self.ITEM_NO_COLUMNS)
+        keys = pd.DataFrame(index=df.index)
+        keys['clean_pn'] = df[pn_col].map(self.clean_pn_value) if pn_col else 'N/A'
+        if item_col:
+            keys['item_no'] = normalize_item_numbers(df[item_col])
+        else:
+            keys['item_no'] = ''
+        keys['occurrence'] = keys.groupby('clean_pn').cumcount()
+        return keys
+
+    def pair_shipping_lines(self, input_keys: pd.DataFrame, shipping_keys: pd.DataFrame) -> pd.Series:
+        """
+        Pair each input line with one shipping line of the same P/N group.
+        Within a group lines are matched by Item No., then by order of appearance,
+        then to the group's first line. Unmatched P/Ns map to NaN.
+        """
+        inp = input_keys.rename_axis('row_idx').reset_index()
+        shp = shipping_keys.rename_axis('ship_pos').reset_index()
+        
+        by_item = (inp[inp['item_no'] != '']
+                   .merge(shp[shp['item_no'] != ''], on=['clean_pn', 'item_no'])
+                   .drop_duplicates('row_idx'))
+        by_order = inp.merge(shp, on=['clean_pn', 'occurrence'])
+        first_line = inp.merge(shp.drop_duplicates('clean_pn'), on='clean_pn')
+        
+        pairs = pd.concat([by_item[['row_idx', 'ship_pos']],
+                           by_order[['row_idx', 'ship_pos']],
+                           first_line[['row_idx', 'ship_pos']]]).drop_duplicates('row_idx')
+        return pairs.set_index('row_idx')['ship_pos'].reindex(inp['row_idx'])
+
+    def group_totals(self, sheet_df: pd.DataFrame, input_keys: pd.DataFrame,
+                     shipping_df: pd.DataFrame, shipping_keys: pd.DataFrame) -> pd.DataFrame:
+        """
+        Quantity PCS and Amount USD totals (in integer units) per P/N on both sides, for the P/Ns spanning
+        several lines on either side; '<column>_match' flags the totals that reconcile exactly
+        """
+        columns = [col for col in self.TOTAL_COLUMNS if col in sheet_df.columns and col in shipping_df.columns]
+        if not columns:
+            return pd.DataFrame()
+        
+        def side_totals(df, keys):
+            values = pd.DataFrame({col: to_units(df[col], self.MONEY_UNITS[col]) for col in columns})
+            grouped = values.groupby(keys['clean_pn'])
+            totals = grouped.sum(min_count=1)
+            totals['lines'] = grouped.size()
+            return totals
+        
+        totals = side_totals(sheet_df, input_keys).join(side_totals(shipping_df, shipping_keys), how='inner',
+                                                        lsuffix='_input', rsuffix='_shipping')
+        # Single-line groups are covered by the line-level comparison
+        totals = totals[(totals['lines_input'] > 1) | (totals['lines_shipping'] > 1)].copy()
+        for col in columns:
+            input_total = totals[f'{col}_input'].to_numpy(dtype=float, na_value=np.nan)
+            shipping_total = totals[f'{col}_shipping'].to_numpy(dtype=float, na_value=np.nan)
+            # Amounts are summed in whole cents, so both sides must agree exactly
+            totals[f'{col}_match'] = np.isclose(input_total, shipping_total, rtol=0.0, atol=1e-9, equal_nan=True)
+        return totals
+
+    def reconciled_groups(self, totals: pd.DataFrame) -> Dict[str, set]:
+        """Column -> multi-line P/N groups whose totals of that column reconcile"""
+        return {col: set(totals.index[totals[f'{col}_match']])
+                for col in self.TOTAL_COLUMNS if f'{col}_match' in totals.columns}
+
+    def reconcile_group_totals(self, totals: pd.DataFrame, input_keys: pd.DataFrame, sheet_name: str):
+        """Report multi-line P/N groups whose Quantity PCS or Amount USD totals do not reconcile"""
+        if totals.empty:
+            return
+        first_rows = input_keys.reset_index().drop_duplicates('clean_pn').set_index('clean_pn').iloc[:, 0]
+        for col in self.TOTAL_COLUMNS:
+            if f'{col}_match' not in totals.columns:
                 continue
-            
-            # Find in shipping list using cleaned P/N
-            shipping_row = shipping_index.get(input_pn)
-            
-            if not shipping_row:
-                # Try matching with different P/N formats
-                alt_pn = self.clean_pn_value(input_pn.replace('.', ''))  # Try without dots
-                shipping_row = shipping_index.get(alt_pn)
-                
-                if not shipping_row:
-                    self.log_error(sheet_name, idx, input_pn, "No matching shipping entry for P/N")
+            for pn, group in totals[~totals[f'{col}_match']].iterrows():
+                self.log_error(
+                    sheet_name, int(first_rows[pn]), pn,
+                    f"Total {col} mismatch across {int(group['lines_input'])} input and "
+                    f"{int(group['lines_shipping'])} shipping lines: "
+                    f"{self.format_units(group[f'{col}_input'], col)} vs "
+                    f"{self.format_units(group[f'{col}_shipping'], col)}",
+                    error_type='group_total_mismatch', column=col
+                )
+
+    def money_units(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Quantity (1e-3 pieces), unit price (1e-6 USD) and amount (cents) of every line as nullable int64"""
+        units = pd.DataFrame(index=df.index)
+        for col, scale in self.MONEY_UNITS.items():
+            units[col] = to_units(df[col], scale) if col in df.columns else pd.Series(pd.NA, index=df.index, dtype='Int64')
+        return units
+
+    def format_units(self, value, col: str) -> str:
+        """An integer money total back in the column's own units, for messages"""
+        if pd.isna(value):
+            return 'N/A'
+        scale = self.MONEY_UNITS.get(col, 1)
+        if scale == CENTS:
+            return f"{value / scale:.2f}"
+        return f"{value / scale:.3f}".rstrip('0').rstrip('.')
+
+    def line_amount_mismatches(self, units: pd.DataFrame) -> np.ndarray:
+        """
+        Lines where Quantity PCS x Unit Price USD does not round to Amount USD.
+        Unit prices are themselves rounded to 1e-6 and quantities to 1e-3, so a line may drift
+        by half a price unit per piece, half a quantity unit times the price, plus half a cent;
+        anything beyond that is an arithmetic error. The products can pass the int64 range,
+        so they are taken in floats, whose error stays far below a cent.
+        """
+        qty, price, amount = (units[col].astype('Float64') for col in ('Quantity PCS', 'Unit Price USD', 'Amount USD'))
+        cent = QUANTITY_UNITS * PRICE_UNITS // CENTS
+        drift = 2 * (qty * price - amount * cent)
+        return (drift.abs() > qty.abs() + price.abs() + cent).fillna(False).to_numpy(dtype=bool)
+
+    def reconcile_shipping_amounts(self, shipping_sheets: Dict[str, pd.DataFrame]):
+        """
+        Check every shipping invoice in integer units, vectorized over the whole list:
+        line arithmetic, and the line sums against the invoice's declared TOTAL line.
+        """
+        frames = [self.money_units(df).assign(invoice=name)
+                  for name, df in shipping_sheets.items() if not df.empty]
+        if not frames:
+            return
+        units = pd.concat(frames)
+        self.shipping_order = {name: pos for pos, name in enumerate(shipping_sheets)}
+        
+        for pos, name in units.loc[self.line_amount_mismatches(units), 'invoice'].items():
+            df = shipping_sheets[name]
+            pn = self.clean_pn_value(df.at[pos, 'P/N']) if 'P/N' in df.columns else 'N/A'
+            self.log_error(name, pos, pn,
+                           f"Shipping line arithmetic: {df.at[pos, 'Quantity PCS']} x {df.at[pos, 'Unit Price USD']} "
+                           f"!= Amount USD {df.at[pos, 'Amount USD']}",
+                           error_type='line_amount_mismatch', column='Amount USD')
+        
+        self.invoice_totals = units.groupby('invoice', sort=False)[list(self.TOTAL_COLUMNS)].sum(min_count=1)
+        for name, declared in self.declared_totals.items():
+            if name not in self.invoice_totals.index:
+                continue
+            for col, declared_total in declared.items():
+                line_total = self.invoice_totals.at[name, col]
+                if pd.isna(declared_total) or pd.isna(line_total) or declared_total == line_total:
                     continue
-            
-            # Step 2.3: Validate columns
-            self.validate_columns(input_row, shipping_row, [
-                'Item Nos', 'Model Nos', 'Description',
-                'Quantity PCS', 'Unit Price USD', 'Amount USD'
-            ], sheet_name, idx)
-            
-            # Step 3: Validate duty info
-            self.validate_duty_info(input_row, sheet_name, idx)
+                self.log_error(name, len(shipping_sheets[name]), 'N/A',
+                               f"Invoice {col} lines sum to {self.format_units(line_total, col)}, "
+                               f"declared total is {self.format_units(declared_total, col)}",
+                               error_type='invoice_total_mismatch', column=col)
 
-    def validate_columns(self, input_row: pd.Series, shipping_row: dict, columns: list, 
-                        sheet_name: str, row_idx: int):
-        """Validate column values between input and shipping data"""
-        for col in columns:
-            input_val = input_row.get(col, 'N/A')
-            shipping_val = shipping_row.get(col, 'N/A')
-            
-            # Handle numeric comparisons
-            if isinstance(input_val, (int, float)) and isinstance(shipping_val, (int, float)):
-                if not math.isclose(input_val, shipping_val, rel_tol=0.01):
-                    self.log_error(
-                        sheet_name,
-                        row_idx,
-                        self.clean_pn_value(input_row.get('P/N', 'N/A')),
-                        f"Value mismatch in column {col}: {input_val} vs {shipping_val}"
-                    )
-            else:
-                # Handle text comparisons
-                self.validate_text(input_row, shipping_row, col, sheet_name, row_idx)
+    def reconcile_amounts(self, sheet_df: pd.DataFrame, sheet_name: str, shipping_name: str = None):
+        """Check a checklist sheet's line arithmetic and invoice totals exactly, in integer units"""
+        units = self.money_units(sheet_df)
+        for row_idx in units.index[self.line_amount_mismatches(units)]:
+            pn = self.clean_pn_value(sheet_df.at[row_idx, 'P/N']) if 'P/N' in sheet_df.columns else 'N/A'
+            self.log_error(sheet_name, row_idx, pn,
+                           f"Line arithmetic: {sheet_df.at[row_idx, 'Quantity PCS']} x "
+                           f"{sheet_df.at[row_idx, 'Unit Price USD']} != Amount USD {sheet_df.at[row_idx, 'Amount USD']}",
+                           error_type='line_amount_mismatch', column='Amount USD')
+        
+        # Only lines with a quantity count; a line with an amount but no quantity or P/N is a total line
+        is_line = units['Quantity PCS'].notna().to_numpy()
+        totals = units.loc[is_line, list(self.TOTAL_COLUMNS)].sum(min_count=1)
+        if not pd.isna(totals['Amount USD']):
+            self.checklist_total += int(totals['Amount USD'])
+        has_pn = sheet_df['P/N'].notna().to_numpy() if 'P/N' in sheet_df.columns else np.zeros(len(sheet_df), dtype=bool)
+        for row_idx in units.index[~is_line & ~has_pn & units['Amount USD'].notna().to_numpy()]:
+            declared = units.at[row_idx, 'Amount USD']
+            # The checklist closes either this invoice or the whole shipment with a total line
+            # (an invoice whose amounts are all blank has no total of its own)
+            if declared != self.checklist_total and (pd.isna(totals['Amount USD'])
+                                                     or declared != totals['Amount USD']):
+                self.log_error(sheet_name, row_idx, 'N/A',
+                               f"Total line Amount USD {self.format_units(declared, 'Amount USD')} matches neither "
+                               f"this invoice's lines ({self.format_units(totals['Amount USD'], 'Amount USD')}) "
+                               f"nor all checklist lines so far ({self.format_units(self.checklist_total, 'Amount USD')})",
+                               error_type='invoice_total_mismatch', column='Amount USD')
+        
+        if shipping_name is None or shipping_name not in self.invoice_totals.index or not is_line.any():
+            return
+        # The checklist invoice should add up to what the shipping invoice declares (or its lines sum to)
+        declared = self.declared_totals.get(shipping_name, {})
+        for col in self.TOTAL_COLUMNS:
+            expected = declared.get(col, self.invoice_totals.at[shipping_name, col])
+            if col not in sheet_df.columns or pd.isna(expected) or pd.isna(totals[col]) or totals[col] == expected:
+                continue
+            self.log_error(sheet_name, sheet_df.index[0], 'N/A',
+                           f"Invoice total {col} {self.format_units(totals[col], col)} vs "
+                           f"{self.format_units(expected, col)} on shipping invoice {shipping_name}",
+                           error_type='invoice_total_mismatch', column=col)
+
+    def chunk_rows(self, sheet_df: pd.DataFrame) -> int:
+        """Lines per chunk that fit the memory budget, or None when chunking is off"""
+        if not self.max_memory or sheet_df.empty:
+            return None
+        row_bytes = sheet_df.memory_usage(deep=True).sum() / len(sheet_df)
+        headroom = self.max_memory * 1024 ** 2 - current_rss()
+        if headroom <= 0:
+            self.logger.warning(f"Memory use is already above --max-memory {self.max_memory} MB, "
+                                f"using the minimum chunk of {self.MIN_CHUNK_ROWS} lines")
+            return self.MIN_CHUNK_ROWS
+        return max(self.MIN_CHUNK_ROWS,
+                   int(headroom * self.CHUNK_MEMORY_SHARE / (row_bytes * self.ROW_OVERHEAD)))
+
+    def partition_lines(self, sheet_df: pd.DataFrame):
+        """
+        Yield the sheet in chunks that fit the memory budget. Lines are partitioned by
+        a hash of the canonical P/N, so every P/N group (pairing by occurrence, group
+        totals) is checked within one chunk and the results match an unchunked run.
+        """
+        chunk_rows = self.chunk_rows(sheet_df)
+        if chunk_rows is None or len(sheet_df) <= chunk_rows:
+            yield sheet_df
+            return
+        
+        n_chunks = math.ceil(len(sheet_df) / chunk_rows)
+        pns = sheet_df['P/N'].map(self.clean_pn_value) if 'P/N' in sheet_df.columns else pd.Series(
+            'N/A', index=sheet_df.index)
+        partition = pd.util.hash_array(pns.to_numpy(dtype=object)) % n_chunks
+        self.logger.debug(f"Validating {len(sheet_df)} lines in {n_chunks} chunks of ~{chunk_rows}")
+        for chunk_id in range(n_chunks):
+            chunk = sheet_df[partition == chunk_id]
+            if not chunk.empty:
+                yield chunk
+
+    def flush_errors(self):
+        """Move the errors collected so far to the on-disk spool (chunked mode only)"""
+        if self.error_spool is not None and self.validation_errors:
+            self.error_spool.write(self.validation_errors)
+            self.validation_errors.clear()
+
+    def new_errors(self) -> List[dict]:
+        """Errors logged since the last call"""
+        batch = self.validation_errors[self.errors_seen:]
+        self.errors_seen = len(self.validation_errors)
+        return batch
+
+    def release_errors(self, keep: bool):
+        """Once a batch is handed out: keep it for the report (spooled in chunked mode) or drop it"""
+        if keep:
+            self.flush_errors()
+        else:
+            self.validation_errors.clear()
+        self.errors_seen = len(self.validation_errors)
+
+    def drop_errors(self, count: int):
+        """Forget the last count errors logged, with their checklist annotations"""
+        for error in reversed(self.validation_errors[-count:]):
+            if self.annotate:
+                # The row's last annotation with this error's type and message (a note may follow it)
+                row_notes = self.annotations[error['Sheet']][error['Row'] - 1]
+                pos = max(pos for pos, (_, error_type, message) in enumerate(row_notes)
+                          if (error_type, message) == (error['Type'], error['Error']))
+                del row_notes[pos]
+        del self.validation_errors[-count:]
+        self.error_count -= count
+
+    def hand_out_errors(self, batch: List[dict], keep: bool, max_errors: int = None):
+        """
+        Yield a batch of new errors, publishing an error event for each one handed out;
+        returns True once max_errors errors have been handed out
+        """
+        for pos, error in enumerate(batch, 1):
+            self.events.emit('error', sheet=error['Sheet'], row=error['Row'], pn=error['P/N'],
+                             type=error['Type'], message=error['Error'])
+            yield error
+            self.errors_yielded += 1
+            if max_errors is not None and self.errors_yielded >= max_errors:
+                # Errors past the limit were never handed out, so the report and annotations leave them out too
+                if len(batch) > pos:
+                    self.drop_errors(len(batch) - pos)
+                self.release_errors(keep)
+                return True
+        self.release_errors(keep)
+        return False
+
+    def validate_sheet(self, sheet_df: pd.DataFrame, sheet_name: str,
+                      shipping_df: pd.DataFrame, duty_df: pd.DataFrame,
+                      shipping_name: str = None) -> Iterator[List[dict]]:
+        """Validate one checklist sheet, yielding the new errors after each chunk and after the sheet totals"""
+        # Group both sides on the canonical P/N; a part may ship on several lines
+        shipping_df = shipping_df.reset_index(drop=True)
+        shipping_keys = self.line_keys(shipping_df)
+        # Reuse the records of the global index rather than building a second copy
+        shipping_rows = self.shipping_records.get(shipping_name) or shipping_df.to_dict('records')
+        # Approved substitutes of this invoice's lines, indexed once for all chunks
+        alternates = (AlternateIndex(shipping_df[ALTERNATES_COLUMN])
+                      if ALTERNATES_COLUMN in shipping_df.columns else None)
+        
+        rows_done = 0
+        for chunk in self.partition_lines(sheet_df):
+            self.validate_lines(chunk, sheet_name, shipping_df, shipping_keys, shipping_rows, shipping_name,
+                                alternates)
+            batch = self.new_errors()
+            rows_done += len(chunk)
+            self.events.emit('rows_processed', sheet=sheet_name, rows=rows_done, total=len(sheet_df))
+            yield batch
+        
+        # Step 2.5: Exact line arithmetic and invoice totals, once for the whole sheet
+        self.reconcile_amounts(sheet_df, sheet_name, shipping_name)
+        yield self.new_errors()
+
+    def validate_lines(self, sheet_df: pd.DataFrame, sheet_name: str, shipping_df: pd.DataFrame,
+                       shipping_keys: pd.DataFrame, shipping_rows: List[dict], shipping_name: str = None,
+                       alternates: AlternateIndex = None):
+        """Validate a set of input lines holding complete P/N groups against one shipping sheet"""
+        input_keys = self.line_keys(sheet_df)
+        # Only the shipping lines of P/Ns present here can pair or enter a group total
+        in_chunk = shipping_keys['clean_pn'].isin(input_keys['clean_pn'])
+        shipping_keys = shipping_keys[in_chunk]
+        shipping_df = shipping_df[in_chunk]
+        pairing = self.pair_shipping_lines(input_keys, shipping_keys)
+        
+        # Step 1.5: Catch P/Ns that are not in the corporate parts master at all
+        self.check_parts_master(input_keys, sheet_name)
+        
+        # Step 2: Lines paired within their P/N group take their shipping line in one vectorized take
+        pns = input_keys['clean_pn']
+        missing = (pns == 'N/A').to_numpy()
+        for idx in pns.index[missing]:
+            self.log_error(sheet_name, idx, 'N/A', "Missing P/N in input row",
+                           error_type='missing_pn', column='P/N')
+        paired = pairing.notna().to_numpy() & ~missing
+        shipping_side = shipping_df.loc[pairing[paired].astype(int)].set_axis(pns.index[paired])
+        
+        # Only unpaired lines need a lookup: a line of this invoice listing the P/N as a substitute,
+        # then the other invoices
+        fallback = {}
+        for idx, input_pn in pns[~paired & ~missing].items():
+            shipping_row = (self.match_alternate(alternates, shipping_rows, sheet_name, idx, input_pn)
+                            or self.find_in_other_invoices(sheet_name, idx, input_pn, shipping_name))
+            if shipping_row is None:
+                self.log_error(sheet_name, idx, input_pn, "No matching shipping entry for P/N",
+                               error_type='pn_not_found', column='P/N',
+                               Suggestions=self.suggest_pns(input_pn))
+                continue
+            fallback[idx] = shipping_row
+        if fallback:
+            shipping_side = pd.concat([shipping_side, pd.DataFrame.from_records(list(fallback.values()),
+                                                                                index=list(fallback))])
+            shipping_side = shipping_side.loc[pns.index[pns.index.isin(shipping_side.index)]]
+        
+        # Step 2.2: Multi-line P/N groups are reconciled on their quantity/amount totals
+        totals = self.group_totals(sheet_df, input_keys, shipping_df, shipping_keys)
+        
+        # Step 2.3: Validate columns of all matched lines through the compiled rule plan
+        self.compare_lines(sheet_df, input_keys, shipping_side, sheet_name, self.reconciled_groups(totals))
+        
+        # Step 3: Validate duty info
+        if not self.tariff_check:
+            for idx in shipping_side.index:
+                self.validate_duty_info(sheet_df.loc[idx], sheet_name, idx)
+        
+        # Step 2.4: Report the multi-line P/N groups whose totals do not reconcile
+        self.reconcile_group_totals(totals, input_keys, sheet_name)
+        
+        # Step 4: Full tariff verification in one columnar pass
+        if self.tariff_check:
+            self.verify_tariff(sheet_df, sheet_name)
+
+    def check_parts_master(self, input_keys: pd.DataFrame, sheet_name: str):
+        """Flag lines whose canonical P/N is unknown to the parts master, in one vectorized lookup"""
+        if self.parts_master is None:
+            return
+        keys = input_keys[input_keys['clean_pn'] != 'N/A']
+        unknown = keys[~self.parts_master.contains(keys['clean_pn'].to_numpy(dtype=object))]
+        for row_idx, pn in unknown['clean_pn'].items():
+            self.log_error(sheet_name, row_idx, pn, "P/N not found in parts master",
+                           error_type='unknown_part', column='P/N')
+
+    def build_suggestion_index(self, shipping_sheets: Dict[str, pd.DataFrame]):
+        """Index every cleaned shipping P/N once per run for nearest-P/N suggestions"""
+        if self.suggestions <= 0:
+            return
+        part_numbers = set()
+        for df in shipping_sheets.values():
+            if 'P/N' in df.columns:
+                part_numbers.update(df['P/N'].map(self.clean_pn_value))
+        self.suggestion_index = PNSuggestionIndex(part_numbers)
+        self.logger.debug(f"Built P/N suggestion index over {len(self.suggestion_index)} part numbers")
+
+    def build_global_index(self, shipping_sheets: Dict[str, pd.DataFrame]):
+        """Index every shipping line by canonical P/N across all invoices, once per run"""
+        self.shipping_records = {name: df.reset_index(drop=True).to_dict('records')
+                                 for name, df in shipping_sheets.items()}
+        if self.shipment:
+            # A stored shipment answers P/N lookups from the store's P/N index
+            self.global_index = StoredPNIndex(self.open_store(), self.shipment)
+            return
+        self.global_index = GlobalPNIndex({
+            name: (df['P/N'].map(self.clean_pn_value) if 'P/N' in df.columns else [])
+            for name, df in shipping_sheets.items()
+        })
+        self.logger.debug(f"Built global P/N index over {len(self.global_index)} part numbers")
+
+    def find_in_other_invoices(self, sheet_name: str, row_idx: int, pn: str,
+                               shipping_name: str = None) -> dict:
+        """Look a P/N up in the other shipping sheets and flag the cross-invoice match"""
+        if self.global_index is None:
+            return None
+        locations = self.global_index.lookup(pn, exclude_sheet=shipping_name)
+        if not locations:
+            return None
+        
+        found_in = '; '.join(f"{name} (row {pos + 1})" for name, pos in locations)
+        expected = f"shipping sheet {shipping_name}" if shipping_name else "a paired shipping sheet"
+        self.log_error(sheet_name, row_idx, pn,
+                       f"P/N not in {expected}, found in invoice {locations[0][0]}",
+                       error_type='cross_invoice_match', column='P/N', **{'Found In': found_in})
+        other_sheet, pos = locations[0]
+        return self.shipping_records[other_sheet][pos]
+
+    def match_alternate(self, alternates: AlternateIndex, shipping_rows: List[dict], sheet_name: str,
+                        row_idx: int, pn: str) -> dict:
+        """Shipping line declaring a P/N as its approved substitute, reported as matched via alternate"""
+        positions = alternates.lookup(pn) if alternates is not None else []
+        if not positions:
+            return None
+        shipping_row = shipping_rows[positions[0]]
+        primary = shipping_row.get('P/N', 'N/A')
+        self.log_note(sheet_name, row_idx, pn,
+                      f"P/N matched via alternate material of shipping P/N {primary} (row {positions[0] + 1})",
+                      note_type='alternate_match', column='P/N', **{'Primary P/N': primary})
+        return shipping_row
+
+    def suggest_pns(self, pn: str) -> str:
+        """Closest shipping P/Ns for an unmatched P/N, formatted for the report"""
+        if self.suggestion_index is None:
+            return ''
+        matches = self.suggestion_index.suggest(pn, k=self.suggestions)
+        return '; '.join(f"{candidate} ({score:.2f})" for candidate, score in matches)
+
+    def compare_lines(self, sheet_df: pd.DataFrame, input_keys: pd.DataFrame, shipping_side: pd.DataFrame,
+                      sheet_name: str, reconciled: Dict[str, set] = None):
+        """
+        Run the rule plan a column at a time over all matched lines (shipping_side holds each
+        line's shipping line, same index), logging failures in row order. Lines of a multi-line
+        P/N group whose totals of a column reconcile (reconciled: column -> P/Ns) skip that column.
+        """
+        if shipping_side.empty:
+            return
+        input_side = sheet_df.loc[shipping_side.index]
+        pns = input_keys.loc[input_side.index, 'clean_pn'].to_numpy(dtype=object)
+        reconciled = reconciled or {}
+        
+        failures = []
+        for order, (rule_column, column, error_type, mask, messages) in enumerate(
+                self.rules.compare(input_side, shipping_side)):
+            skip = reconciled.get(rule_column, ())
+            failures.extend((pos, order, column, error_type, message)
+                            for pos, message in zip(np.flatnonzero(mask), messages) if pns[pos] not in skip)
+        for pos, _, column, error_type, message in sorted(failures, key=lambda failure: failure[:2]):
+            row_idx = input_side.index[pos]
+            self.log_error(sheet_name, row_idx, pns[pos], message, error_type=error_type, column=column)
 
     def validate_duty_info(self, input_row: pd.Series, sheet_name: str, row_idx: int):
         """Validate duty rate information against loaded rates"""
@@ -299,7 +865,8 @@ class ExcelValidator:
         # Get item name from input
         item_name = str(input_row.get('Item name', 'N/A')).strip()
         if item_name == 'N/A':
-            self.log_error(sheet_name, row_idx, item_name, "Missing item name")
+            self.log_error(sheet_name, row_idx, item_name, "Missing item name",
+                           error_type='missing_item_name', column='Item name')
             return
         
         # Escape special characters in item_name for regex
@@ -321,79 +888,472 @@ class ExcelValidator:
             # More flexible regex pattern
             if not re.match(r'^(\d{4,10}(\.\d{1,10})?|\d+-\d+)$', hs_str):
                 self.log_error(sheet_name, row_idx, hs_str, 
-                              f"Invalid HS Code format: {hs_str} (accepts numbers, decimals, or hyphenated formats)")
+                              f"Invalid HS Code format: {hs_str} (accepts numbers, decimals, or hyphenated formats)",
+                              error_type='hs_code_format', column='India HS code')
         else:
-            self.log_error(sheet_name, row_idx, item_name, "No matching duty rate found")
-
-    def validate_text(self, input_row, reference_row, col_name, 
-                     sheet_name: str, row_idx: int, threshold=0.85):
-        # Ensure we're comparing strings by explicitly converting
-        input_text = str(input_row.get(col_name, '')).lower()
-        ref_text = str(reference_row.get(col_name, '')).lower()
-        
-        similarity = SequenceMatcher(None, input_text, ref_text).ratio()
-        if similarity < threshold:
-            self.log_error(
-                sheet_name,
-                row_idx,
-                self.clean_pn_value(input_row.get('P/N', 'N/A')),
-                f"Text similarity low in column {col_name}: {input_text} vs {ref_text}"
-            )
-
-    def validate_all(self):
-        data = self.load_excel_files()
-        
-        # Store original sheet names for reporting
-        matched_pairs = []
-        for input_name, input_df in data['input_data'].items():
-            original_name = self.get_original_sheet_name(input_name, data['input_sheets'])
+            self.log_error(sheet_name, row_idx, item_name, "No matching duty rate found",
+                           error_type='tariff_not_found', column='Item name')
+
+    def build_tariff_table(self) -> pd.DataFrame:
+        """Reduce the duty file to canonical item name, HS code and Normal duty rates (once per run)"""
+        if self.tariff_table is not None:
+            return self.tariff_table
+        
+        duty_df = self.duty_rates
+        if duty_df.empty or 'Item name' not in duty_df.columns:
+            self.tariff_table = pd.DataFrame(columns=['name_key', 'tariff_hs',
+                                                      *(f'tariff_{col}' for col in self.TARIFF_RATE_COLUMNS.values())])
+            return self.tariff_table
+        
+        # The BCD/SWS/IGST headers repeat per duty scheme; the first group is Normal duty
+        duty_df = duty_df.loc[:, ~pd.Index(duty_df.columns).duplicated()]
+        table = pd.DataFrame({
+            'name_key': normalize_item_names(duty_df['Item name']),
+            'tariff_hs': normalize_hs_codes(duty_df['India HS code']),
+        })
+        for rate_col in self.TARIFF_RATE_COLUMNS.values():
+            table[f'tariff_{rate_col}'] = normalize_rates(duty_df[rate_col]) if rate_col in duty_df.columns else np.nan
+        
+        self.tariff_table = table[duty_df['Item name'].notna().values].reset_index(drop=True)
+        return self.tariff_table
+
+    def resolve_tariff_names(self, name_keys: pd.Series, tariff: pd.DataFrame) -> pd.DataFrame:
+        """Map each distinct checklist item name to tariff item names (exact first, then containment)"""
+        tariff_names = tariff['name_key'].unique()
+        exact = set(tariff_names)
+        pairs = []
+        for name in name_keys.unique():
+            if name in exact:
+                pairs.append((name, name))
+            else:
+                # Same rule as validate_duty_info: the tariff name contains the checklist name
+                pairs.extend((name, tariff_name) for tariff_name in tariff_names if name in tariff_name)
+        return pd.DataFrame(pairs, columns=['name_key', 'tariff_name'])
+
+    def verify_tariff(self, sheet_df: pd.DataFrame, sheet_name: str):
+        """Check India HS code, Duty, Welfare and IGST against the tariff table in one vectorized pass"""
+        if 'Item name' not in sheet_df.columns:
+            self.logger.warning(f"Skipping tariff verification for {sheet_name} - no Item name column")
+            return
+        tariff = self.build_tariff_table()
+        
+        lines = pd.DataFrame({
+            'row_idx': sheet_df.index,
+            'pn': sheet_df['P/N'].map(self.clean_pn_value) if 'P/N' in sheet_df.columns else 'N/A',
+            'item_name': sheet_df['Item name'].values,
+            'name_key': normalize_item_names(sheet_df['Item name']).values,
+            'input_hs': normalize_hs_codes(sheet_df['India HS code']).values
+                        if 'India HS code' in sheet_df.columns else '',
+        })
+        for input_col in self.TARIFF_RATE_COLUMNS:
+            lines[input_col] = (normalize_rates(sheet_df[input_col]).values
+                                if input_col in sheet_df.columns else np.nan)
+        lines = lines[sheet_df['Item name'].notna().values]
+        
+        # Join once on canonical item name; prefer the tariff row whose HS code matches
+        names = self.resolve_tariff_names(lines['name_key'], tariff)
+        candidates = (lines.merge(names, on='name_key', how='left')
+                      .merge(tariff.rename(columns={'name_key': 'tariff_name'}),
+                             on='tariff_name', how='left'))
+        candidates['hs_match'] = candidates['input_hs'] == candidates['tariff_hs']
+        best = (candidates.sort_values(['row_idx', 'hs_match'], ascending=[True, False], kind='stable')
+                .drop_duplicates('row_idx'))
+        
+        found = best['tariff_name'].notna()
+        mismatches = [(best[~found], 'tariff_not_found', 'Item name',
+                       lambda r: f"No matching duty rate found for item name {r.item_name}")]
+        
+        matched = best[found]
+        mismatches.append((matched[~matched['hs_match']], 'hs_code_mismatch', 'India HS code',
+                           lambda r: f"India HS code mismatch for {r.item_name}: {r.input_hs} vs tariff {r.tariff_hs}"))
+        for input_col, rate_col in self.TARIFF_RATE_COLUMNS.items():
+            same = np.isclose(matched[input_col].astype(float), matched[f'tariff_{rate_col}'].astype(float),
+                              atol=1e-6, equal_nan=True)
+            mismatches.append((matched[~same], f'{input_col.lower()}_rate_mismatch', input_col,
+                               lambda r, c=input_col, t=rate_col:
+                               f"{c} rate mismatch for {r.item_name}: {getattr(r, c)} vs tariff {getattr(r, 'tariff_' + t)} ({t})"))
+        
+        for rows, error_type, column, message in mismatches:
+            for row in rows.itertuples(index=False):
+                self.log_error(sheet_name, row.row_idx, row.pn, message(row), error_type=error_type,
+                               column=column)
+
+    def pair_sheets(self, input_names: Dict[str, str], shipping_names: List[str]) -> Dict[str, str]:
+        """
+        Pair input sheets with shipping sheets by invoice number through a hash map,
+        using fuzzy name similarity only for the leftovers. Fills self.pairing_report.
+        input_names maps the normalized input sheet name to its original name.
+        """
+        shipping_by_key = {}
+        for shipping_name in shipping_names:
+            key = extract_invoice_key(shipping_name) or self.shipping_titles.get(shipping_name, '')
+            if key and key not in shipping_by_key:
+                shipping_by_key[key] = shipping_name
+        
+        pairing = {}
+        report = {}
+        unpaired_shipping = list(shipping_names)
+        leftovers = []
+        for input_name, original_name in input_names.items():
+            shipping_name = shipping_by_key.get(extract_invoice_key(original_name))
+            if shipping_name and shipping_name in unpaired_shipping:
+                pairing[input_name] = shipping_name
+                unpaired_shipping.remove(shipping_name)
+                report[input_name] = (shipping_name, 'invoice number', 1.0)
+            else:
+                leftovers.append(input_name)
+        
+        # Fuzzy name matching only among sheets the invoice keys did not pair
+        for input_name in leftovers:
             best_match = None
             best_score = 0
-            
-            for shipping_name in data['shipping'].keys():
+            for shipping_name in unpaired_shipping:
                 score = SequenceMatcher(
-                    None, 
+                    None,
                     self.normalize_sheet_name(input_name),
                     self.normalize_sheet_name(shipping_name)
                 ).ratio()
-                
                 if score > best_score and score > 0.6:
                     best_score = score
                     best_match = shipping_name
-                    
             if best_match:
-                matched_pairs.append((input_df, original_name, best_match))
+                pairing[input_name] = best_match
+                unpaired_shipping.remove(best_match)
+                report[input_name] = (best_match, 'fuzzy name', round(best_score, 3))
+            else:
+                report[input_name] = ('', 'unpaired', None)
+        
+        self.pairing_report = [
+            {'Input Sheet': input_names[name], 'Shipping Sheet': shipping_name,
+             'Method': method, 'Score': score}
+            for name, (shipping_name, method, score) in report.items()
+        ]
+        self.pairing_report.extend(
+            {'Input Sheet': '', 'Shipping Sheet': shipping_name, 'Method': 'unpaired', 'Score': None}
+            for shipping_name in unpaired_shipping
+        )
+        self.logger.info(f"Paired {len(pairing)} of {len(input_names)} input sheets "
+                         f"({len(unpaired_shipping)} shipping sheets unpaired)")
+        return pairing
 
-        # Validate matched pairs
-        for input_df, original_sheet_name, shipping_name in matched_pairs:
-            try:
-                shipping_df = data['shipping'][shipping_name]
-                # Pass original sheet name to validation
-                self.validate_sheet(input_df, original_sheet_name, shipping_df, data['duty_rates'])
-            except Exception as e:
-                self.logger.error(f"Validation failed for {original_sheet_name}: {str(e)}")
+    def preview(self, lines: int = PREVIEW_LINES) -> dict:
+        """
+        Quick check of the raw (not yet normalized) files before a full run: the first lines of
+        every checklist invoice (streamed, so the rest of each invoice is never kept) and the top
+        of every shipping invoice are normalized in memory, then sheets are paired and P/N, duty
+        and column coverage measured. Nothing is written.
+        Returns {'sheets': per sheet summary, 'lines', 'pn_match_rate', 'duty_match_rate', 'warnings'}.
+        """
+        started = time.perf_counter()
+        # The normalizer scripts have dashes in their names, so they are imported by string
+        converter_module = importlib.import_module('normalize-inputexcel')
+        shipping_module = importlib.import_module('normalize-shipping')
+        store = self.open_store()
+        
+        # Step 1: First lines of each checklist invoice
+        converter = converter_module.ExcelConverter(reader=self.reader)
+        input_sheets = {}
+        for sheet_name, rows in iter_sheet_rows(self.input_file, reader=self.reader):
+            df = rows_to_frame(converter.sample_rows(rows, lines))
+            for invoice, data in converter.process_sheet(df, sheet_name, max_lines=lines).items():
+                input_sheets[converter.output_sheet_name(invoice)] = data
+        
+        # Step 2: Title block, header and first lines of each shipping invoice
+        if self.shipment:
+            shipping = store.load_shipping(self.shipment)
+            self.shipping_titles.update(store.shipping_titles(self.shipment))
+        else:
+            raw_shipping = read_excel(self.shipping_list, sheet_name=None, reader=self.reader,
+                                      nrows=self.PREVIEW_HEADER_ROWS + lines)
+            shipping = self.load_shipping_tables(self.shipping_list, shipping_module.normalize_shipping_sheets(
+                raw_shipping, self.layouts, self.rules))
+        
+        # Step 3: Duty rates (small, read whole)
+        if self.as_of:
+            self.duty_rates = store.load_tariff(self.as_of)
+        else:
+            self.duty_rates = self.load_duty_rates(self.duty_file)
+        tariff = self.build_tariff_table()
+        
+        # Step 4: Pair sheets and index the sampled shipping lines
+        input_data = {self.normalize_sheet_name(name): df for name, df in input_sheets.items()}
+        original_names = {self.normalize_sheet_name(name): name for name in input_sheets}
+        pairing = self.pair_sheets(original_names, list(shipping))
+        self.build_global_index(shipping)
+        missing_columns = {(rule['column'], 'shipping list') for rule in self.rules.plan if rule['type'] != 'lookup'
+                           for df in shipping.values() if self.rules.resolve(df, rule['shipping_names']) is None}
+        
+        # Step 5: Match rates per checklist sheet
+        rows = []
+        for input_name, df in input_data.items():
+            shipping_name = pairing.get(input_name)
+            pns = self.line_keys(df)['clean_pn']
+            paired_pns = set(self.line_keys(shipping[shipping_name])['clean_pn']) if shipping_name else set()
+            if shipping_name and ALTERNATES_COLUMN in shipping[shipping_name].columns:
+                paired_pns.update(AlternateIndex(shipping[shipping_name][ALTERNATES_COLUMN]).rows)
+            in_paired = pns.isin(paired_pns)
+            elsewhere = ~in_paired & pns.map(lambda pn: bool(self.global_index.lookup(pn)))
+            if 'Item name' in df.columns:
+                name_keys = normalize_item_names(df['Item name'])
+                duty_found = name_keys.isin(self.resolve_tariff_names(name_keys, tariff)['name_key'])
+            else:
+                duty_found = pd.Series(False, index=df.index)
+            missing_columns.update((rule['column'], 'checklist') for rule in self.rules.plan
+                                   if self.rules.resolve(df, rule['input_names']) is None)
+            rows.append({'Input Sheet': original_names[input_name], 'Shipping Sheet': shipping_name or '',
+                         'Lines': len(df), 'P/N Paired Sheet': int(in_paired.sum()),
+                         'P/N Other Sheet': int(elsewhere.sum()),
+                         'P/N Not Found': int((~in_paired & ~elsewhere).sum()),
+                         'Duty Rate Found': int(duty_found.sum())})
+        self.close_store()
+        sheets = pd.DataFrame(rows, columns=['Input Sheet', 'Shipping Sheet', 'Lines', 'P/N Paired Sheet',
+                                             'P/N Other Sheet', 'P/N Not Found', 'Duty Rate Found'])
+        
+        # Step 6: Rates over all sampled lines and what looks wrong
+        total = int(sheets['Lines'].sum())
+        pn_rate = (sheets['P/N Paired Sheet'].sum() + sheets['P/N Other Sheet'].sum()) / total if total else 0.0
+        duty_rate = sheets['Duty Rate Found'].sum() / total if total else 0.0
+        warnings_found = []
+        if not total:
+            warnings_found.append("No invoice lines found in the checklist")
+        if not shipping:
+            warnings_found.append("No shipping invoice tables found in the shipping list")
+        unpaired = sheets.loc[sheets['Shipping Sheet'] == '', 'Input Sheet'].tolist()
+        if unpaired:
+            warnings_found.append(f"{len(unpaired)} checklist sheets have no shipping sheet: {', '.join(unpaired)}")
+        if total and pn_rate < self.PREVIEW_MIN_MATCH_RATE:
+            warnings_found.append(f"Only {pn_rate:.0%} of sampled P/Ns are in the shipping list "
+                                  f"- is it the right shipping list?")
+        if total and duty_rate < self.PREVIEW_MIN_MATCH_RATE:
+            warnings_found.append(f"Only {duty_rate:.0%} of sampled item names have a duty rate "
+                                  f"- is it the right duty file?")
+        for column, side in sorted(missing_columns):
+            warnings_found.append(f"Column {column} not found in the {side}, every line will be flagged on it")
+        
+        self.logger.info(f"Quick check of {total} lines in {time.perf_counter() - started:.2f} s: "
+                         f"{pn_rate:.0%} P/Ns and {duty_rate:.0%} item names matched")
+        return {'sheets': sheets, 'lines': total, 'pn_match_rate': pn_rate,
+                'duty_match_rate': duty_rate, 'warnings': warnings_found}
+
+    def validate_all(self, max_errors: int = None):
+        """Validate every sheet (up to max_errors errors), keeping the errors for generate_report"""
+        for _ in self.validate_iter(max_errors=max_errors):
+            pass
+
+    def validate_iter(self, max_errors: int = None, keep: bool = True) -> Iterator[dict]:
+        """
+        Validate sheet by sheet, yielding each error record ({'Sheet', 'Row', 'P/N', 'Type', 'Error', ...})
+        as soon as its chunk of lines is checked. Validation stops once max_errors errors are handed out
+        (fail fast). keep=False leaves the errors to the caller instead of also holding them for the report.
+        Lines matched via an approved substitute are not errors: they go to self.notes, not out of here.
+        """
+        self.errors_seen = 0
+        self.errors_yielded = 0
+        self.stopped_early = False
+        try:
+            with self.events.stage('load'):
+                data = self.load_excel_files()
+            if self.annotate:
+                self.input_sheets = data['input_sheets']
+            with self.events.stage('index'):
+                self.build_suggestion_index(data['shipping'])
+                self.build_global_index(data['shipping'])
+            with self.events.stage('reconcile'):
+                self.reconcile_shipping_amounts(data['shipping'])
+            if self.max_memory:
+                self.error_spool = ErrorSpool()
+                self.logger.info(f"Chunked validation under {self.max_memory} MB "
+                                 f"({current_rss() / 1024 ** 2:.0f} MB in use after loading)")
+        
+            # Store original sheet names for reporting
+            original_names = {input_name: self.get_original_sheet_name(input_name, data['input_sheets'])
+                              for input_name in data['input_data']}
+            with self.events.stage('pair'):
+                pairing = self.pair_sheets(original_names, list(data['shipping'].keys()))
+        
+            matched_pairs = []
+            for input_name, input_df in data['input_data'].items():
+                original_name = original_names[input_name]
+                best_match = pairing.get(input_name)
+                if best_match:
+                    matched_pairs.append((input_df, original_name, best_match))
+                else:
+                    # Unpaired sheets are still checked, against the global P/N index only
+                    self.logger.warning(f"No shipping sheet paired with {original_name}, using global P/N index")
+                    matched_pairs.append((input_df, original_name, None))
+
+            # Validate matched pairs
+            for index, (input_df, original_sheet_name, shipping_name) in enumerate(matched_pairs):
+                self.sheet_order.setdefault(original_sheet_name, len(self.sheet_order))
+                self.events.emit('sheet_started', sheet=original_sheet_name, index=index,
+                                 total=len(matched_pairs), rows=len(input_df))
+                started = time.perf_counter()
+                errors_before = self.error_count
+                stopped = False
+                try:
+                    if shipping_name is None:
+                        shipping_df = pd.DataFrame(columns=['P/N'])
+                    else:
+                        shipping_df = data['shipping'][shipping_name]
+                    # Pass original sheet name to validation
+                    for batch in self.validate_sheet(input_df, original_sheet_name, shipping_df, data['duty_rates'],
+                                                     shipping_name=shipping_name):
+                        stopped = yield from self.hand_out_errors(batch, keep, max_errors)
+                        if stopped:
+                            break
+                except Exception as e:
+                    self.logger.error(f"Validation failed for {original_sheet_name}: {str(e)}")
+                    # Errors logged before the failure still go out
+                    stopped = yield from self.hand_out_errors(self.new_errors(), keep, max_errors)
+                self.events.emit('sheet_finished', sheet=original_sheet_name, index=index,
+                                 total=len(matched_pairs), seconds=time.perf_counter() - started,
+                                 errors=self.error_count - errors_before)
+                if stopped:
+                    self.stopped_early = True
+                    self.logger.warning(f"Stopped at the limit of {max_errors} errors, "
+                                        f"{len(matched_pairs) - index - 1} sheets not validated")
+                    return
+        
+            # Shipping-side reconciliation errors still waiting, e.g. when there is no checklist sheet
+            if (yield from self.hand_out_errors(self.new_errors(), keep, max_errors)):
+                self.stopped_early = True
+        finally:
+            self.close_store()
+
+    def collect_errors(self) -> pd.DataFrame:
+        """All validation errors (spooled and in memory), ordered by sheet and row"""
+        error_df = pd.DataFrame(self.validation_errors)
+        if self.error_spool is not None:
+            error_df = pd.concat([self.error_spool.read(), error_df], ignore_index=True)
+        return self.order_records(error_df)
+
+    def order_records(self, records: pd.DataFrame) -> pd.DataFrame:
+        """
+        Report records by sheet and row: checklist sheets in validation order, then shipping
+        sheets in list order; the stable sort keeps each row's records in the order they were
+        found in, chunked or not
+        """
+        if records.empty:
+            return records
+        shipping_order = records['Sheet'].map(self.shipping_order) + len(self.sheet_order)
+        sheet_order = (records['Sheet'].map(self.sheet_order).fillna(shipping_order)
+                       .fillna(len(self.sheet_order) + len(self.shipping_order)))
+        return (records.assign(_sheet_order=sheet_order)
+                .sort_values(['_sheet_order', 'Row'], kind='stable')
+                .drop(columns='_sheet_order')
+                .reset_index(drop=True))
 
     def generate_report(self):
         """
         Generate Excel report with validation errors
         """
         # Convert validation errors to DataFrame
-        error_df = pd.DataFrame(self.validation_errors)
+        error_df = self.collect_errors()
+        pairing_df = pd.DataFrame(self.pairing_report,
+                                  columns=['Input Sheet', 'Shipping Sheet', 'Method', 'Score'])
+        notes_df = (self.order_records(pd.DataFrame(self.notes)) if self.notes
+                    else pd.DataFrame(columns=['Sheet', 'Row', 'P/N', 'Type', 'Note']))
         
-        # Save to Excel file
+        # Save to Excel file: errors first, then how the sheets were paired, then the notes
         output_path = Path(self.input_file).parent / 'validation_report.xlsx'
-        error_df.to_excel(output_path, index=False)
+        with self.events.stage('report'), pd.ExcelWriter(output_path) as writer:
+            error_df.to_excel(writer, sheet_name='Errors', index=False)
+            pairing_df.to_excel(writer, sheet_name='Sheet Pairing', index=False)
+            notes_df.to_excel(writer, sheet_name='Notes', index=False)
         print(f"Validation report generated: {output_path}")
+        
+        self.stats = {
+            'errors': len(error_df),
+            'error_types': error_df['Type'].value_counts().to_dict() if not error_df.empty else {},
+            'notes': len(notes_df),
+            'sheets': len(self.sheet_order),
+            'stopped_early': self.stopped_early,
+        }
+        return output_path
 
-    def log_error(self, sheet_name: str, row_idx: int, pn: str, error_msg: str):
-        """Log validation errors with proper row numbers"""
+    def log_error(self, sheet_name: str, row_idx: int, pn: str, error_msg: str,
+                  error_type: str = 'validation', column: str = None, **details):
+        """
+        Log validation errors with proper row numbers; extra report columns go in details.
+        column names the checklist cell at fault, for the annotated checklist.
+        """
+        if self.annotate:
+            self.annotations[sheet_name][row_idx].append((column, error_type, error_msg))
         self.validation_errors.append({
             'Sheet': sheet_name,
             'Row': row_idx + 1,  # Convert 0-based to 1-based
             'P/N': pn,
-            'Error': error_msg
+            'Type': error_type,
+            'Error': error_msg,
+            **details
+        })
+        self.error_count += 1
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(f"Validation error in {sheet_name} row {row_idx+1}: {error_msg}")
+
+    def generate_annotated_checklist(self) -> Path:
+        """
+        Re-emit the normalized checklist with each faulty cell filled and its errors
+        attached as a cell comment. Rows are streamed through xlsxwriter's
+        constant_memory mode in one pass, so the workbook is never held in memory.
+        """
+        output_path = Path(self.input_file).parent / 'annotated_checklist.xlsx'
+        workbook = xlsxwriter.Workbook(str(output_path), {'constant_memory': True,
+                                                          'nan_inf_to_errors': True})
+        header_format = workbook.add_format({'bold': True, 'bg_color': '#D8E4BC', 'border': 1})
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        fills = {}
+        
+        def fill(error_type):
+            color = self.ANNOTATION_COLORS.get(error_type, self.ANNOTATION_DEFAULT)
+            if color not in fills:
+                fills[color] = workbook.add_format({'bg_color': color, 'border': 1})
+            return fills[color]
+        
+        with self.events.stage('annotate'):
+            for sheet_name, df in self.input_sheets.items():
+                worksheet = workbook.add_worksheet(sheet_name)
+                worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+                positions = {str(col): pos for pos, col in enumerate(df.columns)}
+                # Errors without a matching checklist column are attached to the P/N cell
+                fallback = positions.get('P/N', 0)
+                sheet_notes = self.annotations.get(sheet_name, {})
+                
+                for excel_row, (row_idx, values) in enumerate(
+                        zip(df.index, df.itertuples(index=False, name=None)), 1):
+                    cells = {}
+                    for column, error_type, error_msg in sheet_notes.get(row_idx, ()):
+                        pos = positions.get(column, fallback)
+                        cells.setdefault(pos, (fill(error_type), []))[1].append(error_msg)
+                    
+                    for pos, value in enumerate(values):
+                        cell_format = cells[pos][0] if pos in cells else None
+                        if pd.isna(value):
+                            if cell_format is not None:
+                                worksheet.write_blank(excel_row, pos, None, cell_format)
+                        elif isinstance(value, datetime):
+                            worksheet.write_datetime(excel_row, pos, value, cell_format or date_format)
+                        else:
+                            worksheet.write(excel_row, pos, value, cell_format)
+                    for pos, (_, messages) in cells.items():
+                        worksheet.write_comment(excel_row, pos, '\n'.join(messages))
+        workbook.close()
+        print(f"Annotated checklist generated: {output_path}")
+        return output_path
+
+    def log_note(self, sheet_name: str, row_idx: int, pn: str, message: str, note_type: str,
+                 column: str = None, **details):
+        """Record an informational finding; it is annotated like an error but never counted as one"""
+        if self.annotate:
+            self.annotations[sheet_name][row_idx].append((column, note_type, message))
+        self.notes.append({
+            'Sheet': sheet_name,
+            'Row': row_idx + 1,
+            'P/N': pn,
+            'Type': note_type,
+            'Note': message,
+            **details
         })
-        self.logger.debug(f"Validation error in {sheet_name} row {row_idx+1}: {error_msg}")
 
     def get_original_sheet_name(self, normalized_name: str, original_sheets: dict) -> str:
         """Find original sheet name from normalized version"""
@@ -411,59 +1371,197 @@ def main():
 Examples:
     python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx
     python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --debug
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --reader fast
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --format feather
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --max-memory 2048
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --no-cache
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --annotate
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --preview
+    python excel_validator.py checklist.csv shipping_sheets/ duty_rates.tsv
+    python excel_validator.py input.xlsx shipping_list.xlsx duty_rates.xlsx --fail-fast
+    python excel_validator.py input.xlsx --shipment 24HC01713 --as-of 2024-12-22
+    python excel_validator.py input.xlsx duty_rates.xlsx --shipment 24HC01713
+
+Shipments and tariff versions are imported with import-reference.py.
+CSV/TSV exports (UTF-8 or GB18030) can replace any workbook: one file whose first column
+is 'Sheet' holding each line's sheet name, or a directory with one file per sheet.
 
 Note: The validation report will be generated as 'validation_report.xlsx' in the same directory as the input file.
         """
     )
     
     parser.add_argument('input_file', type=str, 
-                       help='Path to the input Excel file to be validated')
-    parser.add_argument('shipping_list', type=str, 
+                       help='Path to the input Excel file (or CSV/TSV export) to be validated')
+    parser.add_argument('shipping_list', type=str, nargs='?', default=None,
                        help='Path to the shipping list Excel file containing reference data')
-    parser.add_argument('duty_file', type=str, 
+    parser.add_argument('duty_file', type=str, nargs='?', default=None,
                        help='Path to the duty rates Excel file containing tax information')
     parser.add_argument('--debug', action='store_true', 
                        help='Enable debug logging for detailed execution information')
+    parser.add_argument('--reader', choices=READERS, default='openpyxl',
+                       help='Excel reader engine (fast = streaming zip/XML reader)')
+    parser.add_argument('--format', choices=FORMATS, default='xlsx',
+                       help='Format of the intermediate normalized files (feather/parquet/pickle skip Excel serialization)')
+    parser.add_argument('--suggestions', type=int, default=3,
+                       help='Number of closest shipping P/Ns suggested for unmatched lines (0 disables)')
+    parser.add_argument('--tariff-check', action='store_true',
+                       help='Verify India HS code, Duty, Welfare and IGST against the duty rates file')
+    parser.add_argument('--layout-cache', type=str, default=str(DEFAULT_LAYOUT_CACHE),
+                       help='File of learned sheet layouts used to skip header detection')
+    parser.add_argument('--no-layout-cache', action='store_true',
+                       help='Always detect headers and do not learn layouts')
+    parser.add_argument('--max-memory', type=int, default=None, metavar='MB',
+                       help='Memory ceiling in MB: validate large sheets in chunks and spool errors to disk')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                       help='Directory of cached validation results (default: ~/.custom_list/results)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always run the full pipeline and do not cache the result')
+    parser.add_argument('--reference-db', type=str, default=str(DEFAULT_REFERENCE_DB),
+                       help='Reference store imported with import-reference.py')
+    parser.add_argument('--shipment', type=str, default=None,
+                       help='Validate against a stored shipment instead of a shipping list file')
+    parser.add_argument('--as-of', type=str, default=None, metavar='YYYY-MM-DD',
+                       help='Use the stored tariff version in effect on this date instead of a duty file '
+                            '(default: today when no duty file is given)')
+    parser.add_argument('--annotate', action='store_true',
+                       help="Also write 'annotated_checklist.xlsx': the checklist with error cells highlighted")
+    parser.add_argument('--parts-master', type=str, default=None,
+                       help='Compiled parts master (.npy from parts_master.py): report P/Ns it does not know')
+    parser.add_argument('--rules', type=str, default=None,
+                       help='JSON rule file adding column aliases and comparison rules to the defaults')
+    parser.add_argument('--load-workers', type=int, default=None,
+                       help='Processes parsing the workbooks (default: one per CPU, 1 = serial)')
+    parser.add_argument('--preview', type=int, nargs='?', const=ExcelValidator.PREVIEW_LINES, default=None,
+                       metavar='LINES',
+                       help='Quick check: pair sheets and measure P/N and duty match rates on the first '
+                            f'LINES lines of each invoice (default {ExcelValidator.PREVIEW_LINES}), then exit')
+    parser.add_argument('--max-errors', type=int, default=None, metavar='N',
+                       help='Stop validating after N errors and exit with status 1 if any error was found')
+    parser.add_argument('--fail-fast', action='store_true',
+                       help='Stop at the first error (--max-errors 1), for pass/fail gating')
 
     args = parser.parse_args()
     
+    # With a stored shipment the only other file given is the duty file
+    if args.shipment and args.shipping_list and not args.duty_file:
+        args.duty_file, args.shipping_list = args.shipping_list, None
+    if not args.shipping_list and not args.shipment:
+        parser.error('a shipping list file or --shipment is required')
+    default_as_of = not args.duty_file and not args.as_of
+    if default_as_of:
+        args.as_of = time.strftime('%Y-%m-%d')
+    use_store = bool(args.shipment or args.as_of)
+    if use_store:
+        # Fail before normalizing anything when the stored shipment or tariff is missing;
+        # only an import creates the store
+        if not Path(args.reference_db).exists():
+            parser.error(f"{'no duty file given and ' if default_as_of else ''}no reference store at "
+                         f"{args.reference_db}, import shipments and tariffs with import-reference.py")
+        store = ReferenceStore(args.reference_db)
+        try:
+            if args.shipment and not store.has_shipment(args.shipment):
+                parser.error(f"shipment '{args.shipment}' is not in {args.reference_db}, "
+                             f"import it with import-reference.py shipping")
+            if args.as_of and store.tariff_version_as_of(args.as_of) is None:
+                parser.error(f"{'no duty file given and ' if default_as_of else ''}no tariff version in effect "
+                             f"on {args.as_of} in {args.reference_db}, pass a duty file or import one "
+                             f"with import-reference.py tariff")
+        except ValueError:
+            parser.error(f"--as-of {args.as_of} is not a YYYY-MM-DD date")
+        finally:
+            store.close()
+    if args.fail_fast:
+        args.max_errors = 1
+    if args.max_errors is not None and args.max_errors < 1:
+        parser.error('--max-errors must be at least 1')
+    
     # Set debug level if requested
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
     
+    # Quick check on a sample of the raw files, before anything is normalized
+    if args.preview:
+        validator = ExcelValidator(
+            input_file=args.input_file,
+            shipping_list=args.shipping_list,
+            duty_file=args.duty_file,
+            reader=args.reader,
+            layout_cache=None if args.no_layout_cache else args.layout_cache,
+            reference_db=args.reference_db,
+            shipment=args.shipment,
+            as_of=args.as_of,
+            rules=args.rules
+        )
+        summary = validator.preview(args.preview)
+        print(summary['sheets'].to_string(index=False))
+        print(f"\nSampled {summary['lines']} lines: {summary['pn_match_rate']:.0%} of P/Ns and "
+              f"{summary['duty_match_rate']:.0%} of item names matched")
+        for warning in summary['warnings']:
+            print(f"Warning: {warning}")
+        return
+    
+    # Identical files and settings give an identical report: reuse it if we have one
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    if cache is not None:
+        cache_key = cache.run_key(args.input_file, args.shipping_list, args.duty_file,
+                                  parts_master=args.parts_master, rules=args.rules,
+                                  reference_db=args.reference_db if use_store else None,
+                                  tariff_check=args.tariff_check, suggestions=args.suggestions,
+                                  shipment=args.shipment, as_of=args.as_of, annotate=args.annotate,
+                                  max_errors=args.max_errors)
+        cached = cache.get(cache_key)
+        if cached:
+            for cached_path in [cached['report'], *cached['attachments']]:
+                target_path = Path(args.input_file).parent / cached_path.name
+                shutil.copyfile(cached_path, target_path)
+                print(f"{cached_path.name} generated (cached): {target_path}")
+            if args.max_errors is not None and cached['stats'].get('errors'):
+                sys.exit(1)
+            return
+    
     # Add normalization step before validation
     try:
         # Create output paths with _normalized suffix
+        fmt = resolve_format(args.format)
         input_path = Path(args.input_file)
-        normalized_input_path = input_path.with_stem(f"{input_path.stem}_normalized")
+        normalized_input_path = output_path(input_path.with_stem(f"{input_path.stem}_normalized"), fmt)
         
-        shipping_path = Path(args.shipping_list)
-        normalized_shipping_path = shipping_path.with_stem(f"{shipping_path.stem}_normalized")
+        normalized_shipping_path = None
 
         # Step 0: Normalize input Excel file
         print(f"Normalizing input file to {normalized_input_path}...")
-        subprocess.check_call([
+        commands = {'input file normalization': [
             "python", 
             "normalize-inputexcel.py",
             str(input_path),
-            str(normalized_input_path)
-        ])
-        
-        # Verify normalization output
-        if not normalized_input_path.exists():
-            raise FileNotFoundError(f"Normalization failed to create {normalized_input_path}")
+            str(normalized_input_path),
+            "--reader", args.reader,
+            "--format", fmt
+        ]}
 
-        # Step 1: Normalize shipping list
-        print(f"Normalizing shipping file to {normalized_shipping_path}...")
-        subprocess.check_call([
-            "python",
-            "normalize-shipping.py", 
-            str(shipping_path),
-            str(normalized_shipping_path)
-        ])
+        # Step 1: Normalize shipping list (stored shipments are already normalized)
+        if args.shipping_list:
+            shipping_path = Path(args.shipping_list)
+            normalized_shipping_path = output_path(shipping_path.with_stem(f"{shipping_path.stem}_normalized"), fmt)
+            print(f"Normalizing shipping file to {normalized_shipping_path}...")
+            commands['shipping list normalization'] = [
+                "python",
+                "normalize-shipping.py", 
+                str(shipping_path),
+                str(normalized_shipping_path),
+                "--reader", args.reader,
+                "--format", fmt,
+                *(["--no-layout-cache"] if args.no_layout_cache else ["--layout-cache", args.layout_cache]),
+                *(["--rules", args.rules] if args.rules else [])
+            ]
 
-        if not normalized_shipping_path.exists():
-            raise FileNotFoundError(f"Normalization failed to create {normalized_shipping_path}")
+        # The two normalizations are independent, so run them side by side
+        run_processes(commands)
+        
+        # Verify normalization output
+        for normalized_path in (normalized_input_path, normalized_shipping_path):
+            if normalized_path and not normalized_path.exists():
+                raise FileNotFoundError(f"Normalization failed to create {normalized_path}")
 
     except Exception as e:
         logging.error(f"Normalization failed: {str(e)}")
@@ -473,10 +1571,28 @@ Note: The validation report will be generated as 'validation_report.xlsx' in the
     validator = ExcelValidator(
         input_file=normalized_input_path,
         shipping_list=normalized_shipping_path,
-        duty_file=args.duty_file
+        duty_file=args.duty_file,
+        reader=args.reader,
+        tariff_check=args.tariff_check,
+        suggestions=args.suggestions,
+        layout_cache=None if args.no_layout_cache else args.layout_cache,
+        max_memory=args.max_memory,
+        reference_db=args.reference_db,
+        shipment=args.shipment,
+        as_of=args.as_of,
+        parts_master=args.parts_master,
+        annotate=args.annotate,
+        load_workers=args.load_workers,
+        rules=args.rules
     )
-    validator.validate_all()
-    validator.generate_report()
+    validator.validate_all(max_errors=args.max_errors)
+    report_path = validator.generate_report()
+    attachments = [validator.generate_annotated_checklist()] if args.annotate else []
+    if cache is not None:
+        cache.put(cache_key, report_path, validator.stats, attachments=attachments)
+    # Gating runs: a non-zero exit status means the shipment did not pass
+    if args.max_errors is not None and validator.stats['errors']:
+        sys.exit(1)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,423 @@
+import pandas as pd
+import numpy as np
+import zipfile
+import mmap
+import re
+import html
+import shutil
+import tempfile
+import datetime
+import posixpath
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Iterable, Iterator, Tuple, Optional, Union
+from xml.etree.ElementTree import iterparse, parse as parse_xml
+import openpyxl
+from pandas.io.parsers import TextParser
+from csv_reader import csv_sheet_names, is_csv_source, read_csv
+
+# Reader engines selectable with --reader
+READERS = ('openpyxl', 'fast')
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+SHEET_DATA_TAG = f'{{{MAIN_NS}}}sheetData'
+ROW_TAG = f'{{{MAIN_NS}}}row'
+VALUE_TAG = f'{{{MAIN_NS}}}v'
+INLINE_STRING_TAG = f'{{{MAIN_NS}}}is'
+TEXT_TAG = f'{{{MAIN_NS}}}t'
+RUN_TAG = f'{{{MAIN_NS}}}r'
+
+WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+MAC_EPOCH = datetime.datetime(1904, 1, 1)
+SECS_PER_DAY = 86400
+
+# Built-in number formats that render as dates/times (same set openpyxl uses)
+BUILTIN_DATE_FORMATS = {
+    14: 'mm-dd-yy', 15: 'd-mmm-yy', 16: 'd-mmm', 17: 'mmm-yy',
+    18: 'h:mm AM/PM', 19: 'h:mm:ss AM/PM', 20: 'h:mm', 21: 'h:mm:ss',
+    22: 'm/d/yy h:mm', 45: 'mm:ss', 46: '[h]:mm:ss', 47: 'mmss.0',
+}
+
+# Same rules as openpyxl.styles.numbers.is_date_format / is_timedelta_format
+STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+DATE_RE = re.compile(r'(?<![_\\])[dmhysDMHYS]')
+TIMEDELTA_RE = re.compile(r'\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?', re.I)
+
+# Locate <si> entries and their text runs in the raw sharedStrings.xml bytes
+SI_RE = re.compile(rb'<(?:\w+:)?si\b')
+PHONETIC_RE = re.compile(rb'<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>', re.DOTALL)
+TEXT_RE = re.compile(rb'<(?:\w+:)?t(?:\s[^>]*?)?(?:/>|>(.*?)</(?:\w+:)?t>)', re.DOTALL)
+
+
+def is_date_format(fmt: str) -> bool:
+    """Check if a number format code displays a date or time"""
+    if fmt is None:
+        return False
+    fmt = STRIP_RE.sub('', fmt.split(';')[0])
+    return DATE_RE.search(fmt) is not None
+
+
+def is_timedelta_format(fmt: str) -> bool:
+    """Check if a number format code displays elapsed time"""
+    if fmt is None:
+        return False
+    return TIMEDELTA_RE.search(fmt.split(';')[0]) is not None
+
+
+def from_excel(value: float, epoch: datetime.datetime, timedelta: bool = False):
+    """Convert an Excel serial to datetime/time/timedelta like openpyxl does"""
+    if timedelta:
+        td = datetime.timedelta(days=value)
+        if td.microseconds:
+            td = datetime.timedelta(seconds=td.total_seconds() // 1,
+                                    microseconds=round(td.microseconds, -3))
+        return td
+
+    day, fraction = divmod(value, 1)
+    diff = datetime.timedelta(milliseconds=round(fraction * SECS_PER_DAY * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        mins, seconds = divmod(diff.seconds, 60)
+        hours, mins = divmod(mins, 60)
+        return datetime.time(hours, mins, seconds, diff.microseconds)
+    if 0 < value < 60 and epoch == WINDOWS_EPOCH:
+        day += 1
+    return epoch + datetime.timedelta(days=day) + diff
+
+
+@lru_cache(maxsize=4096)
+def column_index(letters: str) -> int:
+    """Convert column letters (A, B, ..., AA) to a 0-based index"""
+    index = 0
+    for char in letters:
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+class SharedStrings:
+    """Lazily decoded shared string table backed by a memory-mapped copy of sharedStrings.xml"""
+
+    def __init__(self, zf: zipfile.ZipFile, member: str, cache_size: int = 65536):
+        self._file = tempfile.TemporaryFile()
+        with zf.open(member) as src:
+            shutil.copyfileobj(src, self._file, 1 << 20)
+        self._file.flush()
+
+        self._map = None
+        self._offsets = array('q')
+        if self._file.tell() > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Only the start offset of every <si> is kept; text is decoded on demand
+            self._offsets.extend(m.start() for m in SI_RE.finditer(self._map))
+            self._offsets.append(len(self._map))
+
+        self._lookup = lru_cache(maxsize=cache_size)(self._decode)
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._lookup(idx)
+
+    def _decode(self, idx: int) -> str:
+        """Concatenate the text runs of one <si>, skipping phonetic hints"""
+        chunk = self._map[self._offsets[idx]:self._offsets[idx + 1]]
+        # Apply XML end-of-line handling before entities are expanded
+        chunk = PHONETIC_RE.sub(b'', chunk).replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        text = ''.join(html.unescape(m.group(1).decode('utf-8'))
+                       for m in TEXT_RE.finditer(chunk) if m.group(1))
+        return text.replace('x005F_', '')
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class XlsxReader:
+    """Streaming .xlsx reader that yields cell values without building openpyxl cell objects"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._shared_strings = None
+        self._sheets = self._read_workbook()
+        self._date_styles, self._timedelta_styles = self._read_styles()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._shared_strings is not None:
+            self._shared_strings.close()
+        self._zip.close()
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return list(self._sheets)
+
+    def _read_workbook(self) -> Dict[str, str]:
+        """Map sheet names (in workbook order) to their worksheet part paths"""
+        with self._zip.open('xl/_rels/workbook.xml.rels') as f:
+            rels = {rel.get('Id'): rel.get('Target')
+                    for rel in parse_xml(f).getroot().iter(f'{{{PKG_REL_NS}}}Relationship')}
+
+        with self._zip.open('xl/workbook.xml') as f:
+            root = parse_xml(f).getroot()
+
+        workbook_pr = root.find(f'{{{MAIN_NS}}}workbookPr')
+        date1904 = workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true')
+        self.epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+
+        sheets = {}
+        for sheet in root.iter(f'{{{MAIN_NS}}}sheet'):
+            target = rels[sheet.get(f'{{{REL_NS}}}id')]
+            if target.startswith('/'):
+                part = target.lstrip('/')
+            else:
+                part = posixpath.normpath(posixpath.join('xl', target))
+            sheets[sheet.get('name')] = part
+        return sheets
+
+    def _read_styles(self) -> Tuple[set, set]:
+        """Collect the cell style indexes that format numbers as dates or timedeltas"""
+        date_styles, timedelta_styles = set(), set()
+        if 'xl/styles.xml' not in self._zip.namelist():
+            return date_styles, timedelta_styles
+
+        with self._zip.open('xl/styles.xml') as f:
+            root = parse_xml(f).getroot()
+
+        custom = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+                  for fmt in root.iter(f'{{{MAIN_NS}}}numFmt')}
+        cell_xfs = root.find(f'{{{MAIN_NS}}}cellXfs')
+        if cell_xfs is None:
+            return date_styles, timedelta_styles
+
+        for idx, xf in enumerate(cell_xfs):
+            fmt_id = int(xf.get('numFmtId', 0))
+            fmt = custom.get(fmt_id, BUILTIN_DATE_FORMATS.get(fmt_id))
+            if is_date_format(fmt):
+                date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(idx)
+        return date_styles, timedelta_styles
+
+    @property
+    def shared_strings(self) -> SharedStrings:
+        if self._shared_strings is None:
+            member = 'xl/sharedStrings.xml'
+            if member not in self._zip.namelist():
+                self._shared_strings = []
+            else:
+                self._shared_strings = SharedStrings(self._zip, member)
+        return self._shared_strings
+
+    def _resolve_sheet(self, sheet: Union[str, int]) -> str:
+        if isinstance(sheet, int):
+            return list(self._sheets.values())[sheet]
+        if sheet not in self._sheets:
+            raise ValueError(f"Worksheet named '{sheet}' not found")
+        return self._sheets[sheet]
+
+    def _convert(self, cell) -> object:
+        """Convert one <c> element to the value pandas gets from openpyxl"""
+        data_type = cell.get('t', 'n')
+
+        if data_type == 'inlineStr':
+            inline = cell.find(INLINE_STRING_TAG)
+            if inline is None:
+                return ''
+            runs = [inline.findtext(TEXT_TAG) or '']
+            runs.extend(run.findtext(TEXT_TAG) or '' for run in inline.iter(RUN_TAG))
+            return ''.join(runs)
+
+        value = cell.findtext(VALUE_TAG) or None
+        if value is None:
+            return ''
+
+        if data_type == 'n':
+            number = float(value) if ('.' in value or 'E' in value or 'e' in value) else int(value)
+            style = cell.get('s')
+            if style and int(style) in self._date_styles:
+                try:
+                    return from_excel(number, self.epoch,
+                                      timedelta=int(style) in self._timedelta_styles)
+                except (OverflowError, ValueError):
+                    return np.nan
+            as_int = int(number)
+            return as_int if as_int == number else float(number)
+        if data_type == 's':
+            return self.shared_strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'e':
+            return np.nan
+        if data_type == 'd':
+            return datetime.datetime.fromisoformat(value.rstrip('Z'))
+        return value
+
+    def iter_rows(self, sheet: Union[str, int] = 0,
+                  max_rows: Optional[int] = None) -> Iterator[Tuple]:
+        """
+        Stream a worksheet row by row as plain value tuples.
+        Missing rows come back as empty tuples and trailing empty cells are trimmed.
+        """
+        part = self._resolve_sheet(sheet)
+        emitted = 0
+        with self._zip.open(part) as src:
+            sheet_data = None
+            for event, element in iterparse(src, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == SHEET_DATA_TAG:
+                        sheet_data = element
+                    continue
+                if element.tag != ROW_TAG:
+                    continue
+
+                row_number = int(element.get('r', emitted + 1))
+                # Fill gaps left by rows that have no cells at all
+                while emitted < row_number - 1:
+                    if max_rows is not None and emitted >= max_rows:
+                        return
+                    yield ()
+                    emitted += 1
+                if max_rows is not None and emitted >= max_rows:
+                    return
+
+                values = []
+                for cell in element:
+                    coordinate = cell.get('r')
+                    if coordinate:
+                        col = column_index(coordinate.rstrip('0123456789'))
+                        if col > len(values):
+                            values.extend([''] * (col - len(values)))
+                    values.append(self._convert(cell))
+
+                while values and values[-1] == '':
+                    values.pop()
+                yield tuple(values)
+                emitted += 1
+
+                # Drop finished rows so memory stays flat on long sheets
+                element.clear()
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+    def read_rows(self, sheet: Union[str, int] = 0,
+                  max_rows: Optional[int] = None) -> List[list]:
+        """Read a sheet into padded rows, trimming trailing empty rows like pandas"""
+        data = [list(row) for row in self.iter_rows(sheet, max_rows)]
+        while data and not data[-1]:
+            data.pop()
+        if data:
+            width = max(len(row) for row in data)
+            for row in data:
+                if len(row) < width:
+                    row.extend([''] * (width - len(row)))
+        return data
+
+    def read_columns(self, sheet: Union[str, int] = 0,
+                     max_rows: Optional[int] = None) -> List[list]:
+        """Read a sheet as column arrays"""
+        return [list(col) for col in zip(*self.read_rows(sheet, max_rows))]
+
+    def read_sheet(self, sheet: Union[str, int] = 0, header: Optional[int] = 0,
+                   nrows: Optional[int] = None) -> pd.DataFrame:
+        """Read a sheet into a DataFrame with the same type inference as pd.read_excel"""
+        max_rows = None if nrows is None else nrows + (0 if header is None else header + 1)
+        data = self.read_rows(sheet, max_rows)
+        if not data:
+            return pd.DataFrame()
+        parser = TextParser(data, header=header, skip_blank_lines=False)
+        return parser.read()
+
+
+def sheet_names(path: Union[str, Path], reader: str = 'openpyxl') -> List[str]:
+    """List sheet names with the selected reader engine"""
+    if is_csv_source(path):
+        return csv_sheet_names(path)
+    if reader == 'fast':
+        with XlsxReader(path) as xlsx:
+            return xlsx.sheet_names
+    return pd.ExcelFile(path).sheet_names
+
+
+def read_excel(path: Union[str, Path], sheet_name: Union[str, int, None] = 0,
+               header: Optional[int] = 0, reader: str = 'openpyxl',
+               nrows: Optional[int] = None):
+    """
+    Drop-in for pd.read_excel(path, sheet_name=..., header=...) with a selectable engine.
+    Returns a DataFrame, or a dict of DataFrames when sheet_name is None.
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader '{reader}', expected one of {READERS}")
+
+    # CSV/TSV exports skip workbook parsing whichever engine is selected
+    if is_csv_source(path):
+        return read_csv(path, sheet_name=sheet_name, header=header, nrows=nrows)
+
+    if reader == 'openpyxl':
+        return pd.read_excel(path, sheet_name=sheet_name, header=header, nrows=nrows)
+
+    with XlsxReader(path) as xlsx:
+        if sheet_name is None:
+            return {name: xlsx.read_sheet(name, header, nrows) for name in xlsx.sheet_names}
+        return xlsx.read_sheet(sheet_name, header, nrows)
+
+
+def openpyxl_value(value):
+    """A read-only openpyxl cell value the way pandas' openpyxl engine returns it"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_sheet_rows(path: Union[str, Path], reader: str = 'openpyxl') -> Iterator[Tuple[str, Iterator[tuple]]]:
+    """
+    Stream every sheet as (name, rows) without building DataFrames; rows are cell value tuples
+    with '' for empty cells. Each sheet's rows must be consumed before moving to the next sheet.
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader '{reader}', expected one of {READERS}")
+
+    # CSV/TSV exports are already read in streamed chunks
+    if is_csv_source(path):
+        for name, df in read_csv(path, sheet_name=None, header=None).items():
+            yield name, df.fillna('').itertuples(index=False, name=None)
+        return
+
+    if reader == 'fast':
+        with XlsxReader(path) as xlsx:
+            for name in xlsx.sheet_names:
+                yield name, xlsx.iter_rows(name)
+        return
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, (tuple(map(openpyxl_value, row))
+                                    for row in worksheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def rows_to_frame(rows: Iterable[tuple]) -> pd.DataFrame:
+    """Streamed rows as a header-less DataFrame, with the same type inference as read_excel"""
+    data = [list(row) for row in rows]
+    if not data:
+        return pd.DataFrame()
+    width = max(len(row) for row in data)
+    if not width:
+        return pd.DataFrame()
+    for row in data:
+        row.extend([''] * (width - len(row)))
+    return TextParser(data, header=None, skip_blank_lines=False).read()